@@ -0,0 +1,97 @@
+import asyncio
+import json
+import logging
+import os
+from app.agents.dify_client import run_workflow
+from app.services.cache import DiskCache, SingleFlight, TTLCache
+from app.services.hedge_data import content_hash
+
+logger = logging.getLogger(__name__)
+
+# Finished workflow results keyed by (workflow, content hash of the inputs): a rerun with
+# identical inputs (same order, unchanged snapshot) is answered without calling Dify.
+# Entries live in memory (LRU + TTL) and, when DIFY_RESULT_CACHE_PATH names a SQLite file,
+# on disk as well so they survive worker restarts and are shared by workers on the host.
+DIFY_RESULT_CACHE_TTL = float(os.getenv("DIFY_RESULT_CACHE_TTL", "900"))
+DIFY_RESULT_CACHE_MAX_ENTRIES = int(os.getenv("DIFY_RESULT_CACHE_MAX_ENTRIES", "512"))
+DIFY_RESULT_CACHE_PATH = os.getenv("DIFY_RESULT_CACHE_PATH", "")
+DIFY_RESULT_CACHE_DISK_MAX_ENTRIES = int(os.getenv("DIFY_RESULT_CACHE_DISK_MAX_ENTRIES", "10000"))
+
+result_cache = TTLCache(DIFY_RESULT_CACHE_MAX_ENTRIES, DIFY_RESULT_CACHE_TTL)
+result_flight = SingleFlight()
+_disk_cache = None
+
+def get_disk_cache():
+    """The on-disk store, opened on first use; None when DIFY_RESULT_CACHE_PATH is unset"""
+    global _disk_cache
+    if _disk_cache is None and DIFY_RESULT_CACHE_PATH:
+        _disk_cache = DiskCache(DIFY_RESULT_CACHE_PATH, DIFY_RESULT_CACHE_DISK_MAX_ENTRIES, DIFY_RESULT_CACHE_TTL)
+    return _disk_cache
+
+def close_disk_cache():
+    global _disk_cache
+    if _disk_cache is not None:
+        disk, _disk_cache = _disk_cache, None
+        disk.close()
+
+def _canonical(value) -> bytes:
+    # Key order must not change the hash
+    return json.dumps(value, default=str, sort_keys=True, separators=(",", ":")).encode()
+
+def inputs_hash(inputs: dict) -> str:
+    return content_hash(_canonical(inputs))
+
+def hedge_inputs_hash(snapshot_digest: str, payload: dict) -> str:
+    """Content hash for inputs built from a hedge snapshot, without serializing the snapshot again"""
+    return content_hash(snapshot_digest.encode() + _canonical(payload))
+
+def result_key(workflow: str, content: str) -> str:
+    return f"{workflow}:{content}"
+
+async def run_workflow_cached(inputs: dict, user: str, app: str = "default", content: str = None) -> dict:
+    """
+    run_workflow through the result cache. content is the inputs' content hash (see
+    hedge_inputs_hash); it defaults to hashing the inputs. Identical concurrent calls share
+    one run, and only successful runs are cached.
+    """
+    key = result_key(app, content or inputs_hash(inputs))
+    result = result_cache.get(key)
+    if result is not None:
+        return result
+    return await result_flight.do(key, lambda: _run(key, inputs, user, app))
+
+async def _run(key: str, inputs: dict, user: str, app: str) -> dict:
+    disk = get_disk_cache()
+    if disk is not None:
+        result = await asyncio.to_thread(disk.get, key)
+        if result is not None:
+            result_cache.set(key, result)
+            return result
+    result = await run_workflow(inputs, user, app)
+    result_cache.set(key, result)
+    if disk is not None:
+        try:
+            await asyncio.to_thread(disk.set, key, result)
+        except Exception as e:
+            # The run succeeded; a full or read-only disk only costs the restart copy
+            logger.warning("Dify result cache write failed: %s", e)
+    return result
+
+def dify_cache_stats() -> dict:
+    disk = get_disk_cache()
+    return {
+        "memory": result_cache.stats(),
+        "disk": disk.stats() if disk is not None else None,
+        "single_flight": result_flight.stats(),
+        "ttl": DIFY_RESULT_CACHE_TTL,
+    }
+
+def invalidate_dify_results(workflow: str = None) -> int:
+    """Drop cached results, all or one workflow's; returns the count dropped from memory"""
+    prefix = None if workflow is None else result_key(workflow, "")
+    disk = get_disk_cache()
+    if disk is not None:
+        disk.invalidate(prefix)
+    if prefix is None:
+        return result_cache.invalidate()
+    return result_cache.invalidate(lambda key: key.startswith(prefix))
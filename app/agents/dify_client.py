@@ -0,0 +1,196 @@
+import asyncio
+import json
+import os
+import httpx
+
+# Dify API base URL and app keys. DIFY_APP_KEYS maps app names to API keys
+# ("hedge_validation=app-xxx,hedge_booking=app-yyy"); DIFY_API_KEY is the "default" app.
+DIFY_API_URL = os.getenv("DIFY_API_URL", "https://api.dify.ai/v1").rstrip("/")
+DIFY_API_KEY = os.getenv("DIFY_API_KEY", "")
+DIFY_APP_KEYS = dict(
+    item.strip().split("=", 1) for item in os.getenv("DIFY_APP_KEYS", "").split(",") if "=" in item
+)
+
+# Runs in flight per app, and callers allowed to wait for a slot before new ones are refused
+DIFY_MAX_CONCURRENCY_PER_APP = int(os.getenv("DIFY_MAX_CONCURRENCY_PER_APP", "4"))
+DIFY_MAX_PENDING_PER_APP = int(os.getenv("DIFY_MAX_PENDING_PER_APP", "16"))
+
+# Connection pool for the process-wide client; workflow runs can stream for minutes
+DIFY_POOL_MAX_CONNECTIONS = int(os.getenv("DIFY_POOL_MAX_CONNECTIONS", "20"))
+DIFY_POOL_MAX_KEEPALIVE = int(os.getenv("DIFY_POOL_MAX_KEEPALIVE", "10"))
+DIFY_CONNECT_TIMEOUT = float(os.getenv("DIFY_CONNECT_TIMEOUT", "10"))
+DIFY_READ_TIMEOUT = float(os.getenv("DIFY_READ_TIMEOUT", "300"))
+
+_dify_client = None
+_app_slots = {}
+_app_slots_loop = None
+_app_stats = {}
+
+class DifyError(Exception):
+    """A Dify API error response or an error event in a stream"""
+
+    def __init__(self, message: str, status_code: int = None, code: str = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.code = code
+
+class DifyBusyError(DifyError):
+    """The app already has DIFY_MAX_PENDING_PER_APP callers waiting for a slot"""
+
+def create_dify_client(transport: httpx.AsyncBaseTransport = None) -> httpx.AsyncClient:
+    """httpx client for the Dify API; transport can point it at a local stub server"""
+    return httpx.AsyncClient(
+        base_url=DIFY_API_URL,
+        timeout=httpx.Timeout(DIFY_READ_TIMEOUT, connect=DIFY_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=DIFY_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=DIFY_POOL_MAX_KEEPALIVE,
+        ),
+        transport=transport,
+    )
+
+async def init_dify_client(transport: httpx.AsyncBaseTransport = None) -> httpx.AsyncClient:
+    """Create the process-wide client; called from the FastAPI lifespan"""
+    global _dify_client
+    if _dify_client is not None:
+        await _dify_client.aclose()
+    _dify_client = create_dify_client(transport)
+    return _dify_client
+
+async def close_dify_client():
+    global _dify_client
+    if _dify_client is not None:
+        client, _dify_client = _dify_client, None
+        await client.aclose()
+
+def get_dify_client() -> httpx.AsyncClient:
+    """The process-wide client, created lazily when running outside the lifespan"""
+    global _dify_client
+    if _dify_client is None:
+        _dify_client = create_dify_client()
+    return _dify_client
+
+def dify_stats() -> dict:
+    return {
+        "config": {
+            "api_url": DIFY_API_URL,
+            "apps": sorted({"default", *DIFY_APP_KEYS}),
+            "max_concurrency_per_app": DIFY_MAX_CONCURRENCY_PER_APP,
+            "max_pending_per_app": DIFY_MAX_PENDING_PER_APP,
+        },
+        "apps": {app: dict(stats) for app, stats in _app_stats.items()},
+        "client_initialized": _dify_client is not None,
+    }
+
+def _app_key(app: str) -> str:
+    key = DIFY_APP_KEYS.get(app) or (DIFY_API_KEY if app == "default" else None)
+    if not key:
+        raise DifyError(f"No Dify API key configured for app {app}")
+    return key
+
+class _AppSlot:
+    """Holds one of the app's concurrency slots; refuses to queue past the pending limit"""
+
+    def __init__(self, app: str):
+        self.app = app
+        self.stats = _app_stats.setdefault(app, {"runs": 0, "errors": 0, "rejected": 0, "in_flight": 0, "waiting": 0})
+
+    async def __aenter__(self):
+        global _app_slots, _app_slots_loop
+        loop = asyncio.get_running_loop()
+        if _app_slots_loop is not loop:
+            _app_slots, _app_slots_loop = {}, loop
+        semaphore = _app_slots.setdefault(self.app, asyncio.Semaphore(max(1, DIFY_MAX_CONCURRENCY_PER_APP)))
+        if semaphore.locked() and self.stats["waiting"] >= DIFY_MAX_PENDING_PER_APP:
+            self.stats["rejected"] += 1
+            raise DifyBusyError(f"Dify app {self.app} is at capacity", status_code=503)
+        self.stats["waiting"] += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self.stats["waiting"] -= 1
+        self.semaphore = semaphore
+        self.stats["runs"] += 1
+        self.stats["in_flight"] += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.stats["in_flight"] -= 1
+        if exc_type is not None and not issubclass(exc_type, (GeneratorExit, asyncio.CancelledError)):
+            self.stats["errors"] += 1
+        self.semaphore.release()
+        return False
+
+def _error_from_response(response: httpx.Response) -> DifyError:
+    try:
+        body = response.json()
+    except ValueError:
+        body = {"message": response.text}
+    return DifyError(body.get("message") or response.reason_phrase, status_code=response.status_code, code=body.get("code"))
+
+async def sse_events(lines):
+    """Parse server-sent events from an async iterator of lines into their JSON data"""
+    event, data = None, []
+    async for line in lines:
+        if line == "":
+            if data:
+                payload = json.loads("\n".join(data))
+                if event and isinstance(payload, dict):
+                    payload.setdefault("event", event)
+                yield payload
+            event, data = None, []
+        elif line.startswith(":"):
+            continue
+        else:
+            field, _, value = line.partition(":")
+            value = value[1:] if value.startswith(" ") else value
+            if field == "data":
+                data.append(value)
+            elif field == "event":
+                event = value
+    if data:
+        yield json.loads("\n".join(data))
+
+async def _stream(path: str, body: dict, app: str):
+    headers = {"Authorization": f"Bearer {_app_key(app)}"}
+    async with _AppSlot(app):
+        async with get_dify_client().stream("POST", path, json={**body, "response_mode": "streaming"}, headers=headers) as response:
+            if response.status_code >= 400:
+                await response.aread()
+                raise _error_from_response(response)
+            # Pulled one event at a time: a slow consumer stops reads from the socket rather than
+            # buffering the run in memory
+            async for event in sse_events(response.aiter_lines()):
+                if event.get("event") == "ping":
+                    continue
+                if event.get("event") == "error":
+                    raise DifyError(event.get("message", "Dify stream error"), status_code=event.get("status"), code=event.get("code"))
+                yield event
+
+def stream_workflow(inputs: dict, user: str, app: str = "default"):
+    """
+    Events of a streaming workflow run (workflow_started, node_started, node_finished,
+    text_chunk, workflow_finished, ...) as dicts. Waits for one of the app's slots first;
+    the slot is held until the stream ends, so wrap it in contextlib.aclosing when a
+    consumer may stop early.
+    """
+    return _stream("/workflows/run", {"inputs": inputs, "user": user}, app)
+
+def stream_chat(query: str, user: str, inputs: dict = None, conversation_id: str = None, app: str = "default"):
+    """Events of a streaming chat/agent answer (message, agent_thought, message_end, ...)"""
+    body = {"query": query, "inputs": inputs or {}, "user": user}
+    if conversation_id:
+        body["conversation_id"] = conversation_id
+    return _stream("/chat-messages", body, app)
+
+async def run_workflow(inputs: dict, user: str, app: str = "default") -> dict:
+    """Stream a workflow run to completion and return its workflow_finished data"""
+    result = None
+    async for event in stream_workflow(inputs, user, app):
+        if event.get("event") == "workflow_finished":
+            result = event.get("data") or {}
+    if result is None:
+        raise DifyError("Workflow stream ended without workflow_finished")
+    if result.get("status") not in (None, "succeeded"):
+        raise DifyError(result.get("error") or f"Workflow {result.get('status')}", code=result.get("status"))
+    return result
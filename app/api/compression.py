@@ -0,0 +1,108 @@
+import os
+import zlib
+from starlette.datastructures import Headers, MutableHeaders
+
+# Response compression negotiated through Accept-Encoding. Bodies under COMPRESSION_MIN_SIZE
+# go out as-is; larger ones are compressed COMPRESSION_CHUNK_SIZE bytes at a time and sent
+# as they are produced, so the compressed body is never held whole. Streamed responses
+# (NDJSON) are flushed per message so records still reach the client as they are written.
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", "6"))
+COMPRESSION_CHUNK_SIZE = int(os.getenv("COMPRESSION_CHUNK_SIZE", str(64 * 1024)))
+if not 1 <= COMPRESSION_LEVEL <= 9:
+    raise ValueError("COMPRESSION_LEVEL must be between 1 and 9")
+
+# Content coding -> zlib wbits (gzip container, or the zlib format HTTP calls deflate)
+COMPRESSION_ENCODINGS = {"gzip": 31, "deflate": 15}
+EXCLUDED_CONTENT_TYPES = ("text/event-stream",)
+
+def negotiate_encoding(accept_encoding: str):
+    """Supported coding with the highest q-value in Accept-Encoding (gzip wins ties), or None"""
+    weights = {}
+    for item in (accept_encoding or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding:
+            weights[coding] = q
+    best, best_q = None, 0.0
+    for coding in COMPRESSION_ENCODINGS:
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+class CompressionMiddleware:
+    """ASGI middleware compressing response bodies with gzip or deflate"""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE, level: int = COMPRESSION_LEVEL, chunk_size: int = COMPRESSION_CHUNK_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = level
+        self.chunk_size = chunk_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        await self.app(scope, receive, _CompressingSend(send, encoding, self.minimum_size, self.level, self.chunk_size))
+
+class _CompressingSend:
+    def __init__(self, send, encoding, minimum_size, level, chunk_size):
+        self.send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.level = level
+        self.chunk_size = chunk_size
+        self.start = None
+        self.compressor = None
+        self.passthrough = False
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            # Held until the first body message shows whether to compress
+            self.start = message
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start is not None:
+            start, self.start = self.start, None
+            headers = MutableHeaders(raw=start["headers"])
+            eligible = "content-encoding" not in headers and not headers.get("content-type", "").startswith(EXCLUDED_CONTENT_TYPES)
+            if eligible:
+                headers.add_vary_header("Accept-Encoding")
+            if not eligible or self.encoding is None or (not more_body and len(body) < self.minimum_size):
+                self.passthrough = True
+            else:
+                self.compressor = zlib.compressobj(self.level, zlib.DEFLATED, COMPRESSION_ENCODINGS[self.encoding])
+                headers["Content-Encoding"] = self.encoding
+                if "content-length" in headers:
+                    del headers["content-length"]
+                # The compressed bytes differ from the identity representation
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    headers["ETag"] = "W/" + etag
+            await self.send(start)
+
+        if self.passthrough:
+            await self.send(message)
+            return
+
+        compress = self.compressor.compress
+        for offset in range(0, len(body), self.chunk_size):
+            chunk = compress(body[offset:offset + self.chunk_size])
+            if chunk:
+                await self.send({"type": "http.response.body", "body": chunk, "more_body": True})
+        tail = self.compressor.flush(zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH)
+        await self.send({"type": "http.response.body", "body": tail, "more_body": more_body})
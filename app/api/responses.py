@@ -0,0 +1,61 @@
+import hashlib
+import os
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+from pydantic_core import to_json
+from app.services.metrics import timed
+try:
+    import orjson
+except ImportError:  # optional: JSON_RESPONSE_BACKEND=orjson falls back to pydantic-core
+    orjson = None
+
+# Serializer for the large hedge responses. Endpoints return these response classes directly,
+# which skips FastAPI's jsonable_encoder walk over the nested dicts:
+#   pydantic - pydantic-core's compiled serializer (always available)
+#   orjson   - orjson, when installed
+JSON_RESPONSE_BACKENDS = ("pydantic", "orjson")
+JSON_RESPONSE_BACKEND = os.getenv("JSON_RESPONSE_BACKEND", "pydantic").lower()
+if JSON_RESPONSE_BACKEND not in JSON_RESPONSE_BACKENDS:
+    raise ValueError(f"JSON_RESPONSE_BACKEND must be one of {', '.join(JSON_RESPONSE_BACKENDS)}")
+
+class PydanticJSONResponse(JSONResponse):
+    """JSONResponse rendered by pydantic-core; NaN/inf become null as in the other backends"""
+    def render(self, content) -> bytes:
+        with timed("serialize"):
+            return to_json(content, inf_nan_mode="null", fallback=str)
+
+class TimedORJSONResponse(ORJSONResponse):
+    def render(self, content) -> bytes:
+        with timed("serialize"):
+            return super().render(content)
+
+def json_response_class():
+    if JSON_RESPONSE_BACKEND == "orjson" and orjson is not None:
+        return TimedORJSONResponse
+    return PydanticJSONResponse
+
+FastJSONResponse = json_response_class()
+
+def ndjson_line(record: dict) -> bytes:
+    """One NDJSON record"""
+    return to_json(record, inf_nan_mode="null", fallback=str) + b"\n"
+
+# ===== CONDITIONAL REQUESTS =====
+
+def response_etag(snapshot_digest: str, *variant) -> str:
+    """Strong ETag for a response built from a snapshot digest and the request parts that shape it"""
+    return '"%s"' % hashlib.blake2b(snapshot_digest.encode() + to_json(variant, fallback=str), digest_size=16).hexdigest()
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match uses the weak comparison, so W/ prefixes are ignored"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    return any(
+        (tag[2:] if tag.startswith("W/") else tag) == opaque
+        for tag in (t.strip() for t in if_none_match.split(","))
+    )
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
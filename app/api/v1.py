@@ -1,11 +1,120 @@
-from fastapi import APIRouter, HTTPException
-from app.models.payloads import HedgeInceptionInstruction
-from app.services.hedge_data import fetch_complete_hedge_data
+import asyncio
+import logging
+import os
+from collections import Counter
+from typing import Literal, Optional
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic_core import to_json
+from app.models.payloads import (
+    HedgeInceptionInstruction, HedgeInceptionBatch, HedgeSimulationRequest, ComprehensiveHedgeInceptionResponse
+)
+from app.api.responses import FastJSONResponse, ndjson_line, response_etag, etag_matches, not_modified
+from app.services.hedge_data import (
+    get_hedge_snapshot, invalidate_snapshots, snapshot_stats, snapshot_key, plan_selection, covered_stages, ALL_STAGES, FIELD_TABLES,
+    recent_snapshot_hash, snapshot_hash
+)
+from app.services.aggregate import allocate_hedge_order
+from app.services.idempotency import run_idempotent, idempotency_key, idempotency_stats, invalidate_idempotent_responses
+from app.services.simulation import simulate_scenarios
+from app.services.history import history_ndjson, HISTORY_PAGE_SIZE, HISTORY_MAX_PAGE_SIZE
+from app.config import HEDGE_SNAPSHOT_PLAN, HISTORY_TABLES
+from app.db.supabase_async import pool_stats
+from app.agents.dify_client import DifyBusyError, DifyError, dify_stats
+from app.agents.dify_cache import dify_cache_stats, hedge_inputs_hash, invalidate_dify_results, run_workflow_cached
+from app.db.query_plan import query_plan_stats
+from app.services.consolidated_fetch import fetch_mode, snapshot_plan
+from app.services.reference_data import invalidate_reference_data, reference_cache_stats, REFERENCE_TABLE_TTLS
+from app.services.fx_rates import fx_index_stats, refresh_fx_index
+from app.services.metrics import timed
+from app.services.response_format import compact_structured_response, project_fields
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-@router.post("/hedge/inception/validate-book")
-def validate_and_book_hedge_inception(payload: HedgeInceptionInstruction):
+STAGE_VALIDATION_KEYS = {"1a": "stage_1a", "1b": "stage_1b", "2": "stage_2"}
+# Dify app that reviews validated orders: a DIFY_APP_KEYS name ("default" uses DIFY_API_KEY)
+DIFY_REVIEW_APP = os.getenv("DIFY_REVIEW_APP", "default")
+# The allocation plan needs complete hedging state, so it is skipped when these tables are not fetched
+ALLOCATION_PLAN_TABLES = FIELD_TABLES["entity_groups.positions.hedging_state"]
+
+def parse_selection(stages: Optional[str], fields: Optional[str]):
+    """Parse the stages/fields query parameters into (stages, fields, tables, exclude)"""
+    stage_list = None if stages is None else tuple(s.strip().lower() for s in stages.split(",") if s.strip())
+    field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    try:
+        tables, exclude = plan_selection(stage_list, field_list)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if stage_list is None:
+        # Without stages, fields fetch only their own tables: validate and score the stages they cover
+        stage_list = covered_stages(tables)
+    return stage_list, field_list, tables, exclude
+
+def validation_sections(complete_hedge_data: dict, payload: HedgeInceptionInstruction, stage_list, tables) -> dict:
+    """validation_results, data_completeness and allocation_plan for a successful snapshot"""
+    # Waterfall distribution of this order across positions with capacity
+    with timed("validation"):
+        allocation_plan = None
+        if tables is None or ALLOCATION_PLAN_TABLES <= tables:
+            allocation_plan = allocate_hedge_order(
+                complete_hedge_data.get("entity_groups", []),
+                payload.hedge_amount_order,
+                complete_hedge_data.get("stage_1a_config", {}).get("waterfall_logic", {}).get("opening")
+            )
+        return {
+            "validation_results": perform_comprehensive_validations(complete_hedge_data, payload, stage_list),
+            "data_completeness": calculate_data_completeness(complete_hedge_data, stage_list),
+            "allocation_plan": allocation_plan,
+        }
+
+async def validate_book_ndjson(complete_hedge_data, formatted_data, payload, payload_echo, stage_list, tables):
+    """
+    NDJSON records for validate-book: a header (status, payload and complete_data without
+    entity_groups, so compact lookups arrive first), one record per entity group, then
+    validation_results, data_completeness and allocation_plan, and an end record. The snapshot
+    is fetched and structured before the first record, as for the JSON body; records are then
+    serialized one at a time, so the whole document is never held as one string. An
+    {"record": "error"} record ends a stream that failed part way.
+    """
+    groups = formatted_data.get("entity_groups") or []
+    yield ndjson_line({
+        "record": "header",
+        "status": "success",
+        "payload": payload_echo,
+        "entity_group_count": len(groups),
+        "complete_data": {k: v for k, v in formatted_data.items() if k != "entity_groups"},
+    })
+    try:
+        for index, group in enumerate(groups):
+            yield ndjson_line({"record": "entity_group", "index": index, "entity_group": group})
+        for name, section in validation_sections(complete_hedge_data, payload, stage_list, tables).items():
+            yield ndjson_line({"record": name, name: section})
+    except Exception as e:
+        logger.exception("Validate-book stream error")
+        yield ndjson_line({"record": "error", "message": str(e)})
+        return
+    yield ndjson_line({
+        "record": "end",
+        "entity_groups": len(groups),
+        "message": "Complete hedge data retrieval succeeded across all stages."
+    })
+
+@router.post(
+    "/hedge/inception/validate-book",
+    response_class=FastJSONResponse,
+    # Schema of the full response; the returned FastJSONResponse is not validated against it
+    responses={200: {"model": ComprehensiveHedgeInceptionResponse}}
+)
+async def validate_and_book_hedge_inception(
+    payload: HedgeInceptionInstruction,
+    response_format: Literal["full", "compact"] = "full",
+    stages: Optional[str] = None,
+    fields: Optional[str] = None,
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None)
+):
     """
     Complete hedge inception validation covering Stages 1A, 1B, and 2 data requirements
     
@@ -13,50 +122,388 @@ def validate_and_book_hedge_inception(payload: HedgeInceptionInstruction):
     - Stage 1A: Entity eligibility, buffer rules, waterfall logic, thresholds
     - Stage 1B: Allocation state, hedge relationships, CAR data
     - Stage 2: Booking model configuration, Murex books, hedge instruments
+
+    response_format=compact returns shared rows once and has positions reference them
+    by index (see complete_data.lookups), and echoes only the order identifiers.
+
+    stages (e.g. "1a,2") limits the queries run and the stages validated and scored;
+    fields (e.g. "entity_groups.positions.hedging_state") projects complete_data to
+    the listed dotted paths and fetches only the tables they are built from. Paths name
+    the full structure; with response_format=compact, the stage lists that projected refs
+    point to are included.
+
+    allocation_plan distributes hedge_amount_order across positions by waterfall priority,
+    capped by each position's available amount (null when hedging state was not fetched).
+
+    The body is serialized as built, without validation against a response model (see
+    app.api.responses); ComprehensiveHedgeInceptionResponse is the documented schema of the
+    full response, and compact or stage/field-selected responses are subsets of it.
+
+    Accept: application/x-ndjson streams the response as records (see validate_book_ndjson)
+    so clients can parse entity groups as they arrive and the server never holds the whole body.
+    The stream starts once the snapshot is structured, so it does not start sooner than the JSON body
+    on a cold snapshot.
+
+    Responses carry an ETag derived from the snapshot's content hash and the request; polling
+    clients sending it back in If-None-Match get 304 Not Modified while the data is unchanged,
+    answered from the recorded hash without loading the snapshot when it is recent.
+
+    A repeated instruction (same instruction_type, order_id, sub_order_id, payload and
+    query) within IDEMPOTENCY_TTL gets the first response back, marked Idempotent-Replayed.
     """
+    stage_list, field_list, tables, exclude = parse_selection(stages, fields)
+    stream = "application/x-ndjson" in (accept or "")
+    key = snapshot_key(payload.exposure_currency, payload.nav_type, payload.currency_type, payload.hedge_method, tables)
+    # Everything besides the snapshot that shapes the body
+    variant = (payload.dict(), response_format, stage_list, field_list, stream)
+    digest = recent_snapshot_hash(key) if if_none_match else None
+    if digest:
+        etag = response_etag(digest, *variant)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+
+    async def respond(if_none_match=None):
+        try:
+            with timed("snapshot"):
+                complete_hedge_data = await get_hedge_snapshot(
+                    exposure_currency=payload.exposure_currency,
+                    hedge_method=payload.hedge_method,
+                    nav_type=payload.nav_type,
+                    currency_type=payload.currency_type,
+                    tables=tables
+                )
+        
+            payload_echo = payload.dict()
+            if response_format == "compact":
+                payload_echo = {"order_id": payload.order_id, "sub_order_id": payload.sub_order_id}
+
+            # Check if there was an error in data retrieval
+            if "error" in complete_hedge_data:
+                response = {
+                    "status": "error",
+                    "complete_data": complete_hedge_data,
+                    "payload": payload_echo,
+                    "message": f"Complete data retrieval failed: {complete_hedge_data['error']}"
+                }
+                if stream:
+                    return StreamingResponse(iter([ndjson_line({"record": "header", **response})]), media_type="application/x-ndjson")
+                # Not stored for idempotent replay: a retry should retry Supabase
+                return FastJSONResponse(response, headers={"Cache-Control": "no-store"})
+
+            etag = response_etag(snapshot_hash(key, complete_hedge_data), *variant)
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
+
+            # Field paths name the full structure: project first, then compact against the full snapshot
+            formatted_data = project_fields(complete_hedge_data, field_list, exclude)
+            if response_format == "compact":
+                formatted_data = compact_structured_response(formatted_data, complete_hedge_data)
+
+            if stream:
+                return StreamingResponse(
+                    validate_book_ndjson(complete_hedge_data, formatted_data, payload, payload_echo, stage_list, tables),
+                    media_type="application/x-ndjson",
+                    headers={"ETag": etag}
+                )
+
+            # Validations, completeness scores and allocation plan across the requested stages
+            sections = validation_sections(complete_hedge_data, payload, stage_list, tables)
+
+            return FastJSONResponse({
+                "status": "success",
+                "complete_data": formatted_data,
+                "payload": payload_echo,
+                **sections,
+                "message": "Complete hedge data retrieval succeeded across all stages."
+            }, headers={"ETag": etag})
+        
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Internal server error: {str(e)}"
+            )
+
+    if stream:
+        return await respond(if_none_match)
+
+    # FPM retries get the stored response; duplicates in flight wait on the first execution
+    response = await run_idempotent(idempotency_key(payload.dict(), response_format, stage_list, field_list), respond)
+    etag = response.headers.get("etag")
+    if etag and etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    return response
+
+@router.post("/hedge/inception/validate-book/batch", response_class=FastJSONResponse)
+async def validate_and_book_hedge_inception_batch(
+    batch: HedgeInceptionBatch,
+    response_format: Literal["full", "compact"] = "full"
+):
+    """
+    Validate a batch of hedge inception instructions.
+
+    Instructions are grouped by (exposure_currency, nav_type, currency_type, hedge_method);
+    each group's hedge data is fetched once and every instruction is validated against it.
+    Results are returned in request order, each with its own status.
+    """
+    format_snapshot = compact_structured_response if response_format == "compact" else (lambda data: data)
     try:
-        complete_hedge_data = fetch_complete_hedge_data(
+        group_keys = list(dict.fromkeys(
+            snapshot_key(i.exposure_currency, i.nav_type, i.currency_type, i.hedge_method)
+            for i in batch.instructions
+        ))
+        snapshots = await asyncio.gather(*(
+            get_hedge_snapshot(
+                exposure_currency=key[0],
+                hedge_method=key[3],
+                nav_type=key[1],
+                currency_type=key[2]
+            )
+            for key in group_keys
+        ))
+        group_ids = {key: group_id for group_id, key in enumerate(group_keys)}
+
+        results = []
+        for index, payload in enumerate(batch.instructions):
+            group_id = group_ids[snapshot_key(payload.exposure_currency, payload.nav_type, payload.currency_type, payload.hedge_method)]
+            complete_hedge_data = snapshots[group_id]
+            item = {
+                "index": index,
+                "order_id": payload.order_id,
+                "sub_order_id": payload.sub_order_id,
+                "group_id": group_id,
+            }
+            if "error" in complete_hedge_data:
+                item.update({
+                    "status": "error",
+                    "message": f"Complete data retrieval failed: {complete_hedge_data['error']}"
+                })
+            else:
+                try:
+                    item.update({
+                        "status": "success",
+                        "validation_results": perform_comprehensive_validations(complete_hedge_data, payload),
+                        "data_completeness": calculate_data_completeness(complete_hedge_data),
+                        "message": "Complete hedge data retrieval succeeded across all stages."
+                    })
+                except Exception as e:
+                    item.update({"status": "error", "message": f"Validation failed: {str(e)}"})
+            results.append(item)
+
+        succeeded = sum(1 for r in results if r["status"] == "success")
+        group_sizes = Counter(r["group_id"] for r in results)
+        return FastJSONResponse({
+            "status": "success" if succeeded == len(results) else ("partial" if succeeded else "error"),
+            "total": len(results),
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded,
+            "groups": [
+                {
+                    "group_id": group_ids[key],
+                    "exposure_currency": key[0],
+                    "nav_type": key[1],
+                    "currency_type": key[2],
+                    "hedge_method": key[3],
+                    "instruction_count": group_sizes[group_ids[key]],
+                    "complete_data": format_snapshot(snapshots[group_ids[key]])
+                }
+                for key in group_keys
+            ],
+            "results": results,
+            "message": f"Validated {len(results)} instructions across {len(group_keys)} data groups."
+        })
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Internal server error: {str(e)}"
+        )
+
+@router.post("/hedge/inception/simulate", response_class=FastJSONResponse)
+async def simulate_hedge_inception(payload: HedgeSimulationRequest):
+    """
+    What-if check before submitting to FPM: every hedge amount under every rate shock is
+    evaluated against one (cached) snapshot, returning capacity, utilisation and the USD PB
+    threshold result per scenario.
+    """
+    try:
+        complete_hedge_data = await get_hedge_snapshot(
             exposure_currency=payload.exposure_currency,
             hedge_method=payload.hedge_method,
-            hedge_amount_order=payload.hedge_amount_order,
-            order_id=payload.order_id,
             nav_type=payload.nav_type,
             currency_type=payload.currency_type
         )
-        
-        # Check if there was an error in data retrieval
         if "error" in complete_hedge_data:
-            return {
+            return FastJSONResponse({
                 "status": "error",
-                "complete_data": complete_hedge_data,
                 "payload": payload.dict(),
                 "message": f"Complete data retrieval failed: {complete_hedge_data['error']}"
-            }
-        
-        # Perform comprehensive validations across all stages
-        validation_results = perform_comprehensive_validations(complete_hedge_data, payload)
-        
-        # Calculate data completeness scores
-        data_completeness = calculate_data_completeness(complete_hedge_data)
-        
-        return {
+            })
+
+        simulation = simulate_scenarios(
+            complete_hedge_data, payload.exposure_currency, payload.hedge_amounts, payload.rate_shocks
+        )
+        return FastJSONResponse({
             "status": "success",
-            "complete_data": complete_hedge_data,
             "payload": payload.dict(),
-            "validation_results": validation_results,
-            "data_completeness": data_completeness,
-            "message": "Complete hedge data retrieval succeeded across all stages."
-        }
-        
+            "simulation": simulation,
+            "message": f"Evaluated {simulation['scenario_count']} scenarios, {simulation['passing_scenarios']} passing."
+        })
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Internal server error: {str(e)}"
+        )
+
+@router.post("/hedge/inception/agent-review", response_class=FastJSONResponse)
+async def review_hedge_inception(payload: HedgeInceptionInstruction):
+    """
+    Run the Dify review workflow (DIFY_REVIEW_APP) over an instruction's validation results,
+    completeness scores and allocation plan. Inputs are JSON strings named after those sections
+    plus "payload". Results are cached by the snapshot's content hash and the payload
+    (app.agents.dify_cache), so reviewing an unchanged order again does not call Dify.
+    """
+    try:
+        complete_hedge_data = await get_hedge_snapshot(
+            exposure_currency=payload.exposure_currency,
+            hedge_method=payload.hedge_method,
+            nav_type=payload.nav_type,
+            currency_type=payload.currency_type
+        )
+        payload_echo = payload.dict()
+        if "error" in complete_hedge_data:
+            return FastJSONResponse({
+                "status": "error",
+                "payload": payload_echo,
+                "message": f"Complete data retrieval failed: {complete_hedge_data['error']}"
+            })
+
+        sections = validation_sections(complete_hedge_data, payload, ALL_STAGES, None)
+        inputs = {name: to_json(value, fallback=str).decode() for name, value in {"payload": payload_echo, **sections}.items()}
+        key = snapshot_key(payload.exposure_currency, payload.nav_type, payload.currency_type, payload.hedge_method)
+        # The sections are computed from the snapshot and payload, so their hashes identify the inputs
+        content = hedge_inputs_hash(snapshot_hash(key, complete_hedge_data), payload_echo)
+        result = await run_workflow_cached(inputs, user=payload.order_id, app=DIFY_REVIEW_APP, content=content)
+
+    except DifyBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except DifyError as e:
+        raise HTTPException(status_code=502, detail=f"Dify review failed: {str(e)}")
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Internal server error: {str(e)}"
         )
 
-def perform_comprehensive_validations(complete_data: dict, payload: HedgeInceptionInstruction) -> dict:
+    return FastJSONResponse({
+        "status": "success",
+        "payload": payload_echo,
+        **sections,
+        "review": result.get("outputs"),
+        "workflow_run_id": result.get("id"),
+        "message": "Dify review completed."
+    })
+
+@router.get("/hedge/history/{table}")
+async def stream_hedge_history(
+    table: str,
+    exposure_currency: str,
+    entity_id: Optional[str] = None,
+    nav_type: Optional[str] = None,
+    page_size: int = Query(HISTORY_PAGE_SIZE, ge=1, le=HISTORY_MAX_PAGE_SIZE),
+    max_rows: Optional[int] = Query(None, ge=1),
+    after_created_date: Optional[str] = None,
+    after_id: Optional[str] = None
+):
     """
-    Perform validations across Stages 1A, 1B, and 2
+    Full history of allocation_engine, hedge_instructions, hedge_business_events or
+    hedge_effectiveness as NDJSON, newest first. Pages are fetched by keyset on
+    (created_date, id) as the client reads, so memory stays bounded however long the
+    history. The final {"_end": ...} line carries the cursor to pass back as
+    after_created_date / after_id to resume.
+    """
+    if table not in HISTORY_TABLES:
+        raise HTTPException(status_code=404, detail=f"No history stream for table: {table}")
+    after = None
+    if after_id is not None:
+        after = (after_created_date, after_id)
+    params = {"exposure_currency": exposure_currency.upper(), "entity_id": entity_id, "nav_type": nav_type}
+    return StreamingResponse(
+        history_ndjson(table, params, page_size, after, max_rows),
+        media_type="application/x-ndjson"
+    )
+
+@router.get("/admin/supabase/pool")
+def supabase_pool_statistics():
+    """Connection pool and query concurrency statistics for the process-wide Supabase client"""
+    return pool_stats()
+
+@router.get("/admin/dify")
+def dify_statistics():
+    """Per-app run concurrency, queueing and rejection counts for the Dify client"""
+    return dify_stats()
+
+@router.get("/admin/query-plan")
+def query_plan_statistics():
+    """Hedge snapshot query plan: node dependencies, per-node timing totals and the last run's timeline"""
+    return {"fetch_mode": fetch_mode(), **query_plan_stats(snapshot_plan(HEDGE_SNAPSHOT_PLAN))}
+
+@router.get("/admin/cache/reference")
+def reference_cache_statistics():
+    """Hit/miss counters, size and per-table TTLs of the reference-data cache"""
+    return reference_cache_stats()
+
+@router.post("/admin/cache/reference/invalidate")
+def invalidate_reference_cache(table: Optional[str] = None):
+    """Drop cached reference rows for one table, or every table when none is given"""
+    if table is not None and table not in REFERENCE_TABLE_TTLS:
+        raise HTTPException(status_code=404, detail=f"Table {table} is not reference-cached")
+    return {"table": table, "invalidated": invalidate_reference_data(table)}
+
+@router.get("/admin/cache/fx-rates")
+def fx_rates_index_statistics():
+    """Age, coverage and load counters of the shared FX rates index"""
+    return fx_index_stats()
+
+@router.post("/admin/cache/fx-rates/refresh")
+async def refresh_fx_rates_index():
+    """Reload the FX rates index from currency_rates now"""
+    return await refresh_fx_index()
+
+@router.get("/admin/cache/snapshots")
+def snapshot_cache_statistics():
+    """Size, memory use, hit/stale/miss and single-flight coalescing counters of the snapshot cache"""
+    return snapshot_stats()
+
+@router.post("/admin/cache/snapshots/invalidate")
+def invalidate_snapshot_cache(exposure_currency: Optional[str] = None):
+    """Drop cached snapshots for one exposure currency, or all of them"""
+    currency = exposure_currency.upper() if exposure_currency else None
+    return {"exposure_currency": currency, "invalidated": invalidate_snapshots(currency)}
+
+@router.get("/admin/cache/idempotency")
+def idempotency_cache_statistics():
+    """Stored responses, replay hits and coalesced duplicates of the idempotency layer"""
+    return idempotency_stats()
+
+@router.post("/admin/cache/idempotency/invalidate")
+def invalidate_idempotency_cache(order_id: Optional[str] = None):
+    """Forget stored responses for one order, or all of them"""
+    return {"order_id": order_id, "invalidated": invalidate_idempotent_responses(order_id)}
+
+@router.get("/admin/cache/dify")
+def dify_cache_statistics():
+    """Memory and disk hit/miss counters of the Dify workflow result cache"""
+    return dify_cache_stats()
+
+@router.post("/admin/cache/dify/invalidate")
+def invalidate_dify_cache(workflow: Optional[str] = None):
+    """Drop cached Dify results for one workflow (app name), or all of them"""
+    return {"workflow": workflow, "invalidated": invalidate_dify_results(workflow)}
+
+def perform_comprehensive_validations(complete_data: dict, payload: HedgeInceptionInstruction, stages=ALL_STAGES) -> dict:
+    """
+    Perform validations across Stages 1A, 1B, and 2 (or only the requested stages)
     """
     validations = {
         # Stage 1A validations
@@ -87,77 +534,84 @@ def perform_comprehensive_validations(complete_data: dict, payload: HedgeIncepti
     }
     
     # Stage 1A Validations
-    if complete_data.get("entity_groups"):
-        validations["stage_1a"]["entity_check"] = True
-    else:
-        validations["errors"].append(f"No entities found for currency {payload.exposure_currency}")
-    
-    stage_1a_config = complete_data.get("stage_1a_config", {})
-    if stage_1a_config.get("buffer_configuration"):
-        validations["stage_1a"]["buffer_config_check"] = True
-    else:
-        validations["warnings"].append("No buffer configuration found")
-    
-    if stage_1a_config.get("waterfall_logic"):
-        validations["stage_1a"]["waterfall_config_check"] = True
-    else:
-        validations["warnings"].append("No waterfall logic configuration found")
-    
-    if stage_1a_config.get("hedging_framework"):
-        validations["stage_1a"]["hedging_framework_check"] = True
-    else:
-        validations["warnings"].append("No hedging framework configuration found")
-    
-    usd_pb_check = stage_1a_config.get("threshold_configuration", {}).get("usd_pb_check", {})
-    if usd_pb_check.get("status") == "PASS":
-        validations["stage_1a"]["usd_pb_check"] = True
-    else:
-        validations["warnings"].append(f"USD PB deposit check: {usd_pb_check.get('status', 'UNKNOWN')}")
-    
-    if stage_1a_config.get("system_configuration"):
-        validations["stage_1a"]["system_config_check"] = True
+    if "1a" in stages:
+        if complete_data.get("entity_groups"):
+            validations["stage_1a"]["entity_check"] = True
+        else:
+            validations["errors"].append(f"No entities found for currency {payload.exposure_currency}")
+    
+        stage_1a_config = complete_data.get("stage_1a_config", {})
+        if stage_1a_config.get("buffer_configuration"):
+            validations["stage_1a"]["buffer_config_check"] = True
+        else:
+            validations["warnings"].append("No buffer configuration found")
+    
+        if stage_1a_config.get("waterfall_logic"):
+            validations["stage_1a"]["waterfall_config_check"] = True
+        else:
+            validations["warnings"].append("No waterfall logic configuration found")
+    
+        if stage_1a_config.get("hedging_framework"):
+            validations["stage_1a"]["hedging_framework_check"] = True
+        else:
+            validations["warnings"].append("No hedging framework configuration found")
+    
+        usd_pb_check = stage_1a_config.get("threshold_configuration", {}).get("usd_pb_check", {})
+        if usd_pb_check.get("status") == "PASS":
+            validations["stage_1a"]["usd_pb_check"] = True
+        else:
+            validations["warnings"].append(f"USD PB deposit check: {usd_pb_check.get('status', 'UNKNOWN')}")
+    
+        if stage_1a_config.get("system_configuration"):
+            validations["stage_1a"]["system_config_check"] = True
     
     # Stage 1B Validations
-    stage_1b_data = complete_data.get("stage_1b_data", {})
-    if stage_1b_data.get("current_allocations"):
-        validations["stage_1b"]["allocation_data_check"] = True
-    else:
-        validations["warnings"].append("No current allocation data found")
+    if "1b" in stages:
+        stage_1b_data = complete_data.get("stage_1b_data", {})
+        if stage_1b_data.get("current_allocations"):
+            validations["stage_1b"]["allocation_data_check"] = True
+        else:
+            validations["warnings"].append("No current allocation data found")
     
-    if stage_1b_data.get("hedge_instructions_history"):
-        validations["stage_1b"]["hedge_history_check"] = True
+        if stage_1b_data.get("hedge_instructions_history"):
+            validations["stage_1b"]["hedge_history_check"] = True
     
-    if stage_1b_data.get("car_master_data"):
-        validations["stage_1b"]["car_data_check"] = True
-    else:
-        validations["warnings"].append("No CAR master data found")
+        if stage_1b_data.get("car_master_data"):
+            validations["stage_1b"]["car_data_check"] = True
+        else:
+            validations["warnings"].append("No CAR master data found")
     
-    if stage_1b_data.get("active_hedge_events"):
-        validations["stage_1b"]["active_events_check"] = True
+        if stage_1b_data.get("active_hedge_events"):
+            validations["stage_1b"]["active_events_check"] = True
     
     # Stage 2 Validations
-    stage_2_config = complete_data.get("stage_2_config", {})
-    if stage_2_config.get("booking_model_config"):
-        validations["stage_2"]["booking_model_check"] = True
-    else:
-        validations["warnings"].append("No booking model configuration found")
+    if "2" in stages:
+        stage_2_config = complete_data.get("stage_2_config", {})
+        if stage_2_config.get("booking_model_config"):
+            validations["stage_2"]["booking_model_check"] = True
+        else:
+            validations["warnings"].append("No booking model configuration found")
     
-    if stage_2_config.get("murex_books"):
-        validations["stage_2"]["murex_books_check"] = True
-    else:
-        validations["warnings"].append("No active Murex books found")
+        if stage_2_config.get("murex_books"):
+            validations["stage_2"]["murex_books_check"] = True
+        else:
+            validations["warnings"].append("No active Murex books found")
     
-    if stage_2_config.get("hedge_instruments"):
-        validations["stage_2"]["hedge_instruments_check"] = True
+        if stage_2_config.get("hedge_instruments"):
+            validations["stage_2"]["hedge_instruments_check"] = True
     
-    if stage_2_config.get("hedge_effectiveness"):
-        validations["stage_2"]["hedge_effectiveness_check"] = True
+        if stage_2_config.get("hedge_effectiveness"):
+            validations["stage_2"]["hedge_effectiveness_check"] = True
     
+    for stage in ALL_STAGES:
+        if stage not in stages:
+            del validations[STAGE_VALIDATION_KEYS[stage]]
+
     return validations
 
-def calculate_data_completeness(complete_data: dict) -> dict:
+def calculate_data_completeness(complete_data: dict, stages=ALL_STAGES) -> dict:
     """
-    Calculate completeness scores for each stage
+    Calculate completeness scores for each stage (or only the requested stages)
     """
     stage_1a_tables = ["buffer_configuration", "waterfall_logic", "hedging_framework", "system_configuration", "overlay_configuration"]
     stage_1b_tables = ["current_allocations", "hedge_instructions_history", "active_hedge_events", "car_master_data"]
@@ -169,16 +623,17 @@ def calculate_data_completeness(complete_data: dict) -> dict:
         present_tables = sum(1 for table in required_tables if config_data.get(table))
         return (present_tables / len(required_tables)) * 100
     
-    stage_1a_score = calculate_stage_completeness(complete_data.get("stage_1a_config", {}), stage_1a_tables)
-    stage_1b_score = calculate_stage_completeness(complete_data.get("stage_1b_data", {}), stage_1b_tables)
-    stage_2_score = calculate_stage_completeness(complete_data.get("stage_2_config", {}), stage_2_tables)
+    stage_scores = {
+        "1a": lambda: calculate_stage_completeness(complete_data.get("stage_1a_config", {}), stage_1a_tables),
+        "1b": lambda: calculate_stage_completeness(complete_data.get("stage_1b_data", {}), stage_1b_tables),
+        "2": lambda: calculate_stage_completeness(complete_data.get("stage_2_config", {}), stage_2_tables),
+    }
+    scores = {stage: stage_scores[stage]() for stage in ALL_STAGES if stage in stages}
     
-    overall_score = (stage_1a_score + stage_1b_score + stage_2_score) / 3
+    overall_score = sum(scores.values()) / len(scores) if scores else 0.0
     
     return {
-        "stage_1a_completeness": round(stage_1a_score, 1),
-        "stage_1b_completeness": round(stage_1b_score, 1), 
-        "stage_2_completeness": round(stage_2_score, 1),
+        **{f"{STAGE_VALIDATION_KEYS[stage]}_completeness": round(score, 1) for stage, score in scores.items()},
         "overall_completeness": round(overall_score, 1),
         "total_entities": len(complete_data.get("entity_groups", [])),
         "currency_data_complete": bool(complete_data.get("currency_configuration")),
@@ -0,0 +1,214 @@
+from app.db.query_plan import TableSpec, param
+from app.services.fx_rates import currency_rate_rows, proxy_rate_rows
+from app.services.usd_pb import fetch_usd_pb_deposit_rows
+
+# ===== HEDGE SNAPSHOT QUERY PLAN =====
+# Every table the hedge snapshot reads. Params: exposure_currency, nav_type, currency_type,
+# hedge_method, today. Nodes run concurrently unless depends_on says otherwise; rows are
+# returned keyed by node name. Adding a table to the snapshot means adding a spec here.
+
+def _entity_select(context):
+    # An inner join filters entities to the requested currency_type
+    if context.get("currency_type"):
+        return "*, currency_configuration!inner(currency_type)"
+    return "*, currency_configuration(currency_type)"
+
+def _entity_ids(context):
+    ids = {e["entity_id"] for e in context["entity_master"] if e.get("entity_id")} or {
+        p["entity_id"] for p in context["position_nav_master"] if p.get("entity_id")
+    }
+    return sorted(ids) or None
+
+def _hedge_instrument_pairs(context):
+    # Exact matches only (no .cs / @>): base, quote or either SGD pair
+    ccy = context["exposure_currency"]
+    return f"base_currency.eq.{ccy},quote_currency.eq.{ccy},currency_pair.in.({ccy}SGD,SGD{ccy})"
+
+HEDGE_SNAPSHOT_PLAN = (
+    # ===== CORE ENTITY AND POSITION DATA =====
+    TableSpec(
+        "entity_master",
+        select=_entity_select,
+        filters=(
+            ("eq", "currency_code", param("exposure_currency")),
+            ("eq", "currency_configuration.currency_type", param("currency_type")),
+        ),
+        stage="1a",
+    ),
+    TableSpec(
+        "position_nav_master",
+        filters=(("eq", "currency_code", param("exposure_currency")), ("eq", "nav_type", param("nav_type"))),
+        stage="1a",
+    ),
+
+    # ===== STAGE 1A: CONFIGURATION TABLES =====
+    TableSpec(
+        "buffer_configuration",
+        filters=(("eq", "currency_code", param("exposure_currency")), ("eq", "active_flag", "Y")),
+        stage="1a",
+    ),
+    TableSpec(
+        "waterfall_logic_configuration",
+        filters=(("eq", "active_flag", "Y"),),
+        order=(("waterfall_type", False), ("priority_level", False)),
+        stage="1a",
+        cached=True,
+    ),
+    TableSpec(
+        "overlay_configuration",
+        filters=(("eq", "currency_code", param("exposure_currency")), ("eq", "active_flag", "Y")),
+        stage="1a",
+    ),
+    TableSpec(
+        "hedging_framework",
+        filters=(("eq", "currency_code", param("exposure_currency")), ("eq", "active_flag", "Y")),
+        stage="1a",
+    ),
+    TableSpec("system_configuration", filters=(("eq", "active_flag", "Y"),), stage="1a", cached=True),
+
+    # ===== STAGE 1A: THRESHOLD AND MONITORING =====
+    TableSpec(
+        "threshold_configuration",
+        filters=(("eq", "threshold_type", "USD_PB_DEPOSIT"), ("eq", "active_flag", "Y")),
+        stage="1a",
+        cached=True,
+    ),
+    # Aggregated server-side: one row instead of the whole deposit table
+    TableSpec("usd_pb_deposit", stage="1a", fetch=lambda context: fetch_usd_pb_deposit_rows()),
+    TableSpec(
+        "risk_monitoring",
+        filters=(("eq", "currency_code", param("exposure_currency")), ("eq", "resolution_status", "Open")),
+        order=(("measurement_timestamp", True),),
+    ),
+
+    # ===== STAGE 1B: ALLOCATION AND HEDGE DATA =====
+    TableSpec(
+        "allocation_engine",
+        filters=(("eq", "currency_code", param("exposure_currency")),),
+        order=(("created_date", True),),
+        limit=100,
+        stage="1b",
+    ),
+    TableSpec(
+        "hedge_instructions",
+        filters=(("eq", "exposure_currency", param("exposure_currency")),),
+        order=(("instruction_date", True), ("created_date", True)),
+        limit=50,
+        stage="1b",
+    ),
+    TableSpec(
+        "hedge_business_events",
+        filters=(("in_", "entity_id", _entity_ids), ("eq", "nav_type", param("nav_type"))),
+        order=(("trade_date", True), ("created_date", True)),
+        limit=50,
+        depends_on=("entity_master", "position_nav_master"),
+        stage="1b",
+    ),
+    TableSpec(
+        "car_master",
+        filters=(("eq", "currency_code", param("exposure_currency")),),
+        order=(("reporting_date", True),),
+        stage="1b",
+    ),
+
+    # ===== CURRENCY AND RATES DATA =====
+    TableSpec(
+        "currency_configuration",
+        filters=((
+            "or_", None,
+            lambda context: f"currency_code.eq.{context['exposure_currency']},proxy_currency.eq.{context['exposure_currency']}",
+        ),),
+    ),
+    TableSpec(
+        "proxy_configuration",
+        filters=(
+            ("eq", "exposure_currency", param("exposure_currency")),
+            ("eq", "active_flag", "Y"),
+            ("lte", "effective_date", param("today")),
+        ),
+        order=(("effective_date", True),),
+    ),
+    # Served from the shared FX rates index rather than queried per request
+    TableSpec(
+        "currency_rates",
+        fetch=lambda context: currency_rate_rows(context["exposure_currency"], limit=20),
+    ),
+    TableSpec(
+        "additional_rates",
+        table="currency_rates",
+        depends_on=("currency_configuration",),
+        fetch=lambda context: proxy_rate_rows(context["exposure_currency"], context["currency_configuration"], limit=10),
+    ),
+
+    # ===== STAGE 2: BOOKING AND EXECUTION =====
+    TableSpec(
+        "instruction_event_config",
+        filters=(
+            ("eq", "instruction_event", "Initiation"),
+            ("eq", "nav_type", param("nav_type")),
+            ("eq", "currency_type", param("currency_type")),
+        ),
+        stage="2",
+        cached=True,
+    ),
+    TableSpec("murex_book_config", filters=(("eq", "active_flag", True),), stage="2", cached=True),  # boolean per schema
+    TableSpec(
+        "hedge_instruments",
+        filters=(
+            ("eq", "active_flag", "Y"),
+            ("lte", "effective_date", param("today")),
+            ("or_", None, _hedge_instrument_pairs),
+            ("eq", "currency_classification", param("currency_type")),
+            # Both or the exact nav_type / accounting method
+            ("in_", "nav_type_applicable", lambda context: ["Both", context["nav_type"]] if context.get("nav_type") else ["Both", "COI", "RE"]),
+            ("in_", "accounting_method_supported", lambda context: ["Both", context["hedge_method"]] if context.get("hedge_method") else ["Both", "COH", "MTM"]),
+        ),
+        order=(("effective_date", True),),
+        stage="2",
+    ),
+    TableSpec(
+        "hedge_effectiveness",
+        filters=(("eq", "currency_code", param("exposure_currency")),),
+        order=(("measurement_date", True),),
+        limit=10,
+        stage="2",
+    ),
+)
+
+# ===== HISTORY STREAMS =====
+# Tables whose full history is streamed by keyset pagination on (created_date, id). Params:
+# exposure_currency, entity_id, nav_type; depends_on names HEDGE_SNAPSHOT_PLAN nodes.
+
+def _currency_entity_ids(context):
+    # An empty list (no entities) must match nothing rather than drop the filter
+    return sorted({e["entity_id"] for e in context["entity_master"] if e.get("entity_id")})
+
+HISTORY_TABLES = {
+    spec.name: spec for spec in (
+        TableSpec(
+            "allocation_engine",
+            filters=(
+                ("eq", "currency_code", param("exposure_currency")),
+                ("eq", "entity_id", param("entity_id")),
+                ("eq", "nav_type", param("nav_type")),
+            ),
+        ),
+        TableSpec(
+            "hedge_instructions",
+            filters=(("eq", "exposure_currency", param("exposure_currency")),),
+        ),
+        TableSpec(
+            "hedge_business_events",
+            filters=(
+                ("in_", "entity_id", _currency_entity_ids),
+                ("eq", "entity_id", param("entity_id")),
+                ("eq", "nav_type", param("nav_type")),
+            ),
+            depends_on=("entity_master",),
+        ),
+        TableSpec(
+            "hedge_effectiveness",
+            filters=(("eq", "currency_code", param("exposure_currency")),),
+        ),
+    )
+}
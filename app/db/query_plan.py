@@ -0,0 +1,184 @@
+import time
+from collections import defaultdict
+from dataclasses import dataclass, replace
+from typing import Callable, Optional, Tuple
+from app.db.supabase_async import get_async_client, execute, QueryTasks
+from app.services.reference_data import execute_reference
+from app.services.metrics import record_timing
+
+@dataclass
+class TableSpec:
+    """
+    One node of a query plan: a PostgREST query (or a custom fetch) whose rows are stored under name.
+
+    select, and the value of each (operator, column, value) filter, may be callables taking the
+    node context (the plan params plus the rows of depends_on); a filter whose value resolves to
+    None is skipped. A column of None calls the operator with the value alone (e.g. or_).
+    """
+    name: str
+    table: Optional[str] = None                     # defaults to name
+    select: object = "*"
+    filters: Tuple[tuple, ...] = ()
+    order: Tuple[Tuple[str, bool], ...] = ()        # (column, descending)
+    limit: Optional[int] = None
+    depends_on: Tuple[str, ...] = ()
+    stage: Optional[str] = None
+    cached: bool = False                            # served through the reference-data cache
+    fetch: Optional[Callable] = None                # async fetch(context) -> rows, replaces the query
+
+    def __post_init__(self):
+        if self.table is None:
+            self.table = self.name
+
+def param(name: str) -> Callable:
+    """Filter value read from the plan params / node context"""
+    return lambda context: context.get(name)
+
+def plan_order(plan) -> list:
+    """Specs in dependency order; raises ValueError on unknown dependencies or cycles"""
+    specs = {spec.name: spec for spec in plan}
+    ordered, state = [], {}
+
+    def visit(name, path):
+        if state.get(name) == "done":
+            return
+        if state.get(name) == "visiting":
+            raise ValueError(f"Query plan cycle: {' -> '.join(path + (name,))}")
+        if name not in specs:
+            raise ValueError(f"Query plan node {path[-1]} depends on unknown node {name}")
+        state[name] = "visiting"
+        for dep in specs[name].depends_on:
+            visit(dep, path + (name,))
+        state[name] = "done"
+        ordered.append(specs[name])
+
+    for name in specs:
+        visit(name, ())
+    return ordered
+
+def plan_tables(plan, tables) -> frozenset:
+    """tables plus the tables of every node the selected nodes depend on"""
+    specs = {spec.name: spec for spec in plan}
+    needed = set(tables)
+    while True:
+        deps = {specs[dep].table for spec in plan if spec.table in needed for dep in spec.depends_on}
+        if deps <= needed:
+            return frozenset(needed)
+        needed |= deps
+
+def build_query(db, spec: TableSpec, context: dict):
+    select = spec.select(context) if callable(spec.select) else spec.select
+    query = db.table(spec.table).select(select)
+    for operator, column, value in spec.filters:
+        value = value(context) if callable(value) else value
+        if value is None:
+            continue
+        query = getattr(query, operator)(value) if column is None else getattr(query, operator)(column, value)
+    for column, desc in spec.order:
+        query = query.order(column, desc=desc)
+    if spec.limit is not None:
+        query = query.limit(spec.limit)
+    return query
+
+# ===== EXECUTION =====
+_node_stats = defaultdict(lambda: {"runs": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0})
+_last_run = {}
+
+async def run_query_plan(plan, params: dict, tables=None, db=None):
+    """
+    Run every node (or those whose table is in tables) as soon as its dependencies finish.
+    Returns (rows by node name, timings by node name); timings are milliseconds relative
+    to the start of the plan: started once dependencies were ready, then duration.
+    """
+    nodes = [spec for spec in plan_order(plan) if tables is None or spec.table in tables]
+    db = db or get_async_client()
+    plan_start = time.perf_counter()
+    timings = {}
+    tasks = {}
+
+    async def run_node(spec):
+        context = dict(params)
+        for dep in spec.depends_on:
+            context[dep] = await tasks[dep] if dep in tasks else []
+        started = time.perf_counter()
+        stats = _node_stats[spec.name]
+        stats["runs"] += 1
+        try:
+            if spec.fetch is not None:
+                rows = await spec.fetch(context)
+            else:
+                query = build_query(db, spec, context)
+                rows = await (execute_reference if spec.cached else execute)(query)
+        except Exception:
+            stats["errors"] += 1
+            raise
+        duration = (time.perf_counter() - started) * 1000
+        stats["total_ms"] += duration
+        stats["max_ms"] = max(stats["max_ms"], duration)
+        stats["rows"] += len(rows)
+        record_timing(f"db.{spec.name}", duration / 1000)
+        timings[spec.name] = {
+            "started_ms": round((started - plan_start) * 1000, 2),
+            "duration_ms": round(duration, 2),
+            "rows": len(rows),
+        }
+        return rows
+
+    async with QueryTasks() as running:
+        for spec in nodes:
+            tasks[spec.name] = running.start(run_node(spec))
+        results = {name: await task for name, task in tasks.items()}
+
+    timings["total_ms"] = round((time.perf_counter() - plan_start) * 1000, 2)
+    _last_run.clear()
+    _last_run.update(timings)
+    return results, timings
+
+def query_plan_stats(plan=()) -> dict:
+    """The plan's nodes with their dependencies, per-node timing totals and the last run's timeline"""
+    return {
+        "nodes": {
+            spec.name: {
+                "table": spec.table,
+                "stage": spec.stage,
+                "depends_on": list(spec.depends_on),
+                "cached": spec.cached,
+                **{key: round(value, 2) for key, value in _node_stats[spec.name].items()},
+            }
+            for spec in plan
+        },
+        "last_run": dict(_last_run),
+    }
+
+# ===== KEYSET PAGINATION =====
+def _quoted(value) -> str:
+    # PostgREST logical-operator values may contain , : ( ) once double-quoted
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+async def keyset_pages(spec: TableSpec, context: dict, page_size: int, after=None, db=None):
+    """
+    Yield pages of spec's rows newest first, keyset-paginated on (created_date, id) so each page is
+    one indexed range query however deep the history. Rows with no created_date come last.
+    after=(created_date, id) resumes after that row.
+    """
+    db = db or get_async_client()
+    cursor = after
+    while True:
+        query = build_query(db, replace(spec, order=(), limit=None), context)
+        query = query.order("created_date", desc=True, nullsfirst=False).order("id", desc=True)
+        if cursor is not None:
+            created_date, row_id = cursor
+            if created_date is None:
+                query = query.is_("created_date", "null").lt("id", row_id)
+            else:
+                query = query.or_(
+                    f"created_date.lt.{_quoted(created_date)},"
+                    f"and(created_date.eq.{_quoted(created_date)},id.lt.{_quoted(row_id)}),"
+                    f"created_date.is.null"
+                )
+        rows = await execute(query.limit(page_size))
+        if rows:
+            yield rows
+        if len(rows) < page_size:
+            return
+        cursor = (rows[-1].get("created_date"), rows[-1].get("id"))
@@ -0,0 +1,153 @@
+import asyncio
+import os
+import time
+import httpx
+from postgrest import AsyncPostgrestClient
+from postgrest.constants import DEFAULT_POSTGREST_CLIENT_HEADERS
+from app.services.supabase_client import SUPABASE_URL, SUPABASE_KEY
+from app.services.metrics import observe_query, observe_postgrest_response, query_table
+
+# Upper bound on PostgREST queries in flight at once (per worker process)
+SUPABASE_MAX_CONCURRENCY = int(os.getenv("SUPABASE_MAX_CONCURRENCY", "10"))
+
+# Connection pool tuning for the process-wide client
+SUPABASE_POOL_MAX_CONNECTIONS = int(os.getenv("SUPABASE_POOL_MAX_CONNECTIONS", "20"))
+SUPABASE_POOL_MAX_KEEPALIVE = int(os.getenv("SUPABASE_POOL_MAX_KEEPALIVE", "10"))
+SUPABASE_POOL_KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_POOL_KEEPALIVE_EXPIRY", "60"))
+SUPABASE_HTTP2 = os.getenv("SUPABASE_HTTP2", "false").lower() in ("1", "true", "yes")
+SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "30"))
+
+_async_client = None
+_query_semaphore = None
+_query_semaphore_loop = None
+_query_stats = {"total": 0, "errors": 0, "in_flight": 0, "peak_in_flight": 0, "waiting": 0}
+
+def create_async_client(transport: httpx.AsyncBaseTransport = None) -> AsyncPostgrestClient:
+    """Async PostgREST client pointed at the Supabase REST endpoint, backed by a tuned keep-alive pool"""
+    http_client = httpx.AsyncClient(
+        http2=SUPABASE_HTTP2,
+        timeout=httpx.Timeout(SUPABASE_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=SUPABASE_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=SUPABASE_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=SUPABASE_POOL_KEEPALIVE_EXPIRY,
+        ),
+        follow_redirects=True,
+        transport=transport,
+        event_hooks={"response": [observe_postgrest_response]},
+    )
+    return AsyncPostgrestClient(
+        f"{SUPABASE_URL}/rest/v1",
+        headers={
+            **DEFAULT_POSTGREST_CLIENT_HEADERS,
+            "apiKey": SUPABASE_KEY,
+            "Authorization": f"Bearer {SUPABASE_KEY}",
+        },
+        http_client=http_client,
+    )
+
+async def init_async_client(transport: httpx.AsyncBaseTransport = None) -> AsyncPostgrestClient:
+    """Create the process-wide client; called from the FastAPI lifespan"""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+    _async_client = create_async_client(transport)
+    return _async_client
+
+async def close_async_client():
+    """Close the process-wide client and drain its connection pool"""
+    global _async_client
+    if _async_client is not None:
+        client, _async_client = _async_client, None
+        await client.aclose()
+
+def get_async_client() -> AsyncPostgrestClient:
+    """The process-wide client, created lazily when running outside the lifespan (scripts, shells)"""
+    global _async_client
+    if _async_client is None:
+        _async_client = create_async_client()
+    return _async_client
+
+def pool_stats() -> dict:
+    """Connection pool and query concurrency statistics for sizing the pool under load"""
+    connections = []
+    if _async_client is not None:
+        pool = getattr(_async_client.session, "_transport", None)
+        pool = getattr(pool, "_pool", pool)
+        connections = list(getattr(pool, "connections", []) or [])
+
+    return {
+        "config": {
+            "max_connections": SUPABASE_POOL_MAX_CONNECTIONS,
+            "max_keepalive_connections": SUPABASE_POOL_MAX_KEEPALIVE,
+            "keepalive_expiry": SUPABASE_POOL_KEEPALIVE_EXPIRY,
+            "http2": SUPABASE_HTTP2,
+            "max_concurrent_queries": SUPABASE_MAX_CONCURRENCY,
+        },
+        "connections": {
+            "total": len(connections),
+            "idle": sum(1 for c in connections if c.is_idle()),
+            "active": sum(1 for c in connections if not c.is_idle() and not c.is_closed()),
+            "available": sum(1 for c in connections if c.is_available()),
+        },
+        "queries": dict(_query_stats),
+        "client_initialized": _async_client is not None,
+    }
+
+def _get_query_semaphore() -> asyncio.Semaphore:
+    # One semaphore per event loop so the bound holds across all requests in a worker
+    global _query_semaphore, _query_semaphore_loop
+    loop = asyncio.get_running_loop()
+    if _query_semaphore is None or _query_semaphore_loop is not loop:
+        _query_semaphore = asyncio.Semaphore(max(1, SUPABASE_MAX_CONCURRENCY))
+        _query_semaphore_loop = loop
+    return _query_semaphore
+
+async def execute(query) -> list:
+    """Execute a built query under the concurrency bound and return its rows"""
+    semaphore = _get_query_semaphore()
+    _query_stats["waiting"] += 1
+    try:
+        await semaphore.acquire()
+    finally:
+        _query_stats["waiting"] -= 1
+
+    _query_stats["total"] += 1
+    _query_stats["in_flight"] += 1
+    _query_stats["peak_in_flight"] = max(_query_stats["peak_in_flight"], _query_stats["in_flight"])
+    table = query_table(query.path)
+    started = time.perf_counter()
+    try:
+        result = await query.execute()
+    except Exception:
+        _query_stats["errors"] += 1
+        observe_query(table, time.perf_counter() - started)
+        raise
+    finally:
+        _query_stats["in_flight"] -= 1
+        semaphore.release()
+    rows = getattr(result, "data", []) or []
+    observe_query(table, time.perf_counter() - started, len(rows))
+    return rows
+
+class QueryTasks:
+    """Starts query tasks and cancels whichever are still running on exit"""
+
+    def __init__(self):
+        self._tasks = []
+
+    def start(self, coro) -> asyncio.Task:
+        task = asyncio.ensure_future(coro)
+        self._tasks.append(task)
+        return task
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        for task in self._tasks:
+            if not task.done():
+                task.cancel()
+        # Retrieve every outcome so failed siblings don't log "exception never retrieved"
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        return False
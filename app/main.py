@@ -1,9 +1,36 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from app.api.v1 import router as api_v1_router
+from app.api.compression import CompressionMiddleware
+from app.db.supabase_async import init_async_client, close_async_client
+from app.agents.dify_client import init_dify_client, close_dify_client
+from app.agents.dify_cache import close_disk_cache
+from app.services.metrics import InstrumentationMiddleware, render_metrics
 
-app = FastAPI(title="HAWK Hedge Orchestration API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled Supabase client per worker for the life of the process
+    await init_async_client()
+    await init_dify_client()
+    try:
+        yield
+    finally:
+        await close_dify_client()
+        close_disk_cache()
+        await close_async_client()
+
+app = FastAPI(title="HAWK Hedge Orchestration API", lifespan=lifespan)
+app.add_middleware(CompressionMiddleware)
+# Added last so it is outermost and its timings cover the whole middleware stack
+app.add_middleware(InstrumentationMiddleware)
 app.include_router(api_v1_router, prefix="/api/v1")
 
 @app.get("/")
 def healthcheck():
     return {"status": "ok", "message": "HAWK API is running"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text exposition of query, stage and request metrics"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
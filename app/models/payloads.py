@@ -40,7 +40,42 @@ class HedgeInceptionInstruction(BaseModel):
             }
         }
 
+class HedgeInceptionBatch(BaseModel):
+    """Batch of FPM instructions validated together; instructions sharing a data key share one fetch"""
+    instructions: List[HedgeInceptionInstruction] = Field(..., min_length=1, max_length=1000, description="Instructions in FPM order")
+
+class HedgeSimulationRequest(BaseModel):
+    """What-if grid: every hedge amount evaluated under every rate shock against one snapshot"""
+    exposure_currency: str = Field(..., min_length=3, max_length=3, description="Exposure currency")
+    hedge_method: Literal["COH", "MT"] = Field(..., description="FPM accounting method (COH/MT)")
+    nav_type: Optional[Literal["COI", "RE", "RE_Reserve"]] = Field(None, description="NAV type filter (COI/RE/RE_Reserve)")
+    currency_type: Optional[Literal["Matched", "Mismatched", "Mismatched_with_Proxy"]] = Field(None, description="Currency type filter")
+    hedge_amounts: List[float] = Field(..., min_length=1, max_length=1000, description="Candidate hedge_amount_order values")
+    rate_shocks: List[float] = Field([0.0], min_length=1, max_length=100, description="Relative rate moves, e.g. -0.05 for -5%")
+
+    @validator('exposure_currency')
+    def validate_exposure_currency(cls, v):
+        """Validate exposure currency is uppercase"""
+        return v.upper()
+
+    @validator('hedge_amounts')
+    def validate_hedge_amounts(cls, v):
+        """Validate every hedge amount is positive"""
+        if any(amount <= 0 for amount in v):
+            raise ValueError('Hedge amounts must be positive')
+        return v
+
+    @validator('rate_shocks')
+    def validate_rate_shocks(cls, v):
+        """A shock of -100% or worse leaves no rate"""
+        if any(shock <= -1 for shock in v):
+            raise ValueError('Rate shocks must be greater than -1')
+        return v
+
 # New comprehensive response models
+# These describe the full response (response_format=full, no stages / fields selection);
+# compact and selected responses are documented in app.services.response_format and the endpoint.
+# Row fields are whatever the table holds, hence Dict[str, Any].
 
 class HedgingState(BaseModel):
     """Detailed hedging state for an entity position"""
@@ -91,6 +126,17 @@ class EntityGroup(BaseModel):
     parent_child_nav_link: bool
     positions: List[PositionInfo]
 
+class USDPBCheck(BaseModel):
+    """Model for USD PB deposit check results"""
+    total_usd_equivalent: float
+    threshold: float
+    status: Literal["PASS", "FAIL"]
+    excess_amount: float
+
+class ThresholdConfiguration(BaseModel):
+    usd_pb_threshold: float
+    usd_pb_check: USDPBCheck
+
 class Stage1AConfig(BaseModel):
     """Stage 1A configuration data"""
     buffer_configuration: List[Dict[str, Any]]
@@ -98,13 +144,13 @@ class Stage1AConfig(BaseModel):
     overlay_configuration: List[Dict[str, Any]]
     hedging_framework: List[Dict[str, Any]]
     system_configuration: List[Dict[str, Any]]
-    threshold_configuration: Dict[str, Any]
+    threshold_configuration: ThresholdConfiguration
 
 class Stage1BData(BaseModel):
     """Stage 1B allocation and hedge data"""
     current_allocations: List[Dict[str, Any]]
     hedge_instructions_history: List[Dict[str, Any]]
-    active_hedge_events: List[Dict[str, Any]]
+    active_hedge_events: Dict[str, List[Dict[str, Any]]]  # keyed by entity_id
     car_master_data: List[Dict[str, Any]]
 
 class Stage2Config(BaseModel):
@@ -161,6 +207,32 @@ class CompleteHedgeData(BaseModel):
     proxy_configuration: List[Dict[str, Any]]
     additional_rates: List[Dict[str, Any]]
 
+class AllocationTier(BaseModel):
+    waterfall_priority: Optional[int] = None
+    positions: int
+    capacity: float
+    allocated_amount: float
+
+class PositionAllocation(BaseModel):
+    entity_id: str
+    entity_type: Optional[str] = None
+    nav_type: Optional[str] = None
+    waterfall_priority: Optional[int] = None
+    capacity: float
+    allocated_amount: float
+    remaining_capacity: float
+
+class AllocationPlan(BaseModel):
+    """Waterfall distribution of hedge_amount_order across positions"""
+    hedge_amount_order: float
+    allocated_amount: float
+    unallocated_amount: float
+    total_capacity: float
+    eligible_positions: int
+    status: Literal["NO_CAPACITY", "PARTIALLY_ALLOCATED", "FULLY_ALLOCATED"]
+    tiers: List[AllocationTier]
+    allocations: List[PositionAllocation]
+
 class ComprehensiveHedgeInceptionResponse(BaseModel):
     """Complete response model for comprehensive hedge inception validation"""
     status: Literal["success", "error"]
@@ -168,6 +240,7 @@ class ComprehensiveHedgeInceptionResponse(BaseModel):
     payload: Dict[str, Any]
     validation_results: ComprehensiveValidationResults
     data_completeness: DataCompleteness
+    allocation_plan: Optional[AllocationPlan] = None  # null when hedging state was not fetched
     message: str
     timestamp: datetime = Field(default_factory=datetime.now)
 
@@ -183,13 +256,6 @@ class EntityPositionInfo(BaseModel):
     parent_child_nav_link: bool
     positions: list
 
-class USDPBCheck(BaseModel):
-    """Model for USD PB deposit check results"""
-    total_usd_equivalent: float
-    threshold: float
-    status: Literal["PASS", "FAIL"]
-    excess_amount: float
-
 class ValidationResults(BaseModel):
     """Legacy validation results model"""
     entity_check: bool
@@ -0,0 +1,126 @@
+import heapq
+import math
+from collections import defaultdict
+
+# Positions with no waterfall_priority and no matching waterfall rule are allocated last
+UNRANKED_PRIORITY = math.inf
+
+def _cents(amount) -> int:
+    """Whole cents, rounded down so an allocation never exceeds its cap"""
+    try:
+        scaled = float(amount or 0) * 100
+        if not scaled > 0:  # also rejects NaN
+            return 0
+        cents = int(scaled)
+    except (TypeError, ValueError, OverflowError):
+        return 0
+    # 12.34 * 100 == 1233.9999999999998: representation error, not a fraction of a cent
+    return cents + 1 if scaled - cents > 0.999999 else cents
+
+def _priority(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def _rule_priorities(waterfall_rules) -> dict:
+    """Lowest priority_level per entity_type from the (opening) waterfall rules"""
+    priorities = {}
+    for rule in waterfall_rules or []:
+        level = _priority(rule.get("priority_level"))
+        entity_type = rule.get("entity_type")
+        if level is not None and entity_type:
+            priorities[entity_type] = min(level, priorities.get(entity_type, level))
+    return priorities
+
+def _pro_rata(amount: int, capacities: list) -> list:
+    """Split amount (< sum of capacities) in proportion to capacity; leftover cents by largest remainder"""
+    total = sum(capacities)
+    shares = [amount * capacity // total for capacity in capacities]
+    leftover = amount - sum(shares)
+    if leftover:
+        remainders = [amount * capacity % total for capacity in capacities]
+        for i in sorted(range(len(capacities)), key=remainders.__getitem__, reverse=True)[:leftover]:
+            shares[i] += 1
+    return shares
+
+def allocate_hedge_order(entity_groups: list, hedge_amount_order: float, waterfall_rules=None) -> dict:
+    """
+    Distribute a new hedge order across positions by waterfall priority (1 first).
+
+    Each position's cap is its hedging_state.calculated_available_amount (position - CAR +
+    overlay - buffer - already hedged); positions without capacity are ineligible. Priority is
+    the position's waterfall_priority, else its entity type's level in waterfall_rules.
+    Positions are bucketed by priority and the buckets popped from a heap until the order is
+    filled, so a small order only touches the top tiers; the tier that runs out is shared
+    pro rata to capacity. Amounts are whole cents.
+    """
+    rule_priorities = _rule_priorities(waterfall_rules)
+    tiers_by_priority = defaultdict(list)   # priority -> [(group, position, capacity)]
+    total_capacity = 0
+    eligible = 0
+    for group in entity_groups or []:
+        for position in group.get("positions", []):
+            state = position.get("hedging_state") or {}
+            capacity = _cents(state.get("calculated_available_amount"))
+            if capacity <= 0:
+                continue
+            priority = _priority(state.get("waterfall_priority"))
+            if priority is None:
+                priority = rule_priorities.get(group.get("entity_type"), UNRANKED_PRIORITY)
+            tiers_by_priority[priority].append((group, position, capacity))
+            total_capacity += capacity
+            eligible += 1
+
+    heap = list(tiers_by_priority)
+    heapq.heapify(heap)
+
+    order = _cents(hedge_amount_order)
+    remaining = order
+    allocations = []
+    tiers = []
+    while heap and remaining > 0:
+        priority = heapq.heappop(heap)
+        tier = tiers_by_priority[priority]
+        capacities = [capacity for _, _, capacity in tier]
+        tier_capacity = sum(capacities)
+        shares = capacities if tier_capacity <= remaining else _pro_rata(remaining, capacities)
+        waterfall_priority = None if priority == UNRANKED_PRIORITY else priority
+        for (group, position, capacity), share in zip(tier, shares):
+            if share <= 0:
+                continue
+            allocations.append({
+                "entity_id": group.get("entity_id"),
+                "entity_type": group.get("entity_type"),
+                "nav_type": position.get("nav_type"),
+                "waterfall_priority": waterfall_priority,
+                "capacity": capacity / 100,
+                "allocated_amount": share / 100,
+                "remaining_capacity": (capacity - share) / 100,
+            })
+        allocated = sum(shares)
+        remaining -= allocated
+        tiers.append({
+            "waterfall_priority": waterfall_priority,
+            "positions": len(tier),
+            "capacity": tier_capacity / 100,
+            "allocated_amount": allocated / 100,
+        })
+
+    if not eligible:
+        status = "NO_CAPACITY"
+    elif remaining > 0:
+        status = "PARTIALLY_ALLOCATED"
+    else:
+        status = "FULLY_ALLOCATED"
+
+    return {
+        "hedge_amount_order": order / 100,
+        "allocated_amount": (order - remaining) / 100,
+        "unallocated_amount": remaining / 100,
+        "total_capacity": total_capacity / 100,
+        "eligible_positions": eligible,
+        "status": status,
+        "tiers": tiers,
+        "allocations": allocations,
+    }
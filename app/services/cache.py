@@ -0,0 +1,267 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+class TTLCache:
+    """Bounded in-process cache with a TTL per entry and LRU eviction once full"""
+
+    def __init__(self, maxsize: int = 1024, default_ttl: float = 60.0):
+        self.maxsize = max(1, maxsize)
+        self.default_ttl = default_ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        entry = self._data.get(key, MISSING)
+        if entry is MISSING:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl: float = None):
+        ttl = self.default_ttl if ttl is None else ttl
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, predicate=None) -> int:
+        """Drop every entry, or only those whose key matches predicate(key); returns the count dropped"""
+        if predicate is None:
+            count = len(self._data)
+            self._data.clear()
+            return count
+        keys = [k for k in self._data if predicate(k)]
+        for k in keys:
+            del self._data[k]
+        return len(keys)
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+def estimate_size(value) -> int:
+    """Approximate in-memory footprint of a JSON-shaped value, measured as its serialized length"""
+    return len(json.dumps(value, default=str, separators=(",", ":")))
+
+class SnapshotCache:
+    """
+    LRU cache bounded by an approximate byte budget with stale-while-revalidate entries.
+    An entry is fresh for fresh_ttl seconds, then stale (still servable while a refresh
+    runs) until stale_ttl, after which it is treated as a miss.
+    """
+
+    def __init__(self, max_bytes: int, fresh_ttl: float, stale_ttl: float):
+        self.max_bytes = max_bytes
+        self.fresh_ttl = fresh_ttl
+        self.stale_ttl = max(stale_ttl, fresh_ttl)
+        self._data = OrderedDict()  # key -> (stored_at, size, value)
+        self.current_bytes = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, key):
+        """Return (value, state) where state is "fresh", "stale" or None for a miss"""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None, None
+        stored_at, size, value = entry
+        age = time.monotonic() - stored_at
+        if age >= self.stale_ttl:
+            self._remove(key)
+            self.misses += 1
+            return None, None
+        self._data.move_to_end(key)
+        if age < self.fresh_ttl:
+            self.hits += 1
+            return value, "fresh"
+        self.stale_hits += 1
+        return value, "stale"
+
+    def store(self, key, value, size: int = None):
+        size = estimate_size(value) if size is None else size
+        if size > self.max_bytes:
+            return False
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = (time.monotonic(), size, value)
+        self.current_bytes += size
+        while self.current_bytes > self.max_bytes:
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.evictions += 1
+        return True
+
+    def invalidate(self, predicate=None) -> int:
+        keys = [k for k in self._data if predicate is None or predicate(k)]
+        for k in keys:
+            self._remove(k)
+        return len(keys)
+
+    def _remove(self, key):
+        _, size, _ = self._data.pop(key)
+        self.current_bytes -= size
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "fresh_ttl": self.fresh_ttl,
+            "stale_ttl": self.stale_ttl,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+class SingleFlight:
+    """Coalesces concurrent calls sharing a key onto one in-flight task and shares its result"""
+
+    def __init__(self):
+        self._in_flight = {}
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+
+    def __contains__(self, key):
+        return key in self._in_flight
+
+    def start(self, key, fn) -> asyncio.Task:
+        """Start fn() for key unless a call is already running; returns the in-flight task"""
+        task = self._in_flight.get(key)
+        if task is not None:
+            return task
+        self.executions += 1
+        task = asyncio.ensure_future(fn())
+        self._in_flight[key] = task
+
+        def _done(finished):
+            if self._in_flight.get(key) is finished:
+                del self._in_flight[key]
+        task.add_done_callback(_done)
+        return task
+
+    async def do(self, key, fn):
+        self.calls += 1
+        if key in self._in_flight:
+            self.coalesced += 1
+        # Shield so one caller disconnecting does not cancel the fetch the others are waiting on
+        return await asyncio.shield(self.start(key, fn))
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+        }
+
+class DiskCache:
+    """
+    JSON values in a SQLite file with a wall-clock TTL per entry and least-recently-used
+    pruning past max_entries. Survives restarts; methods block, so call them from a thread.
+    """
+
+    def __init__(self, path: str, max_entries: int = 10000, default_ttl: float = 3600.0):
+        self.path = path
+        self.max_entries = max(1, max_entries)
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("pragma journal_mode=wal")
+        self._db.execute(
+            "create table if not exists entries (key text primary key, value text not null, "
+            "expires_at real not null, accessed_at real not null)"
+        )
+        self._db.execute("create index if not exists entries_accessed on entries (accessed_at)")
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, default=None):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("select value, expires_at from entries where key = ?", (key,)).fetchone()
+            if row is None or row[1] <= now:
+                if row is not None:
+                    self._db.execute("delete from entries where key = ?", (key,))
+                self.misses += 1
+                return default
+            self._db.execute("update entries set accessed_at = ? where key = ?", (now, key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value, ttl: float = None):
+        now = time.time()
+        ttl = self.default_ttl if ttl is None else ttl
+        body = json.dumps(value, default=str, separators=(",", ":"))
+        with self._lock:
+            self._db.execute(
+                "insert or replace into entries (key, value, expires_at, accessed_at) values (?, ?, ?, ?)",
+                (key, body, now + ttl, now),
+            )
+            self._db.execute("delete from entries where expires_at <= ?", (now,))
+            self._db.execute(
+                "delete from entries where key in (select key from entries order by accessed_at desc limit -1 offset ?)",
+                (self.max_entries,),
+            )
+
+    def invalidate(self, prefix: str = None) -> int:
+        with self._lock:
+            if prefix is None:
+                return self._db.execute("delete from entries").rowcount
+            return self._db.execute("delete from entries where substr(key, 1, ?) = ?", (len(prefix), prefix)).rowcount
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = self._db.execute("select count(*) from entries").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "path": self.path,
+            "size": size,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
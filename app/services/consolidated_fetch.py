@@ -0,0 +1,162 @@
+import logging
+import os
+import re
+from dataclasses import replace
+from postgrest.exceptions import APIError
+from app.db.query_plan import TableSpec, build_query, run_query_plan
+from app.db.supabase_async import get_async_client, execute
+
+logger = logging.getLogger(__name__)
+
+# How the entity-keyed tables of the hedge snapshot are fetched:
+#   standard - one query per table (the query plan as declared in app.config)
+#   embedded - one entity_master query embedding the other tables as PostgREST resources
+#   rpc      - one call to the hedge_snapshot database function below
+# A mode the database rejects (missing relationship or function) falls back to standard
+# for the life of the worker.
+HEDGE_FETCH_MODES = ("standard", "embedded", "rpc")
+HEDGE_FETCH_MODE = os.getenv("HEDGE_FETCH_MODE", "standard").lower()
+if HEDGE_FETCH_MODE not in HEDGE_FETCH_MODES:
+    raise ValueError(f"HEDGE_FETCH_MODE must be one of {', '.join(HEDGE_FETCH_MODES)}")
+
+# Rows for the entity-keyed tables in one round trip, defined in Supabase as:
+#
+#   create or replace function hedge_snapshot(
+#       p_exposure_currency text, p_nav_type text default null, p_currency_type text default null
+#   )
+#   returns table (
+#       entity_master json, position_nav_master json, buffer_configuration json,
+#       hedging_framework json, allocation_engine json, car_master json
+#   )
+#   language sql stable as $$
+#       select
+#           (select coalesce(json_agg(e), '[]') from (
+#               select em.*, cc.currency_configuration from entity_master em
+#               cross join lateral (
+#                   select json_agg(json_build_object('currency_type', c.currency_type)) as currency_configuration
+#                   from currency_configuration c
+#                   where c.currency_code = em.currency_code
+#                     and (p_currency_type is null or c.currency_type = p_currency_type)
+#               ) cc
+#               where em.currency_code = p_exposure_currency
+#                 and (p_currency_type is null or cc.currency_configuration is not null)) e),
+#           (select coalesce(json_agg(p), '[]') from position_nav_master p
+#               where p.currency_code = p_exposure_currency and (p_nav_type is null or p.nav_type = p_nav_type)),
+#           (select coalesce(json_agg(b), '[]') from buffer_configuration b
+#               where b.currency_code = p_exposure_currency and b.active_flag = 'Y'),
+#           (select coalesce(json_agg(h), '[]') from hedging_framework h
+#               where h.currency_code = p_exposure_currency and h.active_flag = 'Y'),
+#           (select coalesce(json_agg(a), '[]') from (
+#               select * from allocation_engine where currency_code = p_exposure_currency
+#               order by created_date desc limit 100) a),
+#           (select coalesce(json_agg(c order by c.reporting_date desc), '[]') from car_master c
+#               where c.currency_code = p_exposure_currency)
+#   $$;
+HEDGE_SNAPSHOT_RPC = os.getenv("HEDGE_SNAPSHOT_RPC", "hedge_snapshot")
+
+# Tables keyed by entity_id (and filtered by currency_code) that consolidated modes pull together
+ENTITY_KEYED_TABLES = (
+    "entity_master", "position_nav_master", "buffer_configuration",
+    "hedging_framework", "allocation_engine", "car_master",
+)
+BUNDLE_NODE = "entity_bundle"
+_INNER_EMBED = re.compile(r"(\w+)!inner\b")
+
+_failed_modes = set()
+_plans = {}
+
+def fetch_mode() -> str:
+    """The mode in effect: HEDGE_FETCH_MODE unless the database rejected it"""
+    return "standard" if HEDGE_FETCH_MODE in _failed_modes else HEDGE_FETCH_MODE
+
+def _sort_rows(rows: list, order) -> list:
+    # Stable multi-key sort matching PostgreSQL defaults: NULLs last ascending, first descending
+    for column, desc in reversed(order):
+        rows.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=desc)
+    return rows
+
+async def _fetch_embedded(specs: dict, context: dict) -> dict:
+    """
+    entity_master with the other tables embedded. Each table keeps its own filters (applied to its
+    embedded resource); rows are flattened, then re-ordered and limited across entities so they
+    match the per-table queries. Inner-joined embeds of entity_master filter its rows after flattening.
+    Rows whose entity is missing from entity_master are not returned.
+    """
+    entity_spec = specs["entity_master"]
+    children = [specs[name] for name in ENTITY_KEYED_TABLES if name != "entity_master"]
+    select = entity_spec.select(context) if callable(entity_spec.select) else entity_spec.select
+    # An inner join here would also drop the children of the entities it filters out, which
+    # the per-table queries return; embed without it and drop those entities after flattening
+    inner = _INNER_EMBED.findall(select)
+    select = ", ".join([_INNER_EMBED.sub(r"\1", select)] + [f"{child.table}(*)" for child in children])
+
+    query = build_query(get_async_client(), replace(entity_spec, select=select), context)
+    for child in children:
+        for operator, column, value in child.filters:
+            value = value(context) if callable(value) else value
+            if value is None:
+                continue
+            if column is None:
+                query = getattr(query, operator)(value, reference_table=child.table)
+            else:
+                query = getattr(query, operator)(f"{child.table}.{column}", value)
+        for column, desc in child.order:
+            query = query.order(column, desc=desc, foreign_table=child.table)
+        # Each entity's top rows include every row of the overall top N
+        if child.limit is not None:
+            query = query.limit(child.limit, foreign_table=child.table)
+
+    entities = await execute(query)
+    bundle = {child.name: [] for child in children}
+    for entity in entities:
+        for child in children:
+            bundle[child.name] += entity.pop(child.table, None) or []
+    bundle["entity_master"] = [entity for entity in entities if all(entity.get(name) for name in inner)]
+    for child in children:
+        rows = _sort_rows(bundle[child.name], child.order)
+        bundle[child.name] = rows[:child.limit] if child.limit is not None else rows
+    return bundle
+
+async def _fetch_rpc(specs: dict, context: dict) -> dict:
+    rows = await execute(get_async_client().rpc(HEDGE_SNAPSHOT_RPC, {
+        "p_exposure_currency": context["exposure_currency"],
+        "p_nav_type": context.get("nav_type"),
+        "p_currency_type": context.get("currency_type"),
+    }))
+    snapshot = rows[0] if rows else {}
+    return {name: snapshot.get(name) or [] for name in ENTITY_KEYED_TABLES}
+
+async def _fetch_bundle(mode: str, specs: dict, context: dict) -> dict:
+    try:
+        return await (_fetch_embedded if mode == "embedded" else _fetch_rpc)(specs, context)
+    except APIError as e:
+        logger.warning("Hedge snapshot %s fetch unavailable, falling back to standard: %s", mode, e)
+        _failed_modes.add(mode)
+        params = {key: value for key, value in context.items() if key != BUNDLE_NODE}
+        rows, _ = await run_query_plan(list(specs.values()), params)
+        return rows
+
+def _from_bundle(name: str):
+    async def fetch(context):
+        return context[BUNDLE_NODE][name]
+    return fetch
+
+def snapshot_plan(plan):
+    """plan with its entity-keyed nodes served from one consolidated fetch, per the fetch mode in effect"""
+    mode = fetch_mode()
+    if mode == "standard":
+        return plan
+    if mode not in _plans:
+        specs = {spec.name: spec for spec in plan if spec.name in ENTITY_KEYED_TABLES}
+        bundle = TableSpec(
+            BUNDLE_NODE,
+            table="entity_master",
+            stage="1a",
+            fetch=lambda context: _fetch_bundle(mode, specs, context),
+        )
+        _plans[mode] = (bundle,) + tuple(
+            replace(spec, filters=(), order=(), limit=None, cached=False, depends_on=(BUNDLE_NODE,), fetch=_from_bundle(spec.name))
+            if spec.name in specs else spec
+            for spec in plan
+        )
+    return _plans[mode]
@@ -0,0 +1,249 @@
+import asyncio
+import heapq
+import os
+import time
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import date, timedelta
+from app.db.supabase_async import get_async_client, execute
+from app.services.cache import SingleFlight
+
+# How long a loaded index is served before a background reload, and how much history it holds
+FX_RATES_TTL = float(os.getenv("FX_RATES_TTL", "60"))
+FX_RATES_LOOKBACK_DAYS = int(os.getenv("FX_RATES_LOOKBACK_DAYS", "30"))
+FX_RATES_PAGE_SIZE = int(os.getenv("FX_RATES_PAGE_SIZE", "1000"))
+
+BASE_CURRENCY = "SGD"
+RATE_COLUMNS = ("exchange_rate", "rate", "mid_rate")
+
+def _date_key(value) -> str:
+    # effective_date arrives as ISO text; ISO dates/timestamps sort correctly as strings
+    return value.isoformat() if isinstance(value, date) else str(value or "")
+
+def rate_value(row: dict):
+    for column in RATE_COLUMNS:
+        value = row.get(column)
+        if value is not None:
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                return None
+    return None
+
+def currency_pairs(currency: str) -> tuple:
+    # Sorted, so rows of the two pairs on the same date always merge in one order (the ETag hashes them)
+    return tuple(sorted((f"{currency}{BASE_CURRENCY}", f"{BASE_CURRENCY}{currency}")))
+
+class FxRatesIndex:
+    """In-memory currency_rates rows keyed by currency_pair and ordered by effective_date"""
+
+    def __init__(self, rows=(), cutoff: str = None):
+        self._dates = defaultdict(list)  # pair -> effective_date keys, ascending
+        self._rows = defaultdict(list)   # pair -> rows, same order as _dates
+        self.cutoff = cutoff             # rows were loaded from this effective_date on (None: everything)
+        self.exhausted = set()           # currencies whose SGD pairs have every row before the cutoff loaded
+        self.add_rows(rows)
+
+    def add_rows(self, rows):
+        touched = set()
+        for row in rows:
+            pair = row.get("currency_pair")
+            if not pair:
+                continue
+            self._dates[pair].append(_date_key(row.get("effective_date")))
+            self._rows[pair].append(row)
+            touched.add(pair)
+        for pair in touched:
+            order = sorted(range(len(self._dates[pair])), key=self._dates[pair].__getitem__)
+            self._dates[pair] = [self._dates[pair][i] for i in order]
+            self._rows[pair] = [self._rows[pair][i] for i in order]
+
+    def __contains__(self, pair):
+        return pair in self._rows
+
+    def rows_before(self, pair: str, cutoff) -> list:
+        """Rows for pair effective before cutoff, oldest first"""
+        dates = self._dates.get(pair, [])
+        return self._rows.get(pair, [])[:bisect_left(dates, _date_key(cutoff))]
+
+    def replace_rows_before(self, pairs, cutoff, rows):
+        """Swap the rows of pairs effective before cutoff for rows"""
+        for pair in pairs:
+            if pair in self._rows:
+                start = bisect_left(self._dates[pair], _date_key(cutoff))
+                self._dates[pair] = self._dates[pair][start:]
+                self._rows[pair] = self._rows[pair][start:]
+        self.add_rows(rows)
+
+    def pairs(self):
+        return list(self._rows)
+
+    def row_count(self) -> int:
+        return sum(len(rows) for rows in self._rows.values())
+
+    def latest(self, pair: str):
+        rows = self._rows.get(pair)
+        return rows[-1] if rows else None
+
+    def as_of(self, pair: str, as_of_date):
+        """Most recent row for pair effective on or before as_of_date"""
+        dates = self._dates.get(pair)
+        if not dates:
+            return None
+        pos = bisect_right(dates, _date_key(as_of_date))
+        return self._rows[pair][pos - 1] if pos else None
+
+    def history(self, pair: str, limit: int = None) -> list:
+        """Rows for pair, newest first"""
+        rows = self._rows.get(pair, [])
+        newest_first = rows[::-1]
+        return newest_first[:limit] if limit is not None else newest_first
+
+    def rows_for_currency(self, currency: str, limit: int = None) -> list:
+        """Rows for {currency}SGD and SGD{currency} merged newest first (the old per-currency query)"""
+        pairs = currency_pairs(currency)
+        merged = heapq.merge(
+            *(self.history(pair) for pair in pairs),
+            key=lambda row: _date_key(row.get("effective_date")),
+            reverse=True,
+        )
+        return [row for _, row in zip(range(limit), merged)] if limit is not None else list(merged)
+
+    def rate(self, base: str, quote: str, as_of_date=None):
+        """
+        Units of quote per unit of base. Uses the direct pair, its inverse, or
+        triangulates through SGD when neither is quoted.
+        """
+        if base == quote:
+            return 1.0
+        direct = self._pair_rate(f"{base}{quote}", as_of_date)
+        if direct is not None:
+            return direct
+        inverse = self._pair_rate(f"{quote}{base}", as_of_date)
+        if inverse:
+            return 1.0 / inverse
+        if BASE_CURRENCY not in (base, quote):
+            base_leg = self.rate(base, BASE_CURRENCY, as_of_date)
+            quote_leg = self.rate(BASE_CURRENCY, quote, as_of_date)
+            if base_leg is not None and quote_leg is not None:
+                return base_leg * quote_leg
+        return None
+
+    def _pair_rate(self, pair: str, as_of_date):
+        row = self.latest(pair) if as_of_date is None else self.as_of(pair, as_of_date)
+        return rate_value(row) if row else None
+
+# ===== PROCESS-WIDE INDEX =====
+_fx_index = None
+_fx_loaded_at = 0.0
+_fx_flight = SingleFlight()
+
+async def _query_rates(build_query) -> list:
+    """Page through a currency_rates query so PostgREST's max-rows cap never truncates the index"""
+    rows, start = [], 0
+    while True:
+        page = await execute(build_query().range(start, start + FX_RATES_PAGE_SIZE - 1))
+        rows += page
+        if len(page) < FX_RATES_PAGE_SIZE:
+            return rows
+        start += FX_RATES_PAGE_SIZE
+
+async def _load_fx_index(carry: bool = True):
+    global _fx_index, _fx_loaded_at
+    cutoff = (date.today() - timedelta(days=FX_RATES_LOOKBACK_DAYS)).isoformat()
+    db = get_async_client()
+    rows = await _query_rates(
+        lambda: db.table("currency_rates")
+        .select("*")
+        .gte("effective_date", cutoff)
+        .order("effective_date", desc=True)
+        .order("currency_pair")
+    )
+    index = FxRatesIndex(rows, cutoff=cutoff)
+    previous = _fx_index
+    if carry and previous is not None and previous.cutoff is not None:
+        # Backfilled history outlives the window it was fetched with: keep what the backfilled
+        # pairs hold before the new cutoff, so it is not fetched again after every reload
+        for pair in previous.pairs():
+            if previous.rows_before(pair, previous.cutoff):
+                index.add_rows(previous.rows_before(pair, cutoff))
+        index.exhausted |= previous.exhausted
+    _fx_index = index
+    _fx_loaded_at = time.monotonic()
+    return _fx_index
+
+async def _backfill_currency(index: FxRatesIndex, currency: str, limit: int):
+    """Newest limit rows of the currency's SGD pairs from before the lookback window"""
+    pairs = currency_pairs(currency)
+    rows = await execute(
+        get_async_client().table("currency_rates")
+        .select("*")
+        .in_("currency_pair", list(pairs))
+        .lt("effective_date", index.cutoff)
+        .order("effective_date", desc=True)
+        .order("currency_pair")
+        .limit(limit)
+    )
+    index.replace_rows_before(pairs, index.cutoff, rows)
+    if len(rows) < limit:
+        index.exhausted.add(currency)
+    return index
+
+async def get_fx_index(currencies=(), min_rows: int = 1) -> FxRatesIndex:
+    """
+    The shared rates index, with at least min_rows rows across each given currency's SGD
+    pairs (either direction) when the table has that many. Currencies short of that inside
+    the lookback window get one bounded backfill query each. An expired index is served
+    while a reload runs in the background.
+    """
+    index = _fx_index
+    if index is None:
+        index = await _fx_flight.do("load", _load_fx_index)
+    elif time.monotonic() - _fx_loaded_at >= FX_RATES_TTL:
+        _fx_flight.start("load", _load_fx_index)
+    if index.cutoff is None:
+        return index
+
+    short = sorted(
+        ccy for ccy in set(currencies)
+        if ccy and ccy != BASE_CURRENCY and ccy not in index.exhausted
+        and len(index.rows_for_currency(ccy, limit=min_rows)) < min_rows
+    )
+    if short:
+        await asyncio.gather(*(
+            _fx_flight.do(("backfill", id(index), ccy, min_rows), lambda ccy=ccy: _backfill_currency(index, ccy, min_rows))
+            for ccy in short
+        ))
+    return index
+
+def fx_index_stats() -> dict:
+    return {
+        "loaded": _fx_index is not None,
+        "age_seconds": round(time.monotonic() - _fx_loaded_at, 1) if _fx_index is not None else None,
+        "ttl": FX_RATES_TTL,
+        "lookback_days": FX_RATES_LOOKBACK_DAYS,
+        "pairs": len(_fx_index.pairs()) if _fx_index is not None else 0,
+        "rows": _fx_index.row_count() if _fx_index is not None else 0,
+        "single_flight": _fx_flight.stats(),
+    }
+
+async def refresh_fx_index() -> dict:
+    """Reload the index from scratch, dropping backfilled history"""
+    await _fx_flight.do("refresh", lambda: _load_fx_index(carry=False))
+    return fx_index_stats()
+
+# ===== QUERY PLAN FETCHERS =====
+async def currency_rate_rows(currency: str, limit: int = 20) -> list:
+    """Newest {currency}SGD / SGD{currency} rows, as the old per-currency rates query returned"""
+    index = await get_fx_index([currency], min_rows=limit)
+    return index.rows_for_currency(currency, limit=limit)
+
+async def proxy_rate_rows(exposure_currency: str, currency_config_rows: list, limit: int = 10) -> list:
+    """Rates for the proxy currencies named in currency_configuration, served from the shared index"""
+    proxies = {row.get("proxy_currency") for row in currency_config_rows if row.get("proxy_currency")}
+    proxies.discard(exposure_currency)
+    index = await get_fx_index([exposure_currency, *proxies], min_rows=limit)
+    rows = []
+    for proxy_ccy in proxies:
+        rows += index.rows_for_currency(proxy_ccy, limit=limit)
+    return rows
@@ -1,311 +1,207 @@
+import hashlib
+import logging
+import os
 from collections import defaultdict
 from datetime import date
-from app.services.supabase_client import get_supabase
-
-def fetch_complete_hedge_data(
+from pydantic_core import to_json
+from app.config import HEDGE_SNAPSHOT_PLAN
+from app.db.query_plan import run_query_plan, plan_tables
+from app.services.cache import SnapshotCache, SingleFlight, TTLCache
+from app.services.consolidated_fetch import snapshot_plan
+from app.services.hedging_state import columnar_hedging_states
+from app.services.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+# ===== STAGE AND FIELD SELECTION =====
+ALL_STAGES = ("1a", "1b", "2")
+ENTITY_TABLES = frozenset({"entity_master", "position_nav_master"})
+# Stage membership comes from the query plan (entity_check lives in Stage 1A, so the entity
+# tables belong to it); tables without a stage are fetched whichever stages are requested
+STAGE_TABLES = {
+    stage: frozenset(spec.table for spec in HEDGE_SNAPSHOT_PLAN if spec.stage == stage)
+    for stage in ALL_STAGES
+}
+CORE_TABLES = frozenset(spec.table for spec in HEDGE_SNAPSHOT_PLAN if spec.stage is None)
+ALL_TABLES = CORE_TABLES.union(*STAGE_TABLES.values())
+STAGE_SECTIONS = {"1a": "stage_1a_config", "1b": "stage_1b_data", "2": "stage_2_config"}
+
+# Response field path -> tables it is built from
+FIELD_TABLES = {
+    "entity_groups": ENTITY_TABLES,
+    "entity_groups.positions.hedging_state": frozenset({"allocation_engine", "hedge_business_events", "hedging_framework", "buffer_configuration"}),
+    "entity_groups.positions.allocation_data": frozenset({"allocation_engine"}),
+    "entity_groups.positions.hedge_relationships": frozenset({"hedge_business_events"}),
+    "entity_groups.positions.framework_rule": frozenset({"hedging_framework"}),
+    "entity_groups.positions.buffer_rule": frozenset({"buffer_configuration"}),
+    "entity_groups.positions.car_data": frozenset({"car_master"}),
+    "stage_1a_config.buffer_configuration": frozenset({"buffer_configuration"}),
+    "stage_1a_config.waterfall_logic": frozenset({"waterfall_logic_configuration"}),
+    "stage_1a_config.overlay_configuration": frozenset({"overlay_configuration"}),
+    "stage_1a_config.hedging_framework": frozenset({"hedging_framework"}),
+    "stage_1a_config.system_configuration": frozenset({"system_configuration"}),
+    "stage_1a_config.threshold_configuration": frozenset({"threshold_configuration", "usd_pb_deposit"}),
+    "stage_1b_data.current_allocations": frozenset({"allocation_engine"}),
+    "stage_1b_data.hedge_instructions_history": frozenset({"hedge_instructions"}),
+    "stage_1b_data.active_hedge_events": frozenset({"hedge_business_events"}),
+    "stage_1b_data.car_master_data": frozenset({"car_master"}),
+    "stage_2_config.booking_model_config": frozenset({"instruction_event_config"}),
+    "stage_2_config.murex_books": frozenset({"murex_book_config"}),
+    "stage_2_config.hedge_instruments": frozenset({"hedge_instruments"}),
+    "stage_2_config.hedge_effectiveness": frozenset({"hedge_effectiveness"}),
+    "risk_monitoring": frozenset({"risk_monitoring"}),
+    "currency_configuration": frozenset({"currency_configuration"}),
+    "currency_rates": frozenset({"currency_rates"}),
+    "proxy_configuration": frozenset({"proxy_configuration"}),
+    "additional_rates": frozenset({"currency_configuration", "currency_rates"}),
+}
+FIELD_ROOTS = {path.split(".")[0] for path in FIELD_TABLES}
+
+def _field_tables(field: str) -> frozenset:
+    if field.split(".")[0] not in FIELD_ROOTS:
+        raise ValueError(f"Unknown field: {field}")
+    # A field needs its own tables, its ancestors' (entity_groups) and its descendants'
+    return frozenset().union(*(
+        needed for path, needed in FIELD_TABLES.items()
+        if path == field or path.startswith(field + ".") or field.startswith(path + ".")
+    ))
+
+def plan_selection(stages=None, fields=None):
+    """
+    Tables to fetch for the requested stages and output fields, plus the response paths
+    to drop because they would be computed from tables that were skipped. stages of None
+    means not given: every stage, or none beyond what the fields need when fields are given.
+    Returns (tables, exclude); tables is None when everything is needed.
+    """
+    if stages is None:
+        stages = () if fields else ALL_STAGES
+    unknown = set(stages) - set(ALL_STAGES)
+    if unknown:
+        raise ValueError(f"Unknown stages: {', '.join(sorted(unknown))}")
+    stage_tables = frozenset().union(*(STAGE_TABLES[stage] for stage in stages))
+
+    if fields:
+        tables = stage_tables.union(*(_field_tables(field) for field in fields))
+        exclude = []
+    else:
+        tables = stage_tables | CORE_TABLES
+        exclude = [STAGE_SECTIONS[stage] for stage in ALL_STAGES if stage not in stages]
+        exclude += [
+            path for path, needed in FIELD_TABLES.items()
+            if path.startswith("entity_groups.") and not needed <= tables
+        ]
+    # Dependencies run too, e.g. hedge_business_events are filtered by the entity ids
+    tables = plan_tables(HEDGE_SNAPSHOT_PLAN, tables)
+    return (None if tables >= ALL_TABLES else tables), exclude
+
+def covered_stages(tables) -> tuple:
+    """Stages whose tables are all fetched (every stage when tables is None)"""
+    return tuple(stage for stage in ALL_STAGES if tables is None or STAGE_TABLES[stage] <= tables)
+
+# Books with at least this many positions compute hedging state with the columnar engine
+HEDGING_STATE_COLUMNAR_MIN_POSITIONS = int(os.getenv("HEDGING_STATE_COLUMNAR_MIN_POSITIONS", "500"))
+
+# ===== HEDGE SNAPSHOT CACHE =====
+SNAPSHOT_CACHE_MAX_BYTES = int(os.getenv("SNAPSHOT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+SNAPSHOT_CACHE_TTL = float(os.getenv("SNAPSHOT_CACHE_TTL", "5"))
+SNAPSHOT_CACHE_STALE_TTL = float(os.getenv("SNAPSHOT_CACHE_STALE_TTL", "60"))
+
+snapshot_cache = SnapshotCache(SNAPSHOT_CACHE_MAX_BYTES, SNAPSHOT_CACHE_TTL, SNAPSHOT_CACHE_STALE_TTL)
+# Identical concurrent snapshot fetches (including background refreshes) share one execution
+snapshot_flight = SingleFlight()
+
+# Content hashes of recently loaded snapshots: key -> (digest, snapshot). Conditional requests
+# (If-None-Match) are answered from here without loading the snapshot; the TTL bounds how long
+# a changed book can go unnoticed, as SNAPSHOT_CACHE_TTL does for the data itself.
+SNAPSHOT_HASH_TTL = float(os.getenv("SNAPSHOT_HASH_TTL", str(SNAPSHOT_CACHE_TTL)))
+SNAPSHOT_HASH_MAX_ENTRIES = int(os.getenv("SNAPSHOT_HASH_MAX_ENTRIES", "4096"))
+snapshot_hashes = TTLCache(SNAPSHOT_HASH_MAX_ENTRIES, SNAPSHOT_HASH_TTL)
+
+def content_hash(body: bytes) -> str:
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+def recent_snapshot_hash(key):
+    """Digest of the snapshot loaded for key within SNAPSHOT_HASH_TTL, or None"""
+    entry = snapshot_hashes.get(key)
+    return entry[0] if entry else None
+
+def snapshot_hash(key, snapshot: dict) -> str:
+    """Content digest of a snapshot returned by get_hedge_snapshot for key"""
+    entry = snapshot_hashes.get(key)
+    # Identity check: a stale snapshot can be served while its refresh records a newer digest
+    if entry and entry[1] is snapshot:
+        return entry[0]
+    digest = content_hash(to_json(snapshot, fallback=str))
+    snapshot_hashes.set(key, (digest, snapshot))
+    return digest
+
+def snapshot_key(exposure_currency: str, nav_type: str = None, currency_type: str = None, hedge_method: str = None, tables=None):
+    key = (exposure_currency, nav_type, currency_type, hedge_method)
+    return key if tables is None else key + (tuple(sorted(tables)),)
+
+async def get_hedge_snapshot(
+    exposure_currency: str,
+    hedge_method: str,
+    nav_type: str = None,
+    currency_type: str = None,
+    tables: frozenset = None
+):
+    """
+    Structured hedge data for a currency, served from the snapshot cache when possible.
+    Stale entries are returned immediately while a background task refreshes them, and
+    concurrent misses for the same key await a single in-flight fetch.
+    """
+    key = snapshot_key(exposure_currency, nav_type, currency_type, hedge_method, tables)
+    snapshot, state = snapshot_cache.lookup(key)
+    if state == "stale":
+        snapshot_flight.start(key, lambda: _load_snapshot(key))
+    if state is not None:
+        return snapshot
+    return await snapshot_flight.do(key, lambda: _load_snapshot(key))
+
+async def _load_snapshot(key):
+    exposure_currency, nav_type, currency_type, hedge_method = key[:4]
+    snapshot = await fetch_complete_hedge_data(
+        exposure_currency=exposure_currency,
+        hedge_method=hedge_method,
+        hedge_amount_order=None,
+        order_id=None,
+        nav_type=nav_type,
+        currency_type=currency_type,
+        tables=frozenset(key[4]) if len(key) > 4 else None
+    )
+    # Failed fetches are never cached so the next call retries Supabase
+    if "error" not in snapshot:
+        # One serialization gives both the cache size and the content digest
+        body = to_json(snapshot, fallback=str)
+        snapshot_hashes.set(key, (content_hash(body), snapshot))
+        snapshot_cache.store(key, snapshot, size=len(body))
+    return snapshot
+
+def snapshot_stats() -> dict:
+    return {**snapshot_cache.stats(), "single_flight": snapshot_flight.stats(), "hashes": snapshot_hashes.stats()}
+
+def invalidate_snapshots(exposure_currency: str = None) -> int:
+    if exposure_currency is None:
+        snapshot_hashes.invalidate()
+        return snapshot_cache.invalidate()
+    snapshot_hashes.invalidate(lambda key: key[0] == exposure_currency)
+    return snapshot_cache.invalidate(lambda key: key[0] == exposure_currency)
+
+async def fetch_complete_hedge_data(
     exposure_currency: str,
     hedge_method: str,
     hedge_amount_order: float,
     order_id: str,
     nav_type: str = None,
-    currency_type: str = None
+    currency_type: str = None,
+    tables: frozenset = None
 ):
-    supabase = get_supabase()
     try:
-        # ===== CORE ENTITY AND POSITION DATA =====
-        if currency_type:
-            entities_query = (
-                supabase.table("entity_master")
-                .select("*, currency_configuration!inner(currency_type)")
-                .eq("currency_code", exposure_currency)
-                .eq("currency_configuration.currency_type", currency_type)
-            )
-        else:
-            entities_query = (
-                supabase.table("entity_master")
-                .select("*, currency_configuration(currency_type)")
-                .eq("currency_code", exposure_currency)
-            )
-
-        positions_query = (
-            supabase.table("position_nav_master")
-            .select("*")
-            .eq("currency_code", exposure_currency)
-        )
-        if nav_type:
-            positions_query = positions_query.eq("nav_type", nav_type)
-
-        entities = entities_query.execute()
-        positions = positions_query.execute()
-        entities_rows = getattr(entities, "data", []) or []
-        positions_rows = getattr(positions, "data", []) or []
-        entity_ids = {e["entity_id"] for e in entities_rows if e.get("entity_id")} or {
-            p["entity_id"] for p in positions_rows if p.get("entity_id")
-        }
-
-        # ===== STAGE 1A: CONFIGURATION TABLES =====
-        buffer_config_query = (
-            supabase.table("buffer_configuration")
-            .select("*")
-            .eq("currency_code", exposure_currency)
-            .eq("active_flag", "Y")
-        )
-
-        waterfall_config_query = (
-            supabase.table("waterfall_logic_configuration")
-            .select("*")
-            .eq("active_flag", "Y")
-            .order("waterfall_type")
-            .order("priority_level")
-        )
-
-        overlay_config_query = (
-            supabase.table("overlay_configuration")
-            .select("*")
-            .eq("currency_code", exposure_currency)
-            .eq("active_flag", "Y")
-        )
-
-        hedging_framework_query = (
-            supabase.table("hedging_framework")
-            .select("*")
-            .eq("currency_code", exposure_currency)
-            .eq("active_flag", "Y")
-        )
-
-        system_config_query = supabase.table("system_configuration").select("*").eq("active_flag", "Y")
-
-        # ===== STAGE 1A & 1B: ALLOCATION AND HEDGE DATA =====
-        allocation_query = (
-            supabase.table("allocation_engine")
-            .select("*")
-            .eq("currency_code", exposure_currency)
-            .order("created_date", desc=True)
-            .limit(100)
-        )
-
-        hedge_instructions_query = (
-            supabase.table("hedge_instructions")
-            .select("*")
-            .eq("exposure_currency", exposure_currency)
-            .order("instruction_date", desc=True)
-            .order("created_date", desc=True)
-            .limit(50)
-        )
-
-        # hedge_business_events (schema-aligned)
-        hedge_events_query = supabase.table("hedge_business_events").select("*").limit(50)
-        if entity_ids:
-            hedge_events_query = hedge_events_query.in_("entity_id", list(entity_ids))
-        if nav_type:
-            hedge_events_query = hedge_events_query.eq("nav_type", nav_type)
-        hedge_events_query = hedge_events_query.order("trade_date", desc=True).order("created_date", desc=True)
-
-        # car_master (schema-aligned)
-        car_master_query = (
-            supabase.table("car_master")
-            .select("*")
-            .eq("currency_code", exposure_currency)
-            .order("reporting_date", desc=True)
-        )
-
-        # ===== STAGE 1A: THRESHOLD AND MONITORING =====
-        threshold_query = (
-            supabase.table("threshold_configuration")
-            .select("*")
-            .eq("threshold_type", "USD_PB_DEPOSIT")
-            .eq("active_flag", "Y")
-        )
-        usd_pb_query = supabase.table("usd_pb_deposit").select("*")
-
-        # risk_monitoring (schema-aligned)
-        risk_monitoring_query = (
-            supabase.table("risk_monitoring")
-            .select("*")
-            .eq("currency_code", exposure_currency)
-            .eq("resolution_status", "Open")
-            .order("measurement_timestamp", desc=True)
-        )
-
-        # ===== CURRENCY AND RATES DATA =====
-        currency_config_q = supabase.table("currency_configuration").select("*").or_(
-            f"currency_code.eq.{exposure_currency},proxy_currency.eq.{exposure_currency}"
-        )
-
-        currency_rates_q = (
-            supabase.table("currency_rates")
-            .select("*")
-            .or_(f"currency_pair.eq.{exposure_currency}SGD,currency_pair.eq.SGD{exposure_currency}")
-            .order("effective_date", desc=True)
-            .limit(20)
-        )
-
-        # proxy_configuration (schema-aligned)
-        today = date.today().isoformat()
-        proxy_config_query = (
-            supabase.table("proxy_configuration")
-            .select("*")
-            .eq("exposure_currency", exposure_currency)
-            .eq("active_flag", "Y")
-            .lte("effective_date", today)
-            .order("effective_date", desc=True)
-        )
-
-        # ===== STAGE 2: BOOKING AND EXECUTION =====
-        booking_model_q = (
-            supabase.table("instruction_event_config")
-            .select("*")
-            .eq("instruction_event", "Initiation")
-        )
-        if nav_type:
-            booking_model_q = booking_model_q.eq("nav_type", nav_type)
-        if currency_type:
-            booking_model_q = booking_model_q.eq("currency_type", currency_type)
-
-        murex_books_q = (
-            supabase.table("murex_book_config")
-            .select("*")
-            .eq("active_flag", True)   # boolean per schema
-        )
-
-        # ===== hedge_instruments (EXACT MATCHES ONLY — no .cs / @>) =====
-        hi_q = supabase.table("hedge_instruments").select("*")
-
-        # Active and effective
-        hi_q = (
-            hi_q
-            .eq("active_flag", "Y")
-            .lte("effective_date", today)
-        )
-
-        # Build an OR clause that uses only exact equals
-        # - base_currency == exposure_currency
-        # - quote_currency == exposure_currency
-        # - currency_pair in (EXPOSURESGD, SGDEXPOSURE)
-        pair1 = f"{exposure_currency}SGD"
-        pair2 = f"SGD{exposure_currency}"
-        or_clause = (
-            f"base_currency.eq.{exposure_currency},"
-            f"quote_currency.eq.{exposure_currency},"
-            f"currency_pair.in.({pair1},{pair2})"
-        )
-        hi_q = hi_q.or_(or_clause)
-
-        # Match currency classification if provided
-        if currency_type:
-            hi_q = hi_q.eq("currency_classification", currency_type)
-
-        # Match nav_type_applicable (Both or exact)
-        if nav_type:
-            hi_q = hi_q.in_("nav_type_applicable", ["Both", nav_type])
-        else:
-            hi_q = hi_q.in_("nav_type_applicable", ["Both", "COI", "RE"])
-
-        # Match accounting_method_supported (Both or exact)
-        if hedge_method:
-            hi_q = hi_q.in_("accounting_method_supported", ["Both", hedge_method])
-        else:
-            hi_q = hi_q.in_("accounting_method_supported", ["Both", "COH", "MTM"])
-
-        hedge_instruments_query = hi_q.order("effective_date", desc=True)
-
-        hedge_effectiveness_query = (
-            supabase.table("hedge_effectiveness")
-            .select("*")
-            .eq("currency_code", exposure_currency)
-            .order("measurement_date", desc=True)
-            .limit(10)
-        )
-
-        # ===== PROXY CURRENCIES HANDLING =====
-        currency_config = currency_config_q.execute()
-        currency_config_rows = getattr(currency_config, "data", []) or []
-        proxy_currencies = {c.get("proxy_currency") for c in currency_config_rows if c.get("proxy_currency")}
-        proxy_currencies.discard(exposure_currency)
-
-        additional_rates_rows = []
-        for proxy_ccy in proxy_currencies:
-            rate_result = (
-                supabase.table("currency_rates")
-                .select("*")
-                .or_(f"currency_pair.eq.{proxy_ccy}SGD,currency_pair.eq.SGD{proxy_ccy}")
-                .order("effective_date", desc=True)
-                .limit(10)
-                .execute()
-            )
-            additional_rates_rows += getattr(rate_result, "data", []) or []
-
-        # ===== EXECUTE REMAINING QUERIES =====
-        buffer_config = buffer_config_query.execute()
-        waterfall_config = waterfall_config_query.execute()
-        overlay_config = overlay_config_query.execute()
-        hedging_framework = hedging_framework_query.execute()
-        system_config = system_config_query.execute()
-
-        allocations = allocation_query.execute()
-        hedge_instructions = hedge_instructions_query.execute()
-        hedge_events = hedge_events_query.execute()
-        car_master = car_master_query.execute()
-
-        threshold_result = threshold_query.execute()
-        usd_pb = usd_pb_query.execute()
-        risk_monitoring = risk_monitoring_query.execute()
-
-        currency_rates = currency_rates_q.execute()
-        proxy_config = proxy_config_query.execute()
-
-        booking_models = booking_model_q.execute()
-        murex_books = murex_books_q.execute()
-        hedge_instruments = hedge_instruments_query.execute()
-        hedge_effectiveness = hedge_effectiveness_query.execute()
-
-        # ===== EXTRACT DATA =====
-        buffer_config_rows = getattr(buffer_config, "data", []) or []
-        waterfall_config_rows = getattr(waterfall_config, "data", []) or []
-        overlay_config_rows = getattr(overlay_config, "data", []) or []
-        hedging_framework_rows = getattr(hedging_framework, "data", []) or []
-        system_config_rows = getattr(system_config, "data", []) or []
-
-        allocations_rows = getattr(allocations, "data", []) or []
-        hedge_instructions_rows = getattr(hedge_instructions, "data", []) or []
-        hedge_events_rows = getattr(hedge_events, "data", []) or []
-        car_master_rows = getattr(car_master, "data", []) or []
-
-        total_usd_pb_deposits_rows = getattr(usd_pb, "data", []) or []
-        risk_monitoring_rows = getattr(risk_monitoring, "data", []) or []
-        currency_rates_rows = getattr(currency_rates, "data", []) or []
-        proxy_config_rows = getattr(proxy_config, "data", []) or []
-        booking_model_config_rows = getattr(booking_models, "data", []) or []
-        murex_books_rows = getattr(murex_books, "data", []) or []
-        hedge_instruments_rows = getattr(hedge_instruments, "data", []) or []
-        hedge_effectiveness_rows = getattr(hedge_effectiveness, "data", []) or []
-
-        # USD PB threshold
-        USD_PB_THRESHOLD = 150000
-        if getattr(threshold_result, "data", None):
-            USD_PB_THRESHOLD = threshold_result.data[0].get("warning_level", 150000)
-
-        return complete_structured_response(
-            # Core data
-            entities_rows, positions_rows, currency_config_rows,
-            # Stage 1A Configuration
-            buffer_config_rows, waterfall_config_rows, overlay_config_rows,
-            hedging_framework_rows, system_config_rows,
-            # Allocation and hedge data
-            allocations_rows, hedge_instructions_rows, hedge_events_rows, car_master_rows,
-            # Thresholds and monitoring
-            total_usd_pb_deposits_rows, risk_monitoring_rows, USD_PB_THRESHOLD,
-            # Currency and rates
-            currency_rates_rows, proxy_config_rows, additional_rates_rows,
-            # Stage 2 booking
-            booking_model_config_rows, murex_books_rows, hedge_instruments_rows,
-            hedge_effectiveness_rows
-        )
+        return await _fetch_complete_hedge_data(exposure_currency, hedge_method, nav_type, currency_type, tables)
 
     except Exception as e:
-        print("============================")
-        print("Complete Data Fetch Error:", str(e))
-        print("============================\n")
+        logger.exception("Complete data fetch failed for %s: %s", exposure_currency, e)
         return {
             "entity_groups": [],
             "stage_1a_config": {},
@@ -317,6 +213,50 @@ def fetch_complete_hedge_data(
             "error": str(e)
         }
 
+async def _fetch_complete_hedge_data(exposure_currency, hedge_method, nav_type, currency_type, tables=None):
+    """
+    Run the hedge snapshot query plan (app.config.HEDGE_SNAPSHOT_PLAN) and structure its rows.
+    tables restricts the fetch to a subset of tables (None fetches everything).
+    """
+    # HEDGE_FETCH_MODE may serve the entity-keyed tables from one consolidated fetch
+    plan = snapshot_plan(HEDGE_SNAPSHOT_PLAN)
+    rows, _ = await run_query_plan(
+        plan,
+        {
+            "exposure_currency": exposure_currency,
+            "hedge_method": hedge_method,
+            "nav_type": nav_type,
+            "currency_type": currency_type,
+            "today": date.today().isoformat(),
+        },
+        tables=tables if tables is None else plan_tables(plan, tables),
+    )
+    # Skipped tables yield no rows
+    rows = defaultdict(list, rows)
+
+    # USD PB threshold
+    USD_PB_THRESHOLD = 150000
+    if rows["threshold_configuration"]:
+        USD_PB_THRESHOLD = rows["threshold_configuration"][0].get("warning_level", 150000)
+
+    with timed("structure"):
+        return complete_structured_response(
+            # Core data
+            rows["entity_master"], rows["position_nav_master"], rows["currency_configuration"],
+            # Stage 1A Configuration
+            rows["buffer_configuration"], rows["waterfall_logic_configuration"], rows["overlay_configuration"],
+            rows["hedging_framework"], rows["system_configuration"],
+            # Allocation and hedge data
+            rows["allocation_engine"], rows["hedge_instructions"], rows["hedge_business_events"], rows["car_master"],
+            # Thresholds and monitoring
+            rows["usd_pb_deposit"], rows["risk_monitoring"], USD_PB_THRESHOLD,
+            # Currency and rates
+            rows["currency_rates"], rows["proxy_configuration"], rows["additional_rates"],
+            # Stage 2 booking
+            rows["instruction_event_config"], rows["murex_book_config"], rows["hedge_instruments"],
+            rows["hedge_effectiveness"]
+        )
+
 def complete_structured_response(
     entities_rows, positions_rows, currency_config_rows,
     buffer_config_rows, waterfall_config_rows, overlay_config_rows,
@@ -375,23 +315,19 @@ def complete_structured_response(
             car_data[eid] = car
 
     # Group positions + compute state
+    entity_positions = [pos for pos in positions_rows if pos.get("entity_id")]
+    hedging_states = calculate_hedging_states(
+        entity_positions, allocation_lookup, hedge_relationships, framework_rules, buffer_rules, car_data
+    )
     grouped = defaultdict(list)
-    for pos in positions_rows:
-        eid = pos.get("entity_id")
-        if not eid:
-            continue
-
+    for pos, hedging_state in zip(entity_positions, hedging_states):
+        eid = pos["entity_id"]
         entity_allocations = allocation_lookup.get(eid, [])
-        latest_allocation = entity_allocations[0] if entity_allocations else {}
         entity_hedge_relationships = hedge_relationships.get(eid, [])
         framework_rule = framework_rules.get(eid, {})
         buffer_rule = buffer_rules.get(eid, {})
         car_info = car_data.get(eid, {})
 
-        hedging_state = calculate_complete_hedging_state(
-            pos, latest_allocation, entity_hedge_relationships, framework_rule, buffer_rule, car_info
-        )
-
         grouped[eid].append({
             "nav_type": pos.get("nav_type", ""),
             "current_position": pos.get("current_position", 0),
@@ -477,6 +413,26 @@ def complete_structured_response(
         "additional_rates": additional_rates_rows
     }
 
+def calculate_hedging_states(positions, allocation_lookup, hedge_relationships, framework_rules, buffer_rules, car_data) -> list:
+    """Hedging state for each position (all carrying an entity_id), vectorized for large books"""
+    if len(positions) >= HEDGING_STATE_COLUMNAR_MIN_POSITIONS:
+        latest_allocations = {eid: rows[0] for eid, rows in allocation_lookup.items() if rows}
+        return columnar_hedging_states(positions, latest_allocations, hedge_relationships, framework_rules, buffer_rules)
+
+    states = []
+    for pos in positions:
+        eid = pos["entity_id"]
+        entity_allocations = allocation_lookup.get(eid, [])
+        states.append(calculate_complete_hedging_state(
+            pos,
+            entity_allocations[0] if entity_allocations else {},
+            hedge_relationships.get(eid, []),
+            framework_rules.get(eid, {}),
+            buffer_rules.get(eid, {}),
+            car_data.get(eid, {})
+        ))
+    return states
+
 def calculate_complete_hedging_state(position, allocation, hedge_relationships, framework_rule, buffer_rule, car_info):
     """Comprehensive hedging state for an entity position"""
     current_position = float(position.get("current_position", 0) or 0)
@@ -0,0 +1,51 @@
+import json
+import logging
+import os
+from contextlib import aclosing
+from app.config import HEDGE_SNAPSHOT_PLAN, HISTORY_TABLES
+from app.db.query_plan import keyset_pages, run_query_plan
+
+logger = logging.getLogger(__name__)
+
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "500"))
+HISTORY_MAX_PAGE_SIZE = int(os.getenv("HISTORY_MAX_PAGE_SIZE", "5000"))
+
+async def _history_context(table: str, params: dict) -> dict:
+    # Dependencies (e.g. the currency's entity ids) are fetched by their snapshot plan nodes
+    spec = HISTORY_TABLES[table]
+    context = dict(params)
+    if spec.depends_on:
+        dependencies = [node for node in HEDGE_SNAPSHOT_PLAN if node.name in spec.depends_on]
+        rows, _ = await run_query_plan(dependencies, params)
+        context.update(rows)
+    return context
+
+async def history_rows(table: str, params: dict, page_size: int = HISTORY_PAGE_SIZE, after=None):
+    """Every row of a history table for the params, newest first; holds one page at a time"""
+    context = await _history_context(table, params)
+    async for page in keyset_pages(HISTORY_TABLES[table], context, page_size, after=after):
+        for row in page:
+            yield row
+
+async def history_ndjson(table: str, params: dict, page_size: int = HISTORY_PAGE_SIZE, after=None, max_rows: int = None):
+    """
+    NDJSON lines for a history stream. The last line is a {"_end": ...} record carrying the row count
+    and the (created_date, id) cursor to resume from, or an {"_error": ...} record if the stream
+    failed part way (the status code has already been sent).
+    """
+    count, last, truncated = 0, None, False
+    try:
+        async with aclosing(history_rows(table, params, page_size, after)) as rows:
+            async for row in rows:
+                if max_rows is not None and count >= max_rows:
+                    truncated = True
+                    break
+                yield json.dumps(row, default=str) + "\n"
+                count, last = count + 1, row
+    except Exception as e:
+        logger.exception("History stream error")
+        yield json.dumps({"_error": str(e), "rows": count}) + "\n"
+        return
+
+    cursor = {"created_date": last.get("created_date"), "id": last.get("id")} if last else None
+    yield json.dumps({"_end": {"rows": count, "cursor": cursor, "truncated": truncated}}, default=str) + "\n"
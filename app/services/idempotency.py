@@ -0,0 +1,53 @@
+import json
+import os
+from starlette.responses import Response
+from app.services.cache import SnapshotCache, SingleFlight
+from app.services.hedge_data import content_hash
+
+# Responses to FPM instructions, kept for IDEMPOTENCY_TTL seconds so a retried instruction
+# (same instruction_type, order_id, sub_order_id and payload) gets the stored response instead
+# of a second fetch and validation. Bounded by rendered body bytes, least recently used first.
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "300"))
+IDEMPOTENCY_MAX_BYTES = int(os.getenv("IDEMPOTENCY_MAX_BYTES", str(64 * 1024 * 1024)))
+
+idempotent_responses = SnapshotCache(IDEMPOTENCY_MAX_BYTES, IDEMPOTENCY_TTL, IDEMPOTENCY_TTL)
+# Duplicates arriving while the first is still running wait on it
+idempotent_flight = SingleFlight()
+
+def idempotency_key(payload: dict, *variant) -> tuple:
+    """(instruction_type, order_id, sub_order_id, hash of the payload and anything else shaping the response)"""
+    body = json.dumps([payload, variant], default=str, sort_keys=True, separators=(",", ":")).encode()
+    return (payload.get("instruction_type"), payload.get("order_id"), payload.get("sub_order_id"), content_hash(body))
+
+def _copy(response: Response, replayed: bool) -> Response:
+    # A fresh Response per request: middleware edits the headers of the one it sends
+    headers = dict(response.headers)
+    if replayed:
+        headers["Idempotent-Replayed"] = "true"
+    return Response(response.body, status_code=response.status_code, headers=headers)
+
+async def run_idempotent(key: tuple, respond) -> Response:
+    """
+    The stored response for key, or respond() run once for all concurrent duplicates.
+    Responses are stored unless they are errors or marked Cache-Control: no-store.
+    """
+    response, state = idempotent_responses.lookup(key)
+    if state is not None:
+        return _copy(response, replayed=True)
+    replayed = key in idempotent_flight
+    response = await idempotent_flight.do(key, lambda: _respond(key, respond))
+    return _copy(response, replayed)
+
+async def _respond(key: tuple, respond) -> Response:
+    response = await respond()
+    if response.status_code < 300 and "no-store" not in response.headers.get("cache-control", ""):
+        idempotent_responses.store(key, response, size=len(response.body))
+    return response
+
+def idempotency_stats() -> dict:
+    return {**idempotent_responses.stats(), "single_flight": idempotent_flight.stats()}
+
+def invalidate_idempotent_responses(order_id: str = None) -> int:
+    if order_id is None:
+        return idempotent_responses.invalidate()
+    return idempotent_responses.invalidate(lambda key: key[1] == order_id)
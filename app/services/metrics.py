@@ -0,0 +1,149 @@
+"""
+Hot-path instrumentation: latency histograms and row/byte counters exported in the Prometheus
+text format at /metrics, and per-request timings returned in a Server-Timing header.
+
+Every PostgREST query is timed in supabase_async.execute (by table), response bytes come from
+an httpx response hook, query plan nodes, snapshot structuring, validation and serialization
+record their durations with timed() / record_timing(). Timings for the Server-Timing header
+are collected in a context variable set per request by InstrumentationMiddleware; outside a
+request they only feed the histograms.
+"""
+import bisect
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+from starlette.datastructures import MutableHeaders
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = []
+
+def _label_pairs(names, values) -> str:
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+class Counter:
+    def __init__(self, name: str, help: str, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values = {}
+        _registry.append(self)
+
+    def inc(self, amount, *labels):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_label_pairs(self.labels, k)} {v}" for k, v in sorted(self._values.items())]
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, tuple(labels), tuple(buckets)
+        self._series = {}  # labels -> [per-bucket counts (last is +Inf), sum, count]
+        _registry.append(self)
+
+    def observe(self, value: float, *labels):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                pairs = _label_pairs(self.labels + ("le",), labels + (bound,))
+                lines.append(f"{self.name}_bucket{pairs} {cumulative}")
+            pairs = _label_pairs(self.labels, labels)
+            lines.append(f"{self.name}_sum{pairs} {total}")
+            lines.append(f"{self.name}_count{pairs} {count}")
+        return lines
+
+db_query_seconds = Histogram("hawk_db_query_duration_seconds", "PostgREST query latency by table", ("table",))
+db_query_rows = Counter("hawk_db_query_rows_total", "Rows returned by PostgREST queries by table", ("table",))
+db_query_errors = Counter("hawk_db_query_errors_total", "Failed PostgREST queries by table", ("table",))
+db_response_bytes = Counter("hawk_db_response_bytes_total", "PostgREST response body bytes by table", ("table",))
+stage_seconds = Histogram("hawk_stage_duration_seconds", "Duration of request stages (query plan nodes, structure, validation, serialize)", ("stage",))
+http_request_seconds = Histogram("hawk_http_request_duration_seconds", "Time to response start by route", ("method", "route", "status"))
+
+def render_metrics() -> str:
+    return "\n".join(line for metric in _registry for line in metric.render()) + "\n"
+
+# ===== REQUEST TIMINGS =====
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+def record_timing(name: str, seconds: float):
+    """Add a duration to the current request's Server-Timing header and the stage histogram"""
+    if not METRICS_ENABLED:
+        return
+    stage_seconds.observe(seconds, name)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+@contextmanager
+def timed(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_timing(name, time.perf_counter() - start)
+
+def observe_query(table: str, seconds: float, rows: int = None):
+    """One PostgREST query: latency and rows, or an error when rows is None"""
+    if not METRICS_ENABLED:
+        return
+    db_query_seconds.observe(seconds, table)
+    if rows is None:
+        db_query_errors.inc(1, table)
+    else:
+        db_query_rows.inc(rows, table)
+
+def query_table(path: str) -> str:
+    """Table (or rpc/function) label from a PostgREST URL or query builder path"""
+    return path.split("/rest/v1/", 1)[-1].lstrip("/")
+
+async def observe_postgrest_response(response):
+    """httpx response hook counting body bytes per table"""
+    if not METRICS_ENABLED:
+        return
+    await response.aread()
+    db_response_bytes.inc(len(response.content), query_table(response.request.url.path))
+
+def server_timing(timings, total: float) -> str:
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in [*timings, ("total", total)])
+
+class InstrumentationMiddleware:
+    """Collects the request's timings into a Server-Timing header and times the request by route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        timings = []
+        token = _request_timings.set(timings)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                total = time.perf_counter() - start
+                MutableHeaders(scope=message)["Server-Timing"] = server_timing(timings, total)
+                route = scope.get("route")
+                http_request_seconds.observe(total, scope["method"], getattr(route, "path", "unmatched"), str(message["status"]))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
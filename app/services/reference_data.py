@@ -0,0 +1,57 @@
+import os
+from collections import defaultdict
+from app.db.supabase_async import execute
+from app.services.cache import TTLCache, MISSING
+
+# Currency-independent configuration tables and how long (seconds) their rows may be reused.
+# Override with REFERENCE_CACHE_TTLS="system_configuration=60,murex_book_config=900"
+REFERENCE_TABLE_TTLS = {
+    "waterfall_logic_configuration": 300,
+    "system_configuration": 300,
+    "threshold_configuration": 300,
+    "murex_book_config": 300,
+    "instruction_event_config": 300,
+}
+for _override in filter(None, os.getenv("REFERENCE_CACHE_TTLS", "").split(",")):
+    _table, _, _ttl = _override.partition("=")
+    REFERENCE_TABLE_TTLS[_table.strip()] = float(_ttl)
+
+REFERENCE_CACHE_MAX_ENTRIES = int(os.getenv("REFERENCE_CACHE_MAX_ENTRIES", "256"))
+
+reference_cache = TTLCache(maxsize=REFERENCE_CACHE_MAX_ENTRIES)
+_table_stats = defaultdict(lambda: {"hits": 0, "misses": 0})
+
+def _query_table(query) -> str:
+    return query.path.rsplit("/", 1)[-1]
+
+async def execute_reference(query) -> list:
+    """Execute a reference-table query through the cache; the key is the table plus its filters"""
+    table = _query_table(query)
+    ttl = REFERENCE_TABLE_TTLS.get(table)
+    if ttl is None:
+        return await execute(query)
+
+    key = (table, str(query.params))
+    rows = reference_cache.get(key, MISSING)
+    if rows is not MISSING:
+        _table_stats[table]["hits"] += 1
+        return rows
+    _table_stats[table]["misses"] += 1
+    rows = await execute(query)
+    reference_cache.set(key, rows, ttl)
+    return rows
+
+def invalidate_reference_data(table: str = None) -> int:
+    """Drop cached rows for one table (or all tables); returns the number of entries dropped"""
+    if table is None:
+        return reference_cache.invalidate()
+    return reference_cache.invalidate(lambda key: key[0] == table)
+
+def reference_cache_stats() -> dict:
+    return {
+        **reference_cache.stats(),
+        "tables": {
+            table: {"ttl": ttl, **_table_stats.get(table, {"hits": 0, "misses": 0})}
+            for table, ttl in REFERENCE_TABLE_TTLS.items()
+        },
+    }
@@ -0,0 +1,151 @@
+# Where the shared rows referenced by compact positions live in the response
+COMPACT_LOOKUPS = {
+    "allocations": "stage_1b_data.current_allocations",
+    "hedge_relationships": "stage_1b_data.active_hedge_events",
+    "framework_rule": "stage_1a_config.hedging_framework",
+    "buffer_rule": "stage_1a_config.buffer_configuration",
+    "car_data": "stage_1b_data.car_master_data",
+}
+
+# Embedded position field -> its key in a compact position's refs
+_EMBEDDED_POSITION_FIELDS = {
+    "allocation_data": "allocations",
+    "hedge_relationships": "hedge_relationships",
+    "framework_rule": "framework_rule",
+    "buffer_rule": "buffer_rule",
+    "car_data": "car_data",
+}
+
+def _row_positions(rows) -> dict:
+    # Positions embed the very same row dicts as the stage lists, so identity finds them without hashing rows
+    return {id(row): index for index, row in enumerate(rows or [])}
+
+def _at_path(data, path: str):
+    for part in path.split("."):
+        data = data.get(part) if isinstance(data, dict) else None
+    return data
+
+def _with_path(data: dict, path: str, value) -> dict:
+    """data with value set at the dotted path, copying the dicts along it"""
+    head, _, rest = path.partition(".")
+    return {**data, head: _with_path(data.get(head) or {}, rest, value) if rest else value}
+
+def compact_structured_response(complete_data: dict, source: dict = None) -> dict:
+    """
+    Normalized form of complete_structured_response output. Each shared row appears once,
+    in its stage list; positions carry a "refs" dict of indexes into those lists (and the
+    entity_id key of stage_1b_data.active_hedge_events) instead of embedded copies.
+
+    complete_data may be a projection (project_fields) of source, the full snapshot: refs
+    then index source's lists, and the lists they point to are added back when the
+    projection left them out. An embedded field whose rows are not in source stays embedded.
+    """
+    if "error" in complete_data:
+        return complete_data
+    source = complete_data if source is None else source
+
+    stage_1a = source.get("stage_1a_config", {})
+    stage_1b = source.get("stage_1b_data", {})
+    allocation_index = _row_positions(stage_1b.get("current_allocations"))
+    row_indexes = {
+        "framework_rule": _row_positions(stage_1a.get("hedging_framework")),
+        "buffer_rule": _row_positions(stage_1a.get("buffer_configuration")),
+        "car_data": _row_positions(stage_1b.get("car_master_data")),
+    }
+    hedge_events = stage_1b.get("active_hedge_events") or {}
+
+    def resolve(kind, eid, value):
+        """(resolved, ref) for one embedded field"""
+        if kind == "allocations":
+            indexes = [allocation_index.get(id(row)) for row in value or []]
+            return None not in indexes, indexes
+        if kind == "hedge_relationships":
+            return not value or value is hedge_events.get(eid), eid if value else None
+        index = row_indexes[kind].get(id(value))
+        return index is not None or not value, index
+
+    used = set()
+    compact_data = dict(complete_data)
+    if "entity_groups" in complete_data:
+        entity_groups = []
+        for group in complete_data["entity_groups"]:
+            eid = group.get("entity_id")
+            positions = []
+            for position in group.get("positions", []):
+                compact, refs = {}, {}
+                for key, value in position.items():
+                    kind = _EMBEDDED_POSITION_FIELDS.get(key)
+                    resolved, ref = resolve(kind, eid, value) if kind else (False, None)
+                    if resolved:
+                        refs[kind] = ref
+                    else:
+                        compact[key] = value
+                if refs:
+                    compact["refs"] = refs
+                    used.update(refs)
+                positions.append(compact)
+            entity_groups.append({**group, "positions": positions} if "positions" in group else group)
+        compact_data["entity_groups"] = entity_groups
+
+    lookups = {kind: path for kind, path in COMPACT_LOOKUPS.items() if kind in used}
+    for path in lookups.values():
+        if _at_path(compact_data, path) is None and _at_path(source, path) is not None:
+            compact_data = _with_path(compact_data, path, _at_path(source, path))
+    if lookups:
+        compact_data["lookups"] = lookups
+    return compact_data
+
+# Keys kept alongside any projected sub-field so projected rows stay identifiable
+_IDENTITY_FIELDS = {
+    ("entity_groups",): ("entity_id",),
+    ("entity_groups", "positions"): ("nav_type",),
+}
+
+def _path_tree(paths) -> dict:
+    tree = {}
+    for path in paths:
+        node = tree
+        parts = path.split(".")
+        for i, part in enumerate(parts):
+            if node.get(part) is True:
+                break
+            if i == len(parts) - 1:
+                node[part] = True
+            else:
+                node = node.setdefault(part, {})
+    return tree
+
+def _include(value, tree, prefix=()):
+    if tree is True:
+        return value
+    if isinstance(value, list):
+        return [_include(item, tree, prefix) for item in value]
+    if not isinstance(value, dict):
+        return value
+    keep = {key: True for key in _IDENTITY_FIELDS.get(prefix, ()) if key in value}
+    keep.update(tree)
+    return {key: _include(value[key], sub, prefix + (key,)) for key, sub in keep.items() if key in value}
+
+def _exclude(value, tree):
+    if isinstance(value, list):
+        return [_exclude(item, tree) for item in value]
+    if not isinstance(value, dict):
+        return value
+    return {
+        key: (_exclude(item, tree[key]) if key in tree else item)
+        for key, item in value.items()
+        if tree.get(key) is not True
+    }
+
+def project_fields(data: dict, fields=None, exclude=()) -> dict:
+    """
+    Keep only the dotted field paths in fields (descending through lists), then drop
+    the paths in exclude. e.g. fields=["entity_groups.positions.hedging_state"]
+    """
+    if "error" in data:
+        return data
+    if fields:
+        data = _include(data, _path_tree(fields))
+    if exclude:
+        data = _exclude(data, _path_tree(exclude))
+    return data
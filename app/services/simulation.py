@@ -0,0 +1,114 @@
+import numpy as np
+from app.services.fx_rates import BASE_CURRENCY, rate_value
+
+def spot_rate(rate_rows: list, currency: str):
+    """SGD per unit of currency from the newest {currency}SGD or SGD{currency} row"""
+    if currency == BASE_CURRENCY:
+        return 1.0
+    for row in rate_rows or []:
+        rate = rate_value(row)
+        if not rate:
+            continue
+        if row.get("currency_pair") == f"{currency}{BASE_CURRENCY}":
+            return rate
+        if row.get("currency_pair") == f"{BASE_CURRENCY}{currency}":
+            return 1.0 / rate
+    return None
+
+def _position_column(positions: list, read) -> np.ndarray:
+    return np.fromiter((float(read(p) or 0) for p in positions), dtype=np.float64, count=len(positions))
+
+def _rounded(values: np.ndarray, digits: int = 2) -> list:
+    # NaN (no rate for the currency) becomes null
+    return [None if v != v else v for v in np.round(values, digits).ravel().tolist()]
+
+def simulate_scenarios(complete_data: dict, exposure_currency: str, hedge_amounts: list, rate_shocks: list) -> dict:
+    """
+    Evaluate every hedge amount under every rate shock against one snapshot, in one broadcast pass.
+
+    Capacity is the sum of positive calculated_available_amount over positions (what the
+    waterfall can allocate); utilisation is the book's hedged share after the order. A shock
+    scales the exposure currency's SGD rate and the USD equivalent of PB deposits, which are
+    checked against the USD PB threshold. A scenario passes when the order fits capacity and
+    the shocked deposits stay within the threshold.
+    """
+    positions = [p for group in complete_data.get("entity_groups", []) for p in group.get("positions", [])]
+    available = _position_column(positions, lambda p: (p.get("hedging_state") or {}).get("calculated_available_amount"))
+    hedged = _position_column(positions, lambda p: (p.get("hedging_state") or {}).get("already_hedged_amount"))
+    current = _position_column(positions, lambda p: p.get("current_position"))
+    capacity = float(np.clip(available, 0, None).sum())
+    hedged_total = float(hedged.sum())
+    position_total = float(np.clip(current, 0, None).sum())
+
+    threshold_config = complete_data.get("stage_1a_config", {}).get("threshold_configuration", {})
+    usd_pb_threshold = float(threshold_config.get("usd_pb_threshold") or 0)
+    usd_pb_total = float(threshold_config.get("usd_pb_check", {}).get("total_usd_equivalent") or 0)
+    rate = spot_rate(complete_data.get("currency_rates"), exposure_currency)
+
+    # Scenario grid: hedge amounts down, shocks across
+    amounts = np.asarray(hedge_amounts, dtype=np.float64)[:, None]
+    shocks = np.asarray(rate_shocks, dtype=np.float64)[None, :]
+    shape = (amounts.shape[0], shocks.shape[1])
+
+    shocked_rate = (np.nan if rate is None else rate) * (1.0 + shocks)
+    fits_capacity = amounts <= capacity
+    remaining_capacity = capacity - amounts
+    if position_total > 0:
+        utilization = (hedged_total + amounts) / position_total * 100.0
+    else:
+        utilization = np.zeros_like(amounts)
+    shocked_usd_pb = usd_pb_total * (1.0 + shocks)
+    usd_pb_pass = shocked_usd_pb <= usd_pb_threshold
+    passes = fits_capacity & usd_pb_pass
+
+    def grid(values):
+        return np.broadcast_to(values, shape)
+
+    columns = zip(
+        grid(amounts).ravel().tolist(),
+        grid(shocks).ravel().tolist(),
+        _rounded(grid(shocked_rate), 8),
+        _rounded(grid(remaining_capacity)),
+        grid(fits_capacity).ravel().tolist(),
+        _rounded(grid(utilization)),
+        _rounded(grid(amounts * shocked_rate)),
+        _rounded(grid(capacity * shocked_rate)),
+        _rounded(grid(shocked_usd_pb)),
+        grid(usd_pb_pass).ravel().tolist(),
+        grid(passes).ravel().tolist(),
+    )
+    scenarios = [
+        {
+            "hedge_amount_order": amount,
+            "rate_shock": shock,
+            "shocked_rate": shocked,
+            "capacity": round(capacity, 2),
+            "remaining_capacity": remaining,
+            "fits_capacity": fits,
+            "utilization_pct": utilization_pct,
+            "hedge_amount_sgd": hedge_sgd,
+            "capacity_sgd": capacity_sgd,
+            "usd_pb_total": usd_pb,
+            "usd_pb_status": "PASS" if usd_ok else "FAIL",
+            "status": "PASS" if ok else "FAIL",
+        }
+        for amount, shock, shocked, remaining, fits, utilization_pct, hedge_sgd, capacity_sgd, usd_pb, usd_ok, ok in columns
+    ]
+
+    # Largest passing hedge amount under each shock
+    largest = np.where(grid(passes), grid(amounts), -np.inf).max(axis=0)
+    return {
+        "capacity": round(capacity, 2),
+        "already_hedged_total": round(hedged_total, 2),
+        "position_total": round(position_total, 2),
+        "spot_rate": rate,
+        "usd_pb_threshold": usd_pb_threshold,
+        "usd_pb_total": usd_pb_total,
+        "scenario_count": len(scenarios),
+        "passing_scenarios": int(passes.sum()),
+        "max_passing_amount_by_shock": [
+            {"rate_shock": shock, "max_hedge_amount_order": None if np.isinf(value) else value}
+            for shock, value in zip(rate_shocks, largest.tolist())
+        ],
+        "scenarios": scenarios,
+    }
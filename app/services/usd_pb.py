@@ -0,0 +1,54 @@
+import logging
+import os
+from postgrest.exceptions import APIError
+from app.db.supabase_async import get_async_client, execute
+
+logger = logging.getLogger(__name__)
+
+# Server-side total of usd_pb_deposit.total_usd_deposits, defined in Supabase as:
+#
+#   create or replace function usd_pb_deposit_total()
+#   returns table (total_usd_deposits numeric)
+#   language sql stable as $$
+#       select coalesce(sum(total_usd_deposits), 0) from usd_pb_deposit
+#   $$;
+USD_PB_TOTAL_RPC = os.getenv("USD_PB_TOTAL_RPC", "usd_pb_deposit_total")
+
+# Tried in order; a strategy PostgREST rejects (missing function, aggregates disabled)
+# is dropped for the life of the worker. "rows" is the original full-table pull.
+USD_PB_STRATEGIES = ("rpc", "aggregate", "rows")
+# Error codes that mean a strategy is unsupported rather than failing this once:
+# function not in the schema cache / undefined_function, and aggregate functions disabled
+UNSUPPORTED_CODES = {
+    "rpc": {"PGRST202", "42883"},
+    "aggregate": {"PGRST123"},
+}
+_strategy = 0
+
+async def fetch_usd_pb_deposit_rows() -> list:
+    """
+    Rows for the USD PB threshold check. Returns a single pre-aggregated
+    {"total_usd_deposits": total} row when the database can sum it, else every deposit row.
+    """
+    global _strategy
+    db = get_async_client()
+    while USD_PB_STRATEGIES[_strategy] != "rows":
+        strategy = USD_PB_STRATEGIES[_strategy]
+        try:
+            if strategy == "rpc":
+                rows = await execute(db.rpc(USD_PB_TOTAL_RPC, {}))
+                return [{"total_usd_deposits": rows[0].get("total_usd_deposits") if rows else 0}]
+            # PostgREST aggregate functions (db-aggregates-enabled)
+            rows = await execute(db.table("usd_pb_deposit").select("total_usd_deposits.sum()"))
+            return [{"total_usd_deposits": rows[0].get("sum") if rows else 0}]
+        except APIError as e:
+            if e.code not in UNSUPPORTED_CODES[strategy]:
+                raise
+            logger.warning("USD PB %s aggregation unavailable, falling back: %s", strategy, e)
+            # Concurrent callers may fail the same strategy; only ever move forward one step past it
+            _strategy = max(_strategy, USD_PB_STRATEGIES.index(strategy) + 1)
+
+    return await execute(db.table("usd_pb_deposit").select("total_usd_deposits"))
+
+def usd_pb_strategy() -> str:
+    return USD_PB_STRATEGIES[_strategy]
@@ -0,0 +1,47 @@
+"""
+Waterfall allocation latency by book size and order size, with invariant checks.
+
+    python -m benchmarks.bench_allocation [entities ...]
+"""
+import gc
+import statistics
+import sys
+import time
+from app.services.aggregate import allocate_hedge_order
+from app.services.hedge_data import complete_structured_response
+from benchmarks.synthetic import generate_dataset, structured_response_args
+
+def _time(fn, repeat: int = 5):
+    samples, result = [], None
+    for _ in range(repeat):
+        gc.collect()  # keep collections triggered by building the book out of the samples
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(samples)
+
+def _check(plan: dict):
+    allocated = sum(round(a["allocated_amount"] * 100) for a in plan["allocations"])
+    assert allocated == round(plan["allocated_amount"] * 100), (allocated, plan["allocated_amount"])
+    assert all(a["allocated_amount"] <= a["capacity"] for a in plan["allocations"])
+    assert plan["allocated_amount"] == min(plan["hedge_amount_order"], plan["total_capacity"])
+    priorities = [t["waterfall_priority"] for t in plan["tiers"]]
+    assert priorities == sorted(priorities, key=lambda p: float("inf") if p is None else p)
+
+def run(entity_counts=(3334, 16667)):
+    print(f"{'positions':>9} {'eligible':>8} {'order':>14} {'status':>19} {'tiers':>5} {'allocations':>11} {'ms':>8}")
+    for n in entity_counts:
+        data = complete_structured_response(*structured_response_args(generate_dataset(n, navs_per_entity=3)))
+        groups = data["entity_groups"]
+        rules = data["stage_1a_config"]["waterfall_logic"]["opening"]
+        positions = sum(len(g["positions"]) for g in groups)
+        for order in (5e6, 5e8, 1e9, 1e15):
+            plan, ms = _time(lambda: allocate_hedge_order(groups, order, rules))
+            _check(plan)
+            print(
+                f"{positions:>9} {plan['eligible_positions']:>8} {order:>14.0f} {plan['status']:>19} "
+                f"{len(plan['tiers']):>5} {len(plan['allocations']):>11} {ms:>8.2f}"
+            )
+
+if __name__ == "__main__":
+    run([int(a) for a in sys.argv[1:]] or (3334, 16667))
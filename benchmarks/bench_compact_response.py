@@ -0,0 +1,44 @@
+"""
+Response size and serialization latency: full vs compact validate-book bodies.
+
+    python -m benchmarks.bench_compact_response [entities ...]
+"""
+import json
+import statistics
+import sys
+import time
+from app.services.hedge_data import complete_structured_response
+from app.services.response_format import compact_structured_response
+from benchmarks.synthetic import generate_dataset, structured_response_args
+
+PAYLOAD = {
+    "instruction_type": "I", "order_id": "ORD_001", "sub_order_id": "SUB_001", "exposure_currency": "HKD",
+    "hedge_amount_order": 5000000.0, "hedge_method": "COH", "nav_type": None, "currency_type": None,
+}
+
+def _time(fn, repeat: int = 5):
+    samples, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(samples)
+
+def run(entity_counts=(10, 100, 1000)):
+    print(f"{'entities':>8} {'positions':>9} {'full KB':>9} {'compact KB':>10} {'ratio':>6} {'full ms':>8} {'compact ms':>10}")
+    for n in entity_counts:
+        data = complete_structured_response(*structured_response_args(generate_dataset(n, navs_per_entity=3)))
+        positions = sum(len(g["positions"]) for g in data["entity_groups"])
+
+        full_body, full_ms = _time(lambda: json.dumps({"complete_data": data, "payload": PAYLOAD}))
+        compact_body, compact_ms = _time(lambda: json.dumps({
+            "complete_data": compact_structured_response(data),
+            "payload": {"order_id": PAYLOAD["order_id"], "sub_order_id": PAYLOAD["sub_order_id"]},
+        }))
+        print(
+            f"{n:>8} {positions:>9} {len(full_body) / 1024:>9.1f} {len(compact_body) / 1024:>10.1f} "
+            f"{len(compact_body) / len(full_body):>6.2f} {full_ms:>8.2f} {compact_ms:>10.2f}"
+        )
+
+if __name__ == "__main__":
+    run([int(a) for a in sys.argv[1:]] or (10, 100, 1000))
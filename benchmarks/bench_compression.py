@@ -0,0 +1,74 @@
+"""
+Bytes on wire and CPU cost per request of response compression, by coding and level.
+Bodies are validate-book responses rendered as the endpoint does and sent through
+CompressionMiddleware; "largest send" is the biggest single body message it emitted.
+
+    python -m benchmarks.bench_compression [entities ...]
+"""
+import asyncio
+import statistics
+import sys
+import time
+from app.api.compression import CompressionMiddleware
+from app.api.responses import PydanticJSONResponse
+from app.api.v1 import validation_sections
+from app.models.payloads import HedgeInceptionInstruction
+from app.services.hedge_data import ALL_STAGES, complete_structured_response
+from app.services.response_format import compact_structured_response
+from benchmarks.synthetic import generate_dataset, structured_response_args
+
+PAYLOAD = HedgeInceptionInstruction(
+    instruction_type="I", order_id="ORD_001", sub_order_id="SUB_001", exposure_currency="HKD",
+    hedge_amount_order=5000000.0, hedge_method="COH",
+)
+PAYLOAD_ECHO = PAYLOAD.dict()
+
+def _endpoint(response):
+    # Replays a rendered response; fresh header list per request since the middleware edits it
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": list(response.raw_headers)})
+        await send({"type": "http.response.body", "body": response.body})
+    return app
+
+def _request(app, accept_encoding: str):
+    scope = {"type": "http", "method": "POST", "path": "/", "headers": [(b"accept-encoding", accept_encoding.encode())]}
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            sent.append(len(message.get("body", b"")))
+
+    asyncio.run(app(scope, receive, send))
+    return sum(sent), max(sent)
+
+def _cpu(fn, repeat: int = 5):
+    samples, result = [], None
+    for _ in range(repeat):
+        start = time.process_time()
+        result = fn()
+        samples.append((time.process_time() - start) * 1000)
+    return result, statistics.median(samples)
+
+def run(entity_counts=(334,)):
+    print(f"{'positions':>9} {'format':>7} {'coding':>8} {'level':>5} {'wire KB':>9} {'ratio':>6} {'largest send KB':>15} {'cpu ms':>7}")
+    for n in entity_counts:
+        data = complete_structured_response(*structured_response_args(generate_dataset(n, navs_per_entity=3)))
+        positions = sum(len(g["positions"]) for g in data["entity_groups"])
+        sections = validation_sections(data, PAYLOAD, ALL_STAGES, None)
+        for response_format, complete_data in (("full", data), ("compact", compact_structured_response(data))):
+            response = PydanticJSONResponse({"status": "success", "complete_data": complete_data, "payload": PAYLOAD_ECHO, **sections})
+            identity = len(response.body)
+            cases = [("identity", 6)] + [(coding, level) for coding in ("gzip", "deflate") for level in (1, 6, 9)]
+            for coding, level in cases:
+                app = CompressionMiddleware(_endpoint(response), level=level)
+                (wire, largest), ms = _cpu(lambda: _request(app, coding))
+                print(
+                    f"{positions:>9} {response_format:>7} {coding:>8} {level if coding != 'identity' else '-':>5} "
+                    f"{wire / 1024:>9.1f} {wire / identity:>6.3f} {largest / 1024:>15.1f} {ms:>7.2f}"
+                )
+
+if __name__ == "__main__":
+    run([int(a) for a in sys.argv[1:]] or (334,))
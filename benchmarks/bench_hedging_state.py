@@ -0,0 +1,73 @@
+"""
+Hedging-state computation: per-row function vs the columnar engine, with an equality check.
+
+    python -m benchmarks.bench_hedging_state [entities ...]
+"""
+import json
+import statistics
+import sys
+import time
+from collections import defaultdict
+from app.services.hedge_data import calculate_complete_hedging_state
+from app.services.hedging_state import columnar_hedging_states
+from benchmarks.synthetic import generate_dataset
+
+def _time(fn, repeat: int = 5):
+    samples, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(samples)
+
+def _lookups(data: dict):
+    allocations = defaultdict(list)
+    for row in sorted(data["allocation_engine"], key=lambda r: r["created_date"], reverse=True):
+        allocations[row["entity_id"]].append(row)
+    events = defaultdict(list)
+    for row in data["hedge_business_events"]:
+        events[row["entity_id"]].append(row)
+    frameworks = {row["entity_id"]: row for row in data["hedging_framework"]}
+    buffers = {row["entity_id"]: row for row in data["buffer_configuration"]}
+    return {eid: rows[0] for eid, rows in allocations.items()}, events, frameworks, buffers
+
+def _with_edge_cases(data: dict) -> dict:
+    # Mixed types the tables can return: numeric strings, NULLs, zero and negative positions
+    positions = data["position_nav_master"]
+    for i, row in enumerate(positions):
+        if i % 11 == 0:
+            row["current_position"] = str(row["current_position"])
+        elif i % 13 == 0:
+            row["current_position"] = None
+        elif i % 17 == 0:
+            row["current_position"] = -row["current_position"]
+    for i, row in enumerate(data["allocation_engine"]):
+        if i % 7 == 0:
+            row["hedged_position"] = None
+        elif i % 19 == 0:
+            row["available_amount_for_hedging"] = "0"
+    return data
+
+def run(entity_counts=(100, 1000, 10000)):
+    print(f"{'positions':>9} {'events':>7} {'row ms':>8} {'columnar ms':>11} {'speedup':>7} {'identical':>9}")
+    for n in entity_counts:
+        data = _with_edge_cases(generate_dataset(n, navs_per_entity=3, events_per_entity=10))
+        positions = data["position_nav_master"]
+        latest, events, frameworks, buffers = _lookups(data)
+
+        rows, row_ms = _time(lambda: [
+            calculate_complete_hedging_state(
+                p, latest.get(p["entity_id"], {}), events.get(p["entity_id"], []),
+                frameworks.get(p["entity_id"], {}), buffers.get(p["entity_id"], {}), {}
+            )
+            for p in positions
+        ])
+        columns, columnar_ms = _time(lambda: columnar_hedging_states(positions, latest, events, frameworks, buffers))
+        identical = json.dumps(rows) == json.dumps(columns)
+        print(
+            f"{len(positions):>9} {len(data['hedge_business_events']):>7} {row_ms:>8.2f} {columnar_ms:>11.2f} "
+            f"{row_ms / columnar_ms:>7.2f} {str(identical):>9}"
+        )
+
+if __name__ == "__main__":
+    run([int(a) for a in sys.argv[1:]] or (100, 1000, 10000))
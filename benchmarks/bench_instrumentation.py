@@ -0,0 +1,111 @@
+"""
+Overhead of the hot-path instrumentation (app.services.metrics). Each primitive is timed on
+its own and multiplied by how often a validate-book request fires it: every query of the
+snapshot plan is observed, has its bytes counted and records a db.* timing, four stages
+(snapshot, structure, validation, serialize) record timings, and the middleware wraps the
+request. The run fails when that bound exceeds BUDGET_US; it is also shown as a share of the
+request's in-process work (structuring, validation and serialization, without any database
+time), which is below 1% from a few hundred entities up.
+
+    python -m benchmarks.bench_instrumentation [entities]
+"""
+import statistics
+import sys
+import time
+import httpx
+import app.services.metrics as metrics
+from app.api.responses import PydanticJSONResponse
+from app.api.v1 import validation_sections
+from app.config import HEDGE_SNAPSHOT_PLAN
+from app.models.payloads import HedgeInceptionInstruction
+from app.services.hedge_data import ALL_STAGES, complete_structured_response
+from benchmarks.synthetic import generate_dataset, structured_response_args
+
+BUDGET_US = 500
+STAGES = ("snapshot", "structure", "validation", "serialize")
+PAYLOAD = HedgeInceptionInstruction(
+    instruction_type="I", order_id="ORD_001", sub_order_id="SUB_001", exposure_currency="HKD",
+    hedge_amount_order=5000000.0, hedge_method="COH",
+)
+PAYLOAD_ECHO = PAYLOAD.dict()
+
+def _drive(coro):
+    # The coroutines timed here never suspend, so one send runs them to completion
+    try:
+        coro.send(None)
+    except StopIteration:
+        return
+    raise RuntimeError("coroutine suspended")
+
+def _per_call_us(fn, calls: int = 20000, repeat: int = 5) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        samples.append((time.perf_counter() - start) / calls * 1e6)
+    return statistics.median(samples)
+
+def _primitive_costs() -> dict:
+    response = httpx.Response(200, content=b"[]" * 512, request=httpx.Request("GET", "http://t/rest/v1/entity_master"))
+    response.read()
+
+    def timed_block():
+        with metrics.timed("bench"):
+            pass
+
+    async def endpoint(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": []}
+    middleware = metrics.InstrumentationMiddleware(endpoint)
+    bare = _per_call_us(lambda: _drive(endpoint(scope, receive, send)))
+    return {
+        "observe_query": _per_call_us(lambda: metrics.observe_query("bench", 0.01, 10)),
+        "response_hook": _per_call_us(lambda: _drive(metrics.observe_postgrest_response(response))),
+        "timed": _per_call_us(timed_block),
+        "middleware": _per_call_us(lambda: _drive(middleware(scope, receive, send))) - bare,
+    }
+
+def _request_work_ms(entities: int, repeat: int = 5) -> float:
+    args = structured_response_args(generate_dataset(entities, navs_per_entity=3))
+
+    def request():
+        data = complete_structured_response(*args)
+        sections = validation_sections(data, PAYLOAD, ALL_STAGES, None)
+        return PydanticJSONResponse({"status": "success", "complete_data": data, "payload": PAYLOAD_ECHO, **sections})
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        request()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+def run(entities: int = 334) -> bool:
+    costs = _primitive_costs()
+    queries = len(HEDGE_SNAPSHOT_PLAN)
+    bound_us = queries * (costs["observe_query"] + costs["response_hook"] + costs["timed"]) + len(STAGES) * costs["timed"] + costs["middleware"]
+    metrics.METRICS_ENABLED = False
+    work_ms = _request_work_ms(entities)
+    metrics.METRICS_ENABLED = True
+
+    print(f"{'primitive':>14} {'us/call':>8}")
+    for name, us in costs.items():
+        print(f"{name:>14} {us:>8.2f}")
+    print(f"\nvalidate-book: {queries} queries, {queries + len(STAGES)} timings per request")
+    print(f"instrumentation bound {bound_us:.1f} us per request")
+    print(f"in-process work at {entities} entities {work_ms:.1f} ms; bound is {bound_us / 1000 / work_ms:.3%} of it")
+    within = bound_us <= BUDGET_US
+    print(f"budget {BUDGET_US} us per request: {'ok' if within else 'EXCEEDED'}")
+    return within
+
+if __name__ == "__main__":
+    sys.exit(0 if run(*[int(a) for a in sys.argv[1:2]]) else 1)
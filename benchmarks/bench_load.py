@@ -0,0 +1,257 @@
+"""
+Load scenarios for validate-book against the in-process PostgREST stand-in
+(benchmarks.fake_postgrest) over synthetic data. Requests go through the full ASGI app,
+middleware included, with httpx.ASGITransport; client, service and stand-in share one
+event loop, so throughput is that of a single worker with the database time simulated.
+
+Scenarios:
+  cold        snapshot cache cleared before every request (concurrent requests may still share a fetch)
+  warm        cached snapshot, a new order each request: validation and serialization every time
+  compact     warm, response_format=compact
+  stream      warm, NDJSON (Accept: application/x-ndjson), body read to the end
+  replay      the same order again: answered from the idempotency store
+  conditional If-None-Match with the current ETag: 304
+
+Each (entities, scenario, concurrency) reports throughput, p50/p90/p99/max latency,
+PostgREST queries per request and the stand-in's own CPU time per request (part of the
+latencies), and errors, which include 200 responses whose snapshot fetch failed. Results are written as JSON to benchmarks/results/ (git-ignored; or
+--output) with the commit and settings they were measured on; --compare prints the change
+against an earlier results file.
+
+    python -m benchmarks.bench_load --entities 10 1000 --latency-ms 5 --jitter-ms 5 --concurrency 1 16
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+import httpx
+from app.db import supabase_async
+from app.services.hedge_data import invalidate_snapshots
+from app.services.idempotency import invalidate_idempotent_responses
+from app.services.reference_data import invalidate_reference_data
+from app.services.fx_rates import refresh_fx_index
+from benchmarks.fake_postgrest import FakePostgREST
+from benchmarks.synthetic import generate_dataset
+
+URL = "/api/v1/hedge/inception/validate-book"
+SCENARIOS = ("cold", "warm", "compact", "stream", "replay", "conditional")
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+# Settings read from the environment that change what is being measured
+RECORDED_ENV = (
+    "HEDGE_FETCH_MODE", "JSON_RESPONSE_BACKEND", "SUPABASE_MAX_CONCURRENCY", "SUPABASE_POOL_MAX_CONNECTIONS",
+    "SNAPSHOT_CACHE_TTL", "SNAPSHOT_CACHE_MAX_BYTES", "COMPRESSION_LEVEL", "METRICS_ENABLED",
+)
+
+def _body(order: int) -> dict:
+    return {
+        "exposure_currency": "HKD", "hedge_method": "COH", "nav_type": "COI", "currency_type": "Matched",
+        "order_id": f"LOAD_{order:08d}", "sub_order_id": "SUB_001", "hedge_amount_order": 5000000.0, "instruction_type": "I",
+    }
+
+def _failed(response: httpx.Response) -> bool:
+    # A failed snapshot fetch is still answered 200, with "status": "error" leading the body
+    # (after "record": "header" in NDJSON)
+    return response.status_code >= 400 or b'"status":"error"' in response.content[:64]
+
+def _percentile(ordered: list, p: float) -> float:
+    """Nearest-rank percentile of a sorted list"""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered) + 0.5)) - 1))]
+
+class Scenario:
+    """Builds each request of a scenario; prepare() runs once before the timed requests"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.orders = iter(range(10 ** 8))
+        self.etag = None
+
+    async def prepare(self, client):
+        if self.name in ("replay", "conditional"):
+            response = await client.post(URL, json=_body(0))
+            if _failed(response) or "etag" not in response.headers:
+                raise RuntimeError(f"{self.name}: the priming request failed: {response.content[:200]!r}")
+            self.etag = response.headers["etag"]
+
+    async def request(self, client) -> httpx.Response:
+        if self.name == "cold":
+            invalidate_snapshots()
+        if self.name in ("replay", "conditional"):
+            headers = {"If-None-Match": self.etag} if self.name == "conditional" else {}
+            return await client.post(URL, json=_body(0), headers=headers)
+        body = _body(next(self.orders) + 1)
+        if self.name == "compact":
+            return await client.post(URL, params={"response_format": "compact"}, json=body)
+        if self.name == "stream":
+            async with client.stream("POST", URL, json=body, headers={"Accept": "application/x-ndjson"}) as response:
+                await response.aread()
+            return response
+        return await client.post(URL, json=body)
+
+async def run_scenario(client, postgrest: FakePostgREST, name: str, concurrency: int, requests: int, warmup: int) -> dict:
+    scenario = Scenario(name)
+    await scenario.prepare(client)
+    for _ in range(warmup):
+        await scenario.request(client)
+
+    postgrest.reset_stats()
+    latencies, errors, remaining = [], 0, iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                response = await scenario.request(client)
+            except Exception:
+                response = None
+            latencies.append((time.perf_counter() - start) * 1000)
+            errors += response is None or _failed(response)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    backend = postgrest.stats()
+    return {
+        "scenario": name,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": round(requests / elapsed, 2),
+        "latency_ms": {
+            "p50": round(_percentile(latencies, 50), 3),
+            "p90": round(_percentile(latencies, 90), 3),
+            "p99": round(_percentile(latencies, 99), 3),
+            "max": round(latencies[-1], 3),
+            "mean": round(sum(latencies) / len(latencies), 3),
+        },
+        "postgrest_queries_per_request": round(backend["queries"] / requests, 2),
+        "postgrest_bytes_per_request": round(backend["bytes"] / requests),
+        # Stand-in CPU included in the latencies above (it runs on the same event loop)
+        "postgrest_cpu_ms_per_request": round(backend["cpu_ms"] / requests, 3),
+    }
+
+async def run_entities(entities: int, args) -> list:
+    from app.main import app
+    data = generate_dataset(entities, navs_per_entity=3)
+    postgrest = FakePostgREST(data, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, seed=args.seed)
+    await supabase_async.init_async_client(httpx.ASGITransport(app=postgrest))
+    # Caches from the previous dataset size must not answer for this one
+    invalidate_snapshots()
+    invalidate_idempotent_responses()
+    invalidate_reference_data()
+    await refresh_fx_index()
+    results = []
+    try:
+        headers = {"Accept-Encoding": args.accept_encoding}
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", headers=headers, timeout=None) as client:
+            for name in args.scenarios:
+                for concurrency in args.concurrency:
+                    result = await run_scenario(client, postgrest, name, concurrency, args.requests, args.warmup)
+                    result["entities"] = entities
+                    results.append(result)
+                    _print_result(result)
+                    invalidate_idempotent_responses()
+    finally:
+        await supabase_async.close_async_client()
+    return results
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _print_header():
+    print(
+        f"{'entities':>8} {'scenario':>11} {'conc':>4} {'req/s':>9} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} "
+        f"{'max ms':>9} {'queries':>7} {'pg cpu ms':>9} {'errors':>6}"
+    )
+
+def _print_result(result: dict):
+    latency = result["latency_ms"]
+    print(
+        f"{result['entities']:>8} {result['scenario']:>11} {result['concurrency']:>4} {result['throughput_rps']:>9.1f} "
+        f"{latency['p50']:>9.2f} {latency['p90']:>9.2f} {latency['p99']:>9.2f} {latency['max']:>9.2f} "
+        f"{result['postgrest_queries_per_request']:>7.1f} {result['postgrest_cpu_ms_per_request']:>9.2f} {result['errors']:>6}"
+    )
+
+def compare(previous: dict, current: dict):
+    """Change in throughput and p50/p99 for every run present in both results files"""
+    key = lambda r: (r["entities"], r["scenario"], r["concurrency"])
+    before = {key(r): r for r in previous["results"]}
+    print(f"\ncompared with {previous['meta'].get('commit')} ({previous['meta'].get('timestamp')})")
+    print(f"{'entities':>8} {'scenario':>11} {'conc':>4} {'req/s':>9} {'p50':>9} {'p99':>9}")
+    change = lambda new, old: f"{(new / old - 1):>+9.1%}" if old else f"{'-':>9}"
+    for result in current["results"]:
+        old = before.get(key(result))
+        if old is None:
+            continue
+        print(
+            f"{result['entities']:>8} {result['scenario']:>11} {result['concurrency']:>4} "
+            f"{change(result['throughput_rps'], old['throughput_rps'])} "
+            f"{change(result['latency_ms']['p50'], old['latency_ms']['p50'])} "
+            f"{change(result['latency_ms']['p99'], old['latency_ms']['p99'])}"
+        )
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0], formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entities", type=int, nargs="+", default=[10, 1000], help="dataset sizes, 10 to 100000")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16])
+    parser.add_argument("--requests", type=int, default=100, help="timed requests per scenario and concurrency")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="PostgREST latency per query")
+    parser.add_argument("--jitter-ms", type=float, default=5.0, help="extra latency per query, uniform in [0, jitter]")
+    parser.add_argument("--accept-encoding", default="gzip", help="sent with every request; identity turns compression off")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="results file (default benchmarks/results/load-<time>-<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    started = datetime.now(timezone.utc)
+    commit = _git_commit()
+    _print_header()
+    results = []
+    for entities in args.entities:
+        results += asyncio.run(run_entities(entities, args))
+
+    report = {
+        "meta": {
+            "timestamp": started.isoformat(timespec="seconds"),
+            "commit": commit,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "settings": {
+                "latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms, "requests": args.requests,
+                "warmup": args.warmup, "accept_encoding": args.accept_encoding, "seed": args.seed,
+            },
+            "env": {name: os.environ[name] for name in RECORDED_ENV if name in os.environ},
+        },
+        "results": results,
+    }
+    path = args.output or os.path.join(RESULTS_DIR, f"load-{started:%Y%m%dT%H%M%S}-{commit or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nresults written to {path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+    return 1 if any(result["errors"] for result in results) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""
+Peak memory and serialization time: buffered JSON vs NDJSON-streamed validate-book bodies.
+
+Both start from an already structured snapshot (a snapshot cache hit): the endpoint fetches and
+structures the whole snapshot before either body is written, so the database and structuring
+time in front of the first byte is the same for both and is not measured here. "first record"
+is the time from there to the first serialized line.
+
+The buffered body goes through FastAPI's jsonable_encoder and JSONResponse, as the endpoint
+does; the stream is consumed record by record, as StreamingResponse sends it.
+
+    python -m benchmarks.bench_ndjson_stream [entities ...]
+"""
+import asyncio
+import sys
+import time
+import tracemalloc
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from app.api.v1 import validate_book_ndjson, validation_sections
+from app.models.payloads import HedgeInceptionInstruction
+from app.services.hedge_data import ALL_STAGES, complete_structured_response
+from benchmarks.synthetic import generate_dataset, structured_response_args
+
+PAYLOAD = HedgeInceptionInstruction(
+    instruction_type="I", order_id="ORD_001", sub_order_id="SUB_001", exposure_currency="HKD",
+    hedge_amount_order=5000000.0, hedge_method="COH",
+)
+PAYLOAD_ECHO = PAYLOAD.dict()
+
+def _buffered(data):
+    start = time.perf_counter()
+    body = JSONResponse(jsonable_encoder({
+        "status": "success",
+        "complete_data": data,
+        "payload": PAYLOAD_ECHO,
+        **validation_sections(data, PAYLOAD, ALL_STAGES, None),
+        "message": "Complete hedge data retrieval succeeded across all stages.",
+    })).body
+    elapsed = (time.perf_counter() - start) * 1000
+    return elapsed, elapsed, len(body)
+
+def _streamed(data):
+    async def consume():
+        start = time.perf_counter()
+        first, size = None, 0
+        async for line in validate_book_ndjson(data, data, PAYLOAD, PAYLOAD_ECHO, ALL_STAGES, None):
+            if first is None:
+                first = (time.perf_counter() - start) * 1000
+            size += len(line)
+        return first, (time.perf_counter() - start) * 1000, size
+    return asyncio.run(consume())
+
+def _measure(fn, data):
+    tracemalloc.start()
+    try:
+        first_ms, total_ms, size = fn(data)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    # Timings without tracemalloc overhead
+    first_ms, total_ms, _ = fn(data)
+    return first_ms, total_ms, size, peak / 1024 / 1024
+
+def run(entity_counts=(100, 1000, 3000)):
+    print(f"{'entities':>8} {'mode':>8} {'first record ms':>15} {'total ms':>9} {'body KB':>9} {'peak MB':>8}")
+    for n in entity_counts:
+        data = complete_structured_response(*structured_response_args(generate_dataset(n, navs_per_entity=3)))
+        for mode, fn in (("buffered", _buffered), ("ndjson", _streamed)):
+            first_ms, total_ms, size, peak = _measure(fn, data)
+            print(f"{n:>8} {mode:>8} {first_ms:>15.2f} {total_ms:>9.2f} {size / 1024:>9.1f} {peak:>8.1f}")
+
+if __name__ == "__main__":
+    run([int(a) for a in sys.argv[1:]] or (100, 1000, 3000))
@@ -0,0 +1,66 @@
+"""
+Serialization time for a validate-book response, by serializer.
+
+    jsonable_encoder - FastAPI's default for a returned dict (encoder walk + json.dumps)
+    response_model   - validate into ComprehensiveHedgeInceptionResponse, then dump it (full only:
+                       the model describes the full response)
+    pydantic-core    - PydanticJSONResponse (the default backend)
+    orjson           - ORJSONResponse (JSON_RESPONSE_BACKEND=orjson)
+
+    python -m benchmarks.bench_serialization [entities ...]
+"""
+import gc
+import statistics
+import sys
+import time
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from app.api.responses import PydanticJSONResponse, orjson
+from app.api.v1 import validation_sections
+from app.models.payloads import ComprehensiveHedgeInceptionResponse, HedgeInceptionInstruction
+from app.services.hedge_data import ALL_STAGES, complete_structured_response
+from app.services.response_format import compact_structured_response
+from benchmarks.synthetic import generate_dataset, structured_response_args
+
+PAYLOAD = HedgeInceptionInstruction(
+    instruction_type="I", order_id="ORD_001", sub_order_id="SUB_001", exposure_currency="HKD",
+    hedge_amount_order=5000000.0, hedge_method="COH",
+)
+PAYLOAD_ECHO = PAYLOAD.dict()
+
+def _time(fn, repeat: int = 5):
+    samples, result = [], None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(samples)
+
+def _typed(body):
+    return ComprehensiveHedgeInceptionResponse.model_validate(body).model_dump_json(exclude_unset=True).encode()
+
+SERIALIZERS = {
+    "jsonable_encoder": lambda body: JSONResponse(jsonable_encoder(body)).body,
+    "response_model": _typed,
+    "pydantic-core": lambda body: PydanticJSONResponse(body).body,
+}
+if orjson is not None:
+    SERIALIZERS["orjson"] = lambda body: ORJSONResponse(body).body
+
+def run(entity_counts=(334,)):
+    print(f"{'positions':>9} {'format':>7} {'serializer':>16} {'KB':>8} {'ms':>8}")
+    for n in entity_counts:
+        data = complete_structured_response(*structured_response_args(generate_dataset(n, navs_per_entity=3)))
+        positions = sum(len(g["positions"]) for g in data["entity_groups"])
+        sections = validation_sections(data, PAYLOAD, ALL_STAGES, None)
+        for response_format, complete_data in (("full", data), ("compact", compact_structured_response(data))):
+            body = {"status": "success", "complete_data": complete_data, "payload": PAYLOAD_ECHO, **sections, "message": "ok"}
+            for name, serialize in SERIALIZERS.items():
+                if name == "response_model" and response_format != "full":
+                    continue
+                rendered, ms = _time(lambda: serialize(body))
+                print(f"{positions:>9} {response_format:>7} {name:>16} {len(rendered) / 1024:>8.1f} {ms:>8.2f}")
+
+if __name__ == "__main__":
+    run([int(a) for a in sys.argv[1:]] or (334,))
@@ -0,0 +1,164 @@
+"""
+Checks the Dify client (app.agents.dify_client) against the in-process stand-in
+(benchmarks.fake_dify): streamed workflow and chat events, run_workflow results and errors,
+the per-app concurrency limit, DifyBusyError past the pending limit, and slot release when a
+consumer stops reading early. Then the result cache (app.agents.dify_cache): a result written
+to the SQLite DiskCache is read back after the store is reopened and memory is cleared, and
+the agent-review endpoint (against benchmarks.fake_postgrest) calls Dify once for a repeated order.
+
+    python -m benchmarks.check_dify_client
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from contextlib import aclosing
+import httpx
+import app.agents.dify_cache as dify_cache
+import app.agents.dify_client as dify_client
+from app.agents.dify_client import DifyBusyError, DifyError, run_workflow, stream_chat, stream_workflow
+from app.db import supabase_async
+from app.services.cache import DiskCache
+from app.services.hedge_data import invalidate_snapshots
+from benchmarks.fake_dify import FakeDify
+from benchmarks.fake_postgrest import FakePostgREST
+from benchmarks.synthetic import generate_dataset
+
+API_KEY = "app-check"
+CONCURRENCY = 2
+PENDING = 2
+
+async def _raises(coro, error=DifyError):
+    try:
+        await coro
+    except error as e:
+        return e
+    return None
+
+async def _checks(dify: FakeDify) -> list:
+    failures = []
+
+    def check(name: str, ok: bool, detail=""):
+        print(f"  {'ok' if ok else 'FAIL'} {name}" + (f": {detail}" if detail and not ok else ""))
+        if not ok:
+            failures.append(name)
+
+    events = [event["event"] async for event in stream_workflow({"order_id": "ORD_001"}, "check")]
+    expected = ["workflow_started", "node_started"] + ["text_chunk"] * dify.chunks + ["node_finished", "workflow_finished"]
+    check("stream_workflow events in order, pings skipped", events == expected, events)
+
+    answers = [event async for event in stream_chat("hello", "check")]
+    check("stream_chat events", [e["event"] for e in answers][-1] == "message_end" and len(answers) == dify.chunks + 1, answers)
+
+    result = await run_workflow({"order_id": "ORD_002"}, "check")
+    check("run_workflow returns workflow_finished data", result.get("outputs") == {"inputs": {"order_id": "ORD_002"}}, result)
+
+    error = await _raises(run_workflow({"error": "node failed"}, "check"))
+    check("error event raises DifyError", error is not None and str(error) == "node failed" and error.code == "workflow_error", error)
+
+    error = await _raises(run_workflow({"status": "failed"}, "check"))
+    check("failed run raises DifyError", error is not None and error.code == "failed", error)
+
+    dify_client.DIFY_APP_KEYS["wrong_key"] = "app-unknown"
+    error = await _raises(run_workflow({}, "check", app="wrong_key"))
+    check("HTTP error raises DifyError", error is not None and error.status_code == 401, error)
+
+    error = await _raises(run_workflow({}, "check", app="unconfigured"))
+    check("app without a key raises DifyError", error is not None and error.status_code is None, error)
+
+    # CONCURRENCY runs take the slots, PENDING wait for them, the rest are refused
+    dify.reset_stats()
+    results = await asyncio.gather(
+        *(run_workflow({"run": i}, "check") for i in range(CONCURRENCY + PENDING + 2)), return_exceptions=True
+    )
+    busy = [r for r in results if isinstance(r, DifyBusyError)]
+    done = [r for r in results if isinstance(r, dict)]
+    check(
+        "DifyBusyError past the pending limit",
+        len(busy) == 2 and len(done) == CONCURRENCY + PENDING and busy[0].status_code == 503,
+        [type(r).__name__ for r in results],
+    )
+    check("at most DIFY_MAX_CONCURRENCY_PER_APP runs in flight", dify.max_in_flight[API_KEY] == CONCURRENCY, dict(dify.max_in_flight))
+
+    async with aclosing(stream_workflow({}, "check")) as stream:
+        async for _ in stream:
+            break
+    stats = dify_client.dify_stats()["apps"]["default"]
+    check("slot released when a consumer stops early", stats["in_flight"] == 0 and stats["waiting"] == 0, stats)
+
+    with tempfile.TemporaryDirectory() as directory:
+        dify_cache.DIFY_RESULT_CACHE_PATH = os.path.join(directory, "dify.sqlite")
+        try:
+            await _cache_checks(dify, check)
+        finally:
+            dify_cache.close_disk_cache()
+            dify_cache.DIFY_RESULT_CACHE_PATH = ""
+            dify_cache.result_cache.invalidate()
+    return failures
+
+async def _cache_checks(dify: FakeDify, check):
+    inputs = {"order_id": "ORD_CACHE"}
+    key = dify_cache.result_key("default", dify_cache.inputs_hash(inputs))
+    dify.reset_stats()
+    first = await dify_cache.run_workflow_cached(inputs, "check")
+    # A restarted worker: new store connection, empty memory cache
+    dify_cache.close_disk_cache()
+    dify_cache.result_cache.invalidate()
+    reopened = DiskCache(dify_cache.DIFY_RESULT_CACHE_PATH)
+    try:
+        stored = reopened.get(key)
+    finally:
+        reopened.close()
+    check("DiskCache reopened holds the result", stored == first, stored)
+    second = await dify_cache.run_workflow_cached(inputs, "check")
+    check("result read back from disk without calling Dify", second == first and dify.requests[API_KEY] == 1, dict(dify.requests))
+
+    from app.main import app
+    body = {
+        "exposure_currency": "HKD", "hedge_method": "COH", "order_id": "ORD_REVIEW", "sub_order_id": "SUB_001",
+        "hedge_amount_order": 5000000.0, "instruction_type": "I",
+    }
+    await supabase_async.init_async_client(httpx.ASGITransport(app=FakePostgREST(generate_dataset(10))))
+    invalidate_snapshots()
+    dify.reset_stats()
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://check") as client:
+            responses = [await client.post("/api/v1/hedge/inception/agent-review", json=body) for _ in range(2)]
+    finally:
+        await supabase_async.close_async_client()
+    reviews = [r.json().get("review") if r.status_code == 200 else r.status_code for r in responses]
+    check(
+        "agent-review calls Dify once for a repeated order",
+        reviews[0] == reviews[1] and isinstance(reviews[0], dict) and dify.requests[API_KEY] == 1,
+        (reviews, dict(dify.requests)),
+    )
+
+async def run_checks() -> bool:
+    dify = FakeDify({API_KEY}, chunk_delay_ms=20)
+    await dify_client.init_dify_client(httpx.ASGITransport(app=dify))
+    try:
+        failures = await _checks(dify)
+    finally:
+        await dify_client.close_dify_client()
+    print("all checks passed" if not failures else f"{len(failures)} checks failed")
+    return not failures
+
+def run() -> bool:
+    settings = (
+        dify_client.DIFY_API_KEY, dict(dify_client.DIFY_APP_KEYS),
+        dify_client.DIFY_MAX_CONCURRENCY_PER_APP, dify_client.DIFY_MAX_PENDING_PER_APP,
+    )
+    dify_client.DIFY_API_KEY = API_KEY
+    dify_client.DIFY_APP_KEYS.clear()
+    dify_client.DIFY_MAX_CONCURRENCY_PER_APP = CONCURRENCY
+    dify_client.DIFY_MAX_PENDING_PER_APP = PENDING
+    try:
+        return asyncio.run(run_checks())
+    finally:
+        (dify_client.DIFY_API_KEY, app_keys,
+         dify_client.DIFY_MAX_CONCURRENCY_PER_APP, dify_client.DIFY_MAX_PENDING_PER_APP) = settings
+        dify_client.DIFY_APP_KEYS.clear()
+        dify_client.DIFY_APP_KEYS.update(app_keys)
+
+if __name__ == "__main__":
+    sys.exit(0 if run() else 1)
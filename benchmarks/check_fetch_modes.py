@@ -0,0 +1,95 @@
+"""
+Checks that every HEDGE_FETCH_MODE (app.services.consolidated_fetch) structures the same hedge
+data from the same rows. Each case runs the snapshot plan once per mode against the in-process
+PostgREST stand-in (benchmarks.fake_postgrest) and compares the structured output; a mode that
+fell back to standard counts as a failure.
+
+Cases cover no filters, a nav_type filter, and a currency_type request that matches the
+exposure currency's currency_configuration as well as one that does not.
+
+    python -m benchmarks.check_fetch_modes [entities]
+"""
+import asyncio
+import json
+import sys
+import httpx
+import app.services.consolidated_fetch as consolidated_fetch
+from app.db import supabase_async
+from app.services.hedge_data import fetch_complete_hedge_data
+from app.services.reference_data import invalidate_reference_data
+from benchmarks.fake_postgrest import FakePostgREST
+from benchmarks.synthetic import generate_dataset
+
+CURRENCY = "HKD"
+# (name, configured currency_type of the exposure currency, request filters)
+CASES = (
+    ("unfiltered", "Matched", {}),
+    ("nav_type", "Matched", {"nav_type": "COI"}),
+    ("currency_type match", "Matched", {"currency_type": "Matched"}),
+    ("currency_type mismatch", "Mismatched", {"currency_type": "Matched"}),
+)
+
+def _dataset(entities: int, currency_type: str) -> dict:
+    data = generate_dataset(entities, currency=CURRENCY)
+    for row in data["currency_configuration"]:
+        if row["currency_code"] == CURRENCY:
+            row["currency_type"] = currency_type
+    return data
+
+async def _fetch(mode: str, filters: dict) -> dict:
+    consolidated_fetch.HEDGE_FETCH_MODE = mode
+    consolidated_fetch._failed_modes.clear()
+    consolidated_fetch._plans.clear()
+    data = await fetch_complete_hedge_data(CURRENCY, "COH", 5000000.0, "ORD_001", **filters)
+    if consolidated_fetch.fetch_mode() != mode:
+        raise RuntimeError(f"{mode} fell back to standard")
+    return data
+
+def _summary(data: dict) -> str:
+    groups = data.get("entity_groups") or []
+    allocations = sum(len(position.get("allocation_data") or []) for group in groups for position in group.get("positions") or [])
+    return f"{len(groups)} groups, {allocations} allocations"
+
+async def run_case(entities: int, configured: str, filters: dict) -> list:
+    """Failures of one case, empty when every mode matched standard"""
+    postgrest = FakePostgREST(_dataset(entities, configured))
+    await supabase_async.init_async_client(httpx.ASGITransport(app=postgrest))
+    invalidate_reference_data()
+    failures = []
+    try:
+        outputs = {}
+        for mode in consolidated_fetch.HEDGE_FETCH_MODES:
+            try:
+                outputs[mode] = await _fetch(mode, filters)
+            except RuntimeError as e:
+                failures.append(str(e))
+        standard = outputs.get("standard")
+        for mode, data in outputs.items():
+            if "error" in data:
+                failures.append(f"{mode}: {data['error']}")
+            elif json.dumps(data, sort_keys=True, default=str) != json.dumps(standard, sort_keys=True, default=str):
+                failures.append(f"{mode}: {_summary(data)}, standard {_summary(standard)}")
+        print(f"  {_summary(standard)}")
+    finally:
+        await supabase_async.close_async_client()
+    return failures
+
+def run(entities: int = 20) -> bool:
+    mode = consolidated_fetch.HEDGE_FETCH_MODE
+    ok = True
+    try:
+        for name, configured, filters in CASES:
+            print(f"{name}:")
+            failures = asyncio.run(run_case(entities, configured, filters))
+            for failure in failures:
+                print(f"  MISMATCH {failure}")
+            ok = ok and not failures
+    finally:
+        consolidated_fetch.HEDGE_FETCH_MODE = mode
+        consolidated_fetch._failed_modes.clear()
+        consolidated_fetch._plans.clear()
+    print("all modes match" if ok else "modes differ")
+    return ok
+
+if __name__ == "__main__":
+    sys.exit(0 if run(*[int(a) for a in sys.argv[1:2]]) else 1)
@@ -0,0 +1,102 @@
+"""
+Checks that response_format=compact carries the same entity group data as the full
+validate-book response for the same stages and fields: every compact position's refs are
+resolved through complete_data.lookups and compared with the full response's embedded rows.
+Requests go through the ASGI app against the in-process PostgREST stand-in
+(benchmarks.fake_postgrest).
+
+    python -m benchmarks.check_response_format [entities]
+"""
+import asyncio
+import json
+import sys
+import httpx
+from app.db import supabase_async
+from app.services.hedge_data import invalidate_snapshots
+from app.services.idempotency import invalidate_idempotent_responses
+from app.services.reference_data import invalidate_reference_data
+from benchmarks.fake_postgrest import FakePostgREST
+from benchmarks.synthetic import generate_dataset
+
+URL = "/api/v1/hedge/inception/validate-book"
+BODY = {
+    "exposure_currency": "HKD", "hedge_method": "COH", "order_id": "ORD_001", "sub_order_id": "SUB_001",
+    "hedge_amount_order": 5000000.0, "instruction_type": "I",
+}
+# Query parameters besides response_format
+CASES = (
+    {},
+    {"stages": "1a"},
+    {"fields": "entity_groups"},
+    {"fields": "entity_groups.positions.allocation_data"},
+    {"fields": "entity_groups.positions.car_data"},
+    {"fields": "entity_groups.positions.hedge_relationships,entity_groups.positions.framework_rule"},
+    {"fields": "entity_groups.positions.buffer_rule,stage_1b_data.current_allocations"},
+    {"stages": "1b", "fields": "entity_groups.positions.allocation_data"},
+)
+EMPTY = {"allocations": [], "hedge_relationships": [], "framework_rule": {}, "buffer_rule": {}, "car_data": {}}
+EMBEDDED = {
+    "allocations": "allocation_data", "hedge_relationships": "hedge_relationships",
+    "framework_rule": "framework_rule", "buffer_rule": "buffer_rule", "car_data": "car_data",
+}
+
+def _at_path(data, path: str):
+    for part in path.split("."):
+        data = data.get(part) if isinstance(data, dict) else None
+    return data
+
+def expand(complete_data: dict) -> list:
+    """entity_groups of a compact complete_data with refs replaced by the rows they point to"""
+    lookups = complete_data.get("lookups", {})
+    groups = []
+    for group in complete_data.get("entity_groups", []):
+        positions = []
+        for position in group.get("positions", []):
+            position = dict(position)
+            for kind, ref in position.pop("refs", {}).items():
+                rows = _at_path(complete_data, lookups.get(kind, ""))
+                if ref is None:
+                    value = EMPTY[kind]
+                elif rows is None:
+                    value = None  # the list the ref points to is missing
+                elif kind == "allocations":
+                    value = [rows[i] for i in ref]
+                else:
+                    value = rows[ref]
+                position[EMBEDDED[kind]] = value
+            positions.append(position)
+        groups.append({**group, "positions": positions})
+    return groups
+
+async def run_checks(entities: int) -> list:
+    from app.main import app
+    postgrest = FakePostgREST(generate_dataset(entities, navs_per_entity=3))
+    await supabase_async.init_async_client(httpx.ASGITransport(app=postgrest))
+    invalidate_snapshots()
+    invalidate_idempotent_responses()
+    invalidate_reference_data()
+    failures = []
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://check") as client:
+            for params in CASES:
+                full = (await client.post(URL, params=params, json=BODY)).json()
+                compact = (await client.post(URL, params={**params, "response_format": "compact"}, json=BODY)).json()
+                name = "&".join(f"{k}={v}" for k, v in params.items()) or "(all)"
+                expected = full["complete_data"].get("entity_groups")
+                got = expand(compact["complete_data"]) if expected is not None else None
+                same = json.dumps(got, sort_keys=True) == json.dumps(expected, sort_keys=True)
+                embedded = sum(bool(p.get(field)) for g in expected or [] for p in g.get("positions", []) for field in EMBEDDED.values())
+                print(f"  {'ok' if same else 'MISMATCH'} {name} ({embedded} embedded fields)")
+                if not same:
+                    failures.append(name)
+    finally:
+        await supabase_async.close_async_client()
+    return failures
+
+def run(entities: int = 20) -> bool:
+    failures = asyncio.run(run_checks(entities))
+    print("compact matches full" if not failures else f"{len(failures)} cases differ")
+    return not failures
+
+if __name__ == "__main__":
+    sys.exit(0 if run(*[int(a) for a in sys.argv[1:2]]) else 1)
@@ -0,0 +1,109 @@
+"""
+In-process stand-in for the Dify API's streaming endpoints, so the Dify client
+(app.agents.dify_client) can be exercised without a Dify deployment. It is an ASGI app handed
+to the client through httpx.ASGITransport:
+
+    dify = FakeDify({"app-test"}, chunk_delay_ms=20)
+    await init_dify_client(httpx.ASGITransport(app=dify))
+
+POST .../workflows/run streams ping, workflow_started, node_started, one text_chunk per
+chunk, node_finished and workflow_finished events whose outputs echo the inputs;
+POST .../chat-messages streams message events and message_end. Inputs steer a run:
+"error" ends the stream with an error event carrying that message, "status" sets
+workflow_finished's status (e.g. "failed"). An unknown API key is answered 401 with
+Dify's JSON error body. Runs in flight are counted per key.
+"""
+import asyncio
+import json
+from collections import Counter
+
+class FakeDify:
+    """ASGI app answering workflow runs and chat messages with server-sent events"""
+
+    def __init__(self, api_keys, chunks: int = 3, chunk_delay_ms: float = 0.0):
+        self.api_keys = set(api_keys)
+        self.chunks = chunks
+        self.chunk_delay_ms = chunk_delay_ms
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.requests = Counter()
+        self.in_flight = Counter()
+        self.max_in_flight = Counter()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        headers = dict(scope["headers"])
+        key = headers.get(b"authorization", b"").decode().removeprefix("Bearer ")
+        path = scope["path"].rstrip("/")
+        if key not in self.api_keys:
+            return await self._json(send, 401, {"code": "unauthorized", "message": "Access token is invalid", "status": 401})
+        if path.endswith("/workflows/run"):
+            events = self._workflow_events
+        elif path.endswith("/chat-messages"):
+            events = self._chat_events
+        else:
+            return await self._json(send, 404, {"code": "not_found", "message": f"{path} not found", "status": 404})
+
+        self.requests[key] += 1
+        self.in_flight[key] += 1
+        self.max_in_flight[key] = max(self.max_in_flight[key], self.in_flight[key])
+        try:
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache")],
+            })
+            for event in events(json.loads(body or b"{}")):
+                await send({"type": "http.response.body", "body": event.encode(), "more_body": True})
+                if self.chunk_delay_ms:
+                    await asyncio.sleep(self.chunk_delay_ms / 1000)
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            self.in_flight[key] -= 1
+
+    async def _json(self, send, status: int, body: dict):
+        content = json.dumps(body).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(content)).encode())],
+        })
+        await send({"type": "http.response.body", "body": content})
+
+    # ===== EVENTS =====
+
+    def _workflow_events(self, body: dict):
+        inputs = body.get("inputs") or {}
+        run_id = f"run-{sum(self.requests.values())}"
+        yield "event: ping\n\n"
+        yield _event({"event": "workflow_started", "workflow_run_id": run_id, "data": {"id": run_id}})
+        yield _event({"event": "node_started", "workflow_run_id": run_id, "data": {"node_id": "llm"}})
+        for index in range(self.chunks):
+            yield _event({"event": "text_chunk", "workflow_run_id": run_id, "data": {"text": f"chunk {index} "}})
+        if inputs.get("error"):
+            yield _event({"event": "error", "status": 500, "code": "workflow_error", "message": inputs["error"]})
+            return
+        yield _event({"event": "node_finished", "workflow_run_id": run_id, "data": {"node_id": "llm", "status": "succeeded"}})
+        status = inputs.get("status", "succeeded")
+        yield ": keep-alive\n"
+        yield _event({"event": "workflow_finished", "workflow_run_id": run_id, "data": {
+            "id": run_id, "status": status, "outputs": {"inputs": inputs},
+            "error": None if status == "succeeded" else f"run {status}",
+        }})
+
+    def _chat_events(self, body: dict):
+        message_id = f"msg-{sum(self.requests.values())}"
+        for index in range(self.chunks):
+            yield _event({"event": "message", "message_id": message_id, "answer": f"{body.get('query', '')} {index}"})
+        yield _event({"event": "message_end", "message_id": message_id, "conversation_id": body.get("conversation_id") or "conv-1"})
+
+def _event(payload: dict) -> str:
+    return f"data: {json.dumps(payload)}\n\n"
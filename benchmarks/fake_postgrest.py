@@ -0,0 +1,347 @@
+"""
+In-process stand-in for the Supabase PostgREST API, serving a synthetic dataset
+(benchmarks.synthetic) so the service can be benchmarked and load-tested without a database.
+It is an ASGI app handed to the service's pooled client through httpx.ASGITransport:
+
+    postgrest = FakePostgREST(generate_dataset(1000), latency_ms=5)
+    await init_async_client(httpx.ASGITransport(app=postgrest))
+
+It answers what the service sends: column filters (eq, neq, gt, gte, lt, lte, in, is, not.),
+or/and groups, order with nulls placement, limit/offset, embedded resources joined on entity_id
+or currency_code (with !inner and per-resource filters, order and limit), sum/count/avg/min/max
+aggregates, and the usd_pb_deposit_total and hedge_snapshot functions. Every request waits
+latency_ms plus up to jitter_ms (table_latency_ms overrides the base per table or function)
+before it is answered, without blocking the event loop.
+"""
+import asyncio
+import json
+import random
+import time
+from collections import Counter, defaultdict
+from urllib.parse import parse_qsl
+from pydantic_core import to_json
+
+RESERVED_PARAMS = ("select", "order", "limit", "offset", "or", "and", "on_conflict", "columns")
+# Parent -> child join columns for embedded resources, first one present on both sides wins
+JOIN_KEYS = ("entity_id", "currency_code")
+
+def _split(text: str, sep: str = ",") -> list:
+    """Split on sep outside parentheses and double quotes"""
+    if "(" not in text and '"' not in text:
+        return [part.strip() for part in text.split(sep)] if text else []
+    parts, depth, quoted, current = [], 0, False, []
+    for ch in text:
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        if ch == sep and depth == 0 and not quoted:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(ch)
+    if current or parts:
+        parts.append("".join(current))
+    return [part.strip() for part in parts]
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+    return value
+
+def _text(value) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def _compare(value, raw: str):
+    """value <=> raw as -1/0/1, numerically for numeric columns, else as text"""
+    if isinstance(value, bool):
+        # PostgreSQL reads booleans case-insensitively ("True" from Python filters included)
+        raw = raw.lower()
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        try:
+            other = float(raw)
+        except ValueError:
+            other = None
+        if other is not None:
+            return (value > other) - (value < other)
+    text = _text(value)
+    return (text > raw) - (text < raw)
+
+def _test(value, op: str, raw) -> bool:
+    if op == "is":
+        expected = {"null": None, "true": True, "false": False}.get(raw.lower(), raw)
+        return value is expected if expected is None else value == expected
+    if value is None:
+        return False
+    if op == "in":
+        return _text(value) in raw
+    if op in ("eq", "neq"):
+        return (_compare(value, raw) == 0) == (op == "eq")
+    order = _compare(value, raw)
+    return {"gt": order > 0, "gte": order >= 0, "lt": order < 0, "lte": order <= 0}[op]
+
+def parse_condition(text: str):
+    """
+    "col.op.value", "col.not.op.value", "and(...)" or "or(...)" as a predicate tree:
+    ("and"|"or", [conditions], negated) or (column, op, value, negated). Values are unquoted
+    here, once per query; an in list becomes a frozenset of its items.
+    """
+    negated = text.startswith("not.")
+    if negated:
+        text = text[4:]
+    for group in ("and", "or"):
+        if text.startswith(group + "("):
+            return (group, [parse_condition(item) for item in _split(text[len(group) + 1:-1])], negated)
+    column, op, value = text.split(".", 2) if text.count(".") >= 2 else (*text.split(".", 1), "")
+    if op == "not":
+        op, _, value = value.partition(".")
+        negated = not negated
+    if op == "in":
+        return (column, op, frozenset(_unquote(item) for item in _split(value.strip("()"))), negated)
+    return (column, op, value if op == "is" else _unquote(value), negated)
+
+def matches(row: dict, condition) -> bool:
+    if condition[0] in ("and", "or") and len(condition) == 3:
+        group, items, negated = condition
+        result = (all if group == "and" else any)(matches(row, item) for item in items)
+    else:
+        column, op, value, negated = condition
+        result = _test(row.get(column), op, value)
+    return result != negated
+
+def parse_order(text: str) -> list:
+    """"col.desc.nullslast,col2" as [(column, descending, nulls_last)] with PostgreSQL defaults"""
+    terms = []
+    for term in _split(text):
+        column, *modifiers = term.split(".")
+        desc = "desc" in modifiers
+        nulls_last = "nullslast" in modifiers or ("nullsfirst" not in modifiers and not desc)
+        terms.append((column, desc, nulls_last))
+    return terms
+
+def sort_rows(rows: list, terms) -> list:
+    rows = list(rows)
+    for column, desc, nulls_last in reversed(terms):
+        # Rank nulls so they land on the requested side once reverse= is applied
+        null_rank = (1 if nulls_last else -1) * (-1 if desc else 1)
+        rows.sort(key=lambda row: (0, row[column]) if row.get(column) is not None else (null_rank, 0), reverse=desc)
+    return rows
+
+class Select:
+    """A parsed select: plain columns, aggregates and embedded resources"""
+
+    def __init__(self, text: str):
+        self.columns, self.aggregates, self.embeds = [], [], {}
+        for item in _split(text or "*"):
+            if not item:
+                continue
+            alias, _, item = item.rpartition(":") if ":" in item.split("(")[0] else ("", "", item)
+            if "(" in item and not item.endswith("()"):
+                name, _, inner = item.partition("(")
+                name, _, hint = name.partition("!")
+                self.embeds[name] = (alias or name, hint == "inner", Select(inner[:-1]))
+            elif item.endswith("()"):
+                column, _, function = item[:-2].rpartition(".")
+                self.aggregates.append((alias or function, function, column or None))
+            else:
+                self.columns.append((alias or item, item))
+
+    def project(self, row: dict) -> dict:
+        if not self.columns or any(column == "*" for _, column in self.columns):
+            return dict(row)
+        return {alias: row.get(column) for alias, column in self.columns}
+
+def aggregate(rows: list, aggregates) -> list:
+    result = {}
+    for alias, function, column in aggregates:
+        values = [row.get(column) for row in rows if row.get(column) is not None] if column else rows
+        if function == "count":
+            result[alias] = len(values)
+        elif function == "sum":
+            result[alias] = sum(values) if values else None
+        elif function == "avg":
+            result[alias] = sum(values) / len(values) if values else None
+        else:
+            result[alias] = (min if function == "min" else max)(values) if values else None
+    return [result]
+
+class FakePostgREST:
+    """ASGI app answering /rest/v1/<table> and /rest/v1/rpc/<function> from in-memory rows"""
+
+    def __init__(self, data: dict, latency_ms: float = 0.0, jitter_ms: float = 0.0, table_latency_ms: dict = None, seed: int = 0):
+        self.data = data
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.table_latency_ms = dict(table_latency_ms or {})
+        self._random = random.Random(seed)
+        self._indexes = {}
+        self.functions = {"usd_pb_deposit_total": self._usd_pb_deposit_total, "hedge_snapshot": self._hedge_snapshot}
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.queries = Counter()
+        self.rows = Counter()
+        self.bytes = Counter()
+        self.cpu_seconds = 0.0
+
+    def stats(self) -> dict:
+        """Totals since reset_stats; cpu_ms is time spent answering, which shares the caller's event loop"""
+        return {
+            "queries": sum(self.queries.values()),
+            "rows": sum(self.rows.values()),
+            "bytes": sum(self.bytes.values()),
+            "cpu_ms": round(self.cpu_seconds * 1000, 3),
+            "tables": {name: {"queries": count, "rows": self.rows[name], "bytes": self.bytes[name]} for name, count in sorted(self.queries.items())},
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        name = scope["path"].split("/rest/v1/", 1)[-1].strip("/")
+        params = parse_qsl(scope.get("query_string", b"").decode(), keep_blank_values=True)
+        rows, start = [], time.perf_counter()
+        try:
+            if name.startswith("rpc/"):
+                name = name[4:]
+                rows = self.call(name, json.loads(body) if body else {}, params)
+            else:
+                rows = self.query(name, params)
+            status, content = 200, to_json(rows, fallback=str)
+        except KeyError as e:
+            status, content = 404, to_json({"code": "42P01", "message": f"relation {e.args[0]} does not exist", "details": None, "hint": None})
+        except ValueError as e:
+            status, content = 400, to_json({"code": "PGRST100", "message": str(e), "details": None, "hint": None})
+        self.cpu_seconds += time.perf_counter() - start
+
+        latency = self.table_latency_ms.get(name, self.latency_ms) + self._random.uniform(0, self.jitter_ms)
+        if latency > 0:
+            await asyncio.sleep(latency / 1000)
+        self.queries[name] += 1
+        self.rows[name] += len(rows) if status == 200 else 0
+        self.bytes[name] += len(content)
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json; charset=utf-8"), (b"content-length", str(len(content)).encode())],
+        })
+        await send({"type": "http.response.body", "body": content})
+
+    # ===== QUERIES =====
+
+    def _index(self, table: str, column: str) -> dict:
+        """Rows of table by the text of column, built on first use"""
+        key = (table, column)
+        if key not in self._indexes:
+            index = defaultdict(list)
+            for row in self.data[table]:
+                if row.get(column) is not None:
+                    index[_text(row[column])].append(row)
+            self._indexes[key] = index
+        return self._indexes[key]
+
+    def _candidates(self, table: str, conditions: list) -> list:
+        # An equality or in filter narrows the scan through the column's index; the filters are
+        # still applied to the candidates, so the lowercase retry (booleans) cannot over-match
+        for column, op, value, negated in (c for c in conditions if len(c) == 4):
+            if negated or op not in ("eq", "in"):
+                continue
+            index = self._index(table, column)
+            keys = [value] if op == "eq" else value
+            return [row for key in keys for row in index.get(key) or index.get(key.lower(), [])]
+        return self.data[table]
+
+    def query(self, table: str, params) -> list:
+        if table not in self.data:
+            raise KeyError(table)
+        # Params by embedded resource path ("" for the table itself): "allocation_engine.order",
+        # "currency_configuration.currency_type=eq.Matched"
+        scoped = defaultdict(list)
+        for key, value in params:
+            resource, _, param = key.rpartition(".")
+            scoped[resource].append((param, value))
+        return self._select(table, scoped, "", Select(dict(scoped[""]).get("select", "*")))
+
+    def _select(self, table: str, scoped: dict, path: str, select: Select, parent_rows=None) -> list:
+        """Rows of table (or of parent_rows, an embedded resource's joined rows) for the params at path"""
+        conditions, order, limit, offset = [], None, None, 0
+        for param, value in scoped[path]:
+            if param == "select":
+                continue
+            if param == "order":
+                order = parse_order(value)
+            elif param == "limit":
+                limit = int(value)
+            elif param == "offset":
+                offset = int(value)
+            elif param in ("or", "and"):
+                conditions.append(parse_condition(f"{param}{value}"))
+            elif param not in RESERVED_PARAMS:
+                conditions.append(parse_condition(f"{param}.{value}"))
+
+        rows = self._candidates(table, conditions) if parent_rows is None else parent_rows
+        rows = [row for row in rows if all(matches(row, condition) for condition in conditions)]
+        if select.aggregates:
+            return aggregate(rows, select.aggregates)
+        if order:
+            rows = sort_rows(rows, order)
+        # Inner embeds drop rows before the limit applies
+        rows = self._embed(table, rows, select, scoped, path)
+        return rows[offset:offset + limit] if limit is not None else rows[offset:]
+
+    def _embed(self, table: str, rows: list, select: Select, scoped: dict, path: str) -> list:
+        result = [select.project(row) for row in rows]
+        for name, (alias, inner, child_select) in select.embeds.items():
+            if name not in self.data:
+                raise ValueError(f"Could not find a relationship between {table} and {name}")
+            children = self.data[name]
+            join = next((key for key in JOIN_KEYS if children and key in children[0] and (not rows or key in rows[0])), None)
+            if join is None:
+                raise ValueError(f"Could not find a relationship between {table} and {name}")
+            child_path = f"{path}.{name}" if path else name
+            index = self._index(name, join)
+            kept = []
+            for row, out in zip(rows, result):
+                # Filters, order and limit of the resource apply per parent row
+                out[alias] = self._select(name, scoped, child_path, child_select, index.get(_text(row.get(join)), []))
+                if not inner or out[alias]:
+                    kept.append(out)
+            result = kept
+        return result
+
+    # ===== FUNCTIONS =====
+
+    def call(self, function: str, args: dict, params) -> list:
+        if function not in self.functions:
+            raise KeyError(function)
+        return self.functions[function](args)
+
+    def _usd_pb_deposit_total(self, args: dict) -> list:
+        return [{"total_usd_deposits": sum(row.get("total_usd_deposits") or 0 for row in self.data.get("usd_pb_deposit", []))}]
+
+    def _hedge_snapshot(self, args: dict) -> list:
+        ccy, nav_type, currency_type = args.get("p_exposure_currency"), args.get("p_nav_type"), args.get("p_currency_type")
+        entity_params = [("select", "*,currency_configuration!inner(currency_type)" if currency_type else "*,currency_configuration(currency_type)"), ("currency_code", f"eq.{ccy}")]
+        if currency_type:
+            entity_params.append(("currency_configuration.currency_type", f"eq.{currency_type}"))
+        by_currency = [("currency_code", f"eq.{ccy}")]
+        active = by_currency + [("active_flag", "eq.Y")]
+        return [{
+            "entity_master": self.query("entity_master", entity_params),
+            "position_nav_master": self.query("position_nav_master", by_currency + ([("nav_type", f"eq.{nav_type}")] if nav_type else [])),
+            "buffer_configuration": self.query("buffer_configuration", active),
+            "hedging_framework": self.query("hedging_framework", active),
+            "allocation_engine": self.query("allocation_engine", by_currency + [("order", "created_date.desc"), ("limit", "100")]),
+            "car_master": self.query("car_master", by_currency + [("order", "reporting_date.desc")]),
+        }]
@@ -0,0 +1,198 @@
+"""
+Deterministic synthetic rows for the Supabase tables the hedge service reads.
+
+generate_dataset(n_entities) returns {table_name: [rows]} for one exposure currency,
+shaped like the PostgREST responses hedge_data consumes.
+"""
+import random
+from datetime import date, timedelta
+
+NAV_TYPES = ("COI", "RE", "RE_Reserve")
+ENTITY_TYPES = ("Branch", "Subsidiary", "Associate")
+FRAMEWORK_TYPES = ("COH", "MT", "Hybrid")
+BASE_DATE = date(2026, 1, 1)
+
+def _day(offset: int) -> str:
+    return (BASE_DATE + timedelta(days=offset)).isoformat()
+
+def _timestamp(offset: int, seconds: int = 0) -> str:
+    return f"{_day(offset)}T{seconds // 3600 % 24:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+def generate_dataset(
+    n_entities: int,
+    currency: str = "HKD",
+    navs_per_entity: int = 2,
+    allocations_per_entity: int = 3,
+    events_per_entity: int = 4,
+    proxy_currency: str = "USD",
+    seed: int = 0
+) -> dict:
+    rnd = random.Random(seed)
+    navs_per_entity = max(1, min(navs_per_entity, len(NAV_TYPES)))
+    data = {table: [] for table in (
+        "entity_master", "position_nav_master", "buffer_configuration", "waterfall_logic_configuration",
+        "overlay_configuration", "hedging_framework", "system_configuration", "allocation_engine",
+        "hedge_instructions", "hedge_business_events", "car_master", "threshold_configuration",
+        "usd_pb_deposit", "risk_monitoring", "currency_configuration", "currency_rates",
+        "proxy_configuration", "instruction_event_config", "murex_book_config", "hedge_instruments",
+        "hedge_effectiveness",
+    )}
+
+    row_id = 0
+    def next_id() -> int:
+        nonlocal row_id
+        row_id += 1
+        return row_id
+
+    for n in range(n_entities):
+        eid = f"{currency}_ENT_{n:06d}"
+        data["entity_master"].append({
+            "entity_id": eid,
+            "entity_name": f"{currency} Entity {n}",
+            "entity_type": ENTITY_TYPES[n % len(ENTITY_TYPES)],
+            "currency_code": currency,
+            "car_exemption_flag": "Y" if n % 7 == 0 else "N",
+            "parent_child_nav_link": n % 5 == 0,
+            "currency_configuration": [{"currency_type": "Matched"}],
+        })
+        for nav_type in NAV_TYPES[:navs_per_entity]:
+            position = round(rnd.uniform(1e6, 5e8), 2)
+            data["position_nav_master"].append({
+                "id": next_id(),
+                "entity_id": eid,
+                "currency_code": currency,
+                "nav_type": nav_type,
+                "current_position": position,
+                "computed_total_nav": round(position * rnd.uniform(1.0, 1.2), 2),
+                "optimal_car_amount": round(position * 0.05, 2),
+                "buffer_percentage": 5.0,
+                "buffer_amount": round(position * 0.05, 2),
+                "manual_overlay": 0,
+                "allocation_status": "Allocated" if n % 3 else "Pending",
+            })
+        data["buffer_configuration"].append({
+            "id": next_id(), "entity_id": eid, "currency_code": currency,
+            "buffer_percentage": rnd.choice((2.5, 5.0, 7.5)), "active_flag": "Y",
+        })
+        data["hedging_framework"].append({
+            "id": next_id(), "entity_id": eid, "currency_code": currency,
+            "framework_type": FRAMEWORK_TYPES[n % len(FRAMEWORK_TYPES)],
+            "car_exemption_flag": "Y" if n % 7 == 0 else "N", "active_flag": "Y",
+        })
+        data["car_master"].append({
+            "id": next_id(), "entity_id": eid, "currency_code": currency,
+            "reporting_date": _day(n % 90), "car_amount": round(rnd.uniform(1e5, 1e7), 2),
+        })
+        for a in range(allocations_per_entity):
+            position = data["position_nav_master"][-1]["current_position"]
+            data["allocation_engine"].append({
+                "id": next_id(),
+                "allocation_id": f"ALLOC_{n:06d}_{a}",
+                "entity_id": eid,
+                "currency_code": currency,
+                "nav_type": NAV_TYPES[a % navs_per_entity],
+                "created_date": _timestamp(200 - a, n),
+                "hedge_amount_allocation": round(position * 0.1, 2),
+                "available_amount_for_hedging": round(position * rnd.uniform(0.0, 0.6), 2),
+                "hedged_position": round(position * rnd.choice((0.0, 0.2, 0.5, 1.1)), 2),
+                "car_amount_distribution": round(position * 0.05, 2),
+                "manual_overlay_amount": round(position * rnd.choice((0.0, 0.01)), 2),
+                "buffer_amount": round(position * 0.05, 2),
+                "waterfall_priority": 1 + n % 5,
+                "allocation_sequence": a + 1,
+                "allocation_status": "Allocated",
+            })
+        for e in range(events_per_entity):
+            data["hedge_business_events"].append({
+                "id": next_id(),
+                "event_id": f"EVT_{n:06d}_{e}",
+                "entity_id": eid,
+                "nav_type": NAV_TYPES[e % navs_per_entity],
+                "event_type": "Initiation",
+                "event_status": "Active",
+                "notional_amount": round(rnd.uniform(1e5, 5e7), 2),
+                "trade_date": _day(300 - e),
+                "created_date": _timestamp(300 - e, n),
+            })
+
+    for i in range(min(50, max(1, n_entities))):
+        data["hedge_instructions"].append({
+            "id": next_id(), "instruction_id": f"INS_{i:06d}", "exposure_currency": currency,
+            "instruction_type": "I", "instruction_date": _day(300 - i), "created_date": _timestamp(300 - i),
+            "hedge_amount_order": round(rnd.uniform(1e5, 1e7), 2), "instruction_status": "Booked",
+        })
+    for i in range(10):
+        data["hedge_effectiveness"].append({
+            "id": next_id(), "currency_code": currency, "measurement_date": _day(300 - i),
+            "effectiveness_ratio": round(rnd.uniform(0.8, 1.25), 4),
+        })
+    for i in range(5):
+        data["risk_monitoring"].append({
+            "id": next_id(), "currency_code": currency, "resolution_status": "Open",
+            "measurement_timestamp": _timestamp(300 - i), "risk_metric": "VaR", "metric_value": rnd.uniform(0, 1e6),
+        })
+    for waterfall_type in ("Opening", "Closing"):
+        for level in range(1, 6):
+            data["waterfall_logic_configuration"].append({
+                "id": next_id(), "waterfall_type": waterfall_type, "priority_level": level,
+                "entity_type": ENTITY_TYPES[level % len(ENTITY_TYPES)], "active_flag": "Y",
+            })
+    data["overlay_configuration"].append({"id": next_id(), "currency_code": currency, "overlay_amount": 0, "active_flag": "Y"})
+    data["system_configuration"] += [
+        {"id": next_id(), "config_key": key, "config_value": value, "active_flag": "Y"}
+        for key, value in (("BASE_CURRENCY", "SGD"), ("MAX_ORDER", "1000000000"), ("ROUNDING", "2"))
+    ]
+    data["threshold_configuration"].append({
+        "id": next_id(), "threshold_type": "USD_PB_DEPOSIT", "warning_level": 150000, "active_flag": "Y",
+    })
+    data["usd_pb_deposit"] += [
+        {"id": next_id(), "deposit_date": _day(i), "total_usd_deposits": round(rnd.uniform(0, 5000), 2)}
+        for i in range(max(10, n_entities))
+    ]
+    data["currency_configuration"] += [
+        {"id": next_id(), "currency_code": currency, "currency_type": "Matched", "proxy_currency": proxy_currency},
+        {"id": next_id(), "currency_code": proxy_currency, "currency_type": "Matched", "proxy_currency": None},
+    ]
+    for ccy, rate in ((currency, 0.17), (proxy_currency, 1.35)):
+        for d in range(30):
+            data["currency_rates"].append({
+                "id": next_id(), "currency_pair": f"{ccy}SGD", "effective_date": _day(300 - d),
+                "exchange_rate": round(rate * (1 + rnd.uniform(-0.01, 0.01)), 6),
+            })
+    data["proxy_configuration"].append({
+        "id": next_id(), "exposure_currency": currency, "proxy_currency": proxy_currency,
+        "active_flag": "Y", "effective_date": _day(0),
+    })
+    data["instruction_event_config"] += [
+        {"id": next_id(), "instruction_event": "Initiation", "nav_type": nav_type, "currency_type": "Matched", "booking_model": "Standard"}
+        for nav_type in ("COI", "RE")
+    ]
+    data["murex_book_config"] += [
+        {"id": next_id(), "book_code": f"MX_{i:03d}", "active_flag": True} for i in range(20)
+    ]
+    data["hedge_instruments"] += [
+        {
+            "id": next_id(), "instrument_code": f"FWD_{i}", "base_currency": currency, "quote_currency": "SGD",
+            "currency_pair": f"{currency}SGD", "active_flag": "Y", "effective_date": _day(0),
+            "currency_classification": "Matched", "nav_type_applicable": "Both", "accounting_method_supported": "Both",
+        }
+        for i in range(8)
+    ]
+    return data
+
+def structured_response_args(data: dict) -> tuple:
+    """Positional arguments for hedge_data.complete_structured_response built from a dataset"""
+    currency = data["entity_master"][0]["currency_code"] if data["entity_master"] else "HKD"
+    return (
+        data["entity_master"], data["position_nav_master"], data["currency_configuration"],
+        data["buffer_configuration"], data["waterfall_logic_configuration"], data["overlay_configuration"],
+        data["hedging_framework"], data["system_configuration"],
+        sorted(data["allocation_engine"], key=lambda r: r["created_date"], reverse=True),
+        data["hedge_instructions"], data["hedge_business_events"], data["car_master"],
+        data["usd_pb_deposit"], data["risk_monitoring"], data["threshold_configuration"][0]["warning_level"],
+        [r for r in data["currency_rates"] if currency in r["currency_pair"]][:20],
+        data["proxy_configuration"],
+        [r for r in data["currency_rates"] if currency not in r["currency_pair"]][:10],
+        data["instruction_event_config"], data["murex_book_config"], data["hedge_instruments"],
+        data["hedge_effectiveness"],
+    )